@@ -1,8 +1,15 @@
 import os
-from flask import Flask
+from flask import Flask, request, url_for
+from flask_login import current_user
 from .routes import main_routes
-from .extensions import db, login_manager, csrf, mail
+from .extensions import db, login_manager, csrf, mail, background, email_dispatcher, fragment_cache, event_broker
 from .models import User
+from .utils.user_cache import load_cached_user, init_user_cache
+from .utils.turnaround import format_duration
+from .utils.departments import department_names
+from .utils.certificates import init_certificates
+from .utils.officer_routing import init_officer_routing
+from .commands import register_commands
 from datetime import datetime, timedelta
 
 # مرشح (Filter) لتنسيق الوقت في Jinja2
@@ -14,8 +21,30 @@ def format_local_time(utc_dt):
     local_dt = utc_dt + timedelta(hours=3)
     return local_dt.strftime('%Y-%m-%d %H:%M')
 
+# دالة مساعدة لبناء رابط الصفحة الحالية مع تعديل بعض معاملات الاستعلام (تستخدم في ترقيم الصفحات)
+def url_with_args(**changes):
+    """ يعيد رابط الصفحة الحالية بعد تعديل المعاملات المحددة (القيمة None تحذف المعامل)."""
+    args = request.args.to_dict()
+    for key, value in changes.items():
+        if value is None:
+            args.pop(key, None)
+        else:
+            args[key] = value
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+# دوال قوالب الإشعارات: تُستدعى فقط في الصفحات التي تعرض قائمة الإشعارات
+def unread_notifications_count():
+    """ عدد الإشعارات غير المقروءة للمستخدم الحالي."""
+    from .utils.notifications import unread_count
+    return unread_count(current_user.id) if current_user.is_authenticated else 0
+
+def recent_notifications():
+    """ آخر إشعارات المستخدم الحالي (صفحة واحدة من الأحدث للأقدم)."""
+    from .utils.notifications import latest_notifications
+    return latest_notifications(current_user.id) if current_user.is_authenticated else []
+
 # دالة مصنع التطبيق (Application Factory)
-def create_app():
+def create_app(test_config=None):
     # تحديد مسار المجلد الجذري للمشروع
     root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
     
@@ -31,26 +60,44 @@ def create_app():
     # تعيين المفتاح السري (يجب تغييره في بيئة الإنتاج)
     app.config['SECRET_KEY'] = '4a8a6021f1e313a3f4e1f7d2f9d7c8c8b6a3e1d1f2a3a1b5'
     app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql+pymysql://root:@localhost/clearance_db'
+    # إعدادات بديلة (مثل قاعدة بيانات SQLite مؤقتة للاختبارات)
+    if test_config:
+        app.config.update(test_config)
     
     # تهيئة الإضافات (Extensions) مع التطبيق
     db.init_app(app)
     login_manager.init_app(app)
     csrf.init_app(app)  # تفعيل حماية CSRF
     mail.init_app(app)
+    email_dispatcher.init_app(app)
+    background.init_app(app)
+    fragment_cache.init_app(app)
+    event_broker.init_app(app)
+    init_certificates(app)
+    init_user_cache(app)
+    init_officer_routing(app)
     
     # تعيين عرض تسجيل الدخول لإعادة التوجيه عند الحاجة
     login_manager.login_view = 'main.login'
     
-    # دالة تحميل المستخدم لجلسة تسجيل الدخول
+    # دالة تحميل المستخدم لجلسة تسجيل الدخول (من الذاكرة المؤقتة للهوية، دون استعلام في أغلب الطلبات)
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return load_cached_user(user_id)
         
     # تسجيل المخطط الرئيسي للمسارات
     app.register_blueprint(main_routes)
+
+    # تسجيل أوامر سطر الأوامر (Flask CLI)
+    register_commands(app)
     
     # إضافة مرشحات مخصصة لـ Jinja2
     app.jinja_env.filters['local_time'] = format_local_time
+    app.jinja_env.filters['duration'] = format_duration
+    app.jinja_env.globals['url_with_args'] = url_with_args
+    app.jinja_env.globals['department_names'] = department_names
+    app.jinja_env.globals['unread_notifications_count'] = unread_notifications_count
+    app.jinja_env.globals['recent_notifications'] = recent_notifications
     
     # إضافة متغيرات سياق عامة لجميع القوالب
     @app.context_processor
@@ -0,0 +1,416 @@
+# app/commands.py
+# أوامر سطر الأوامر الخاصة بالنظام (Flask CLI)
+# تُستدعى عبر: flask --app run <group> <command>
+
+import click
+from flask.cli import AppGroup
+
+from app.extensions import db
+
+# مجموعة أوامر عدادات براءة الذمة
+counters_cli = AppGroup('counters', help='صيانة عدادات الشعب وملخصات الطلاب.')
+
+
+@counters_cli.command('verify')
+def verify_counters_command():
+    """يقارن العدادات والملخصات المخزنة بالقيم الفعلية ويعرض الفروقات."""
+    from app.utils.clearance_counters import verify_counters
+    from app.utils.clearance_summary import verify_summaries
+
+    drift = verify_counters()
+    summary_drift = verify_summaries()
+    if not drift and not summary_drift:
+        click.echo('العدادات والملخصات مطابقة للبيانات الفعلية.')
+        return
+
+    click.echo(f'تم العثور على {len(drift)} فرق في العدادات و {len(summary_drift)} فرق في الملخصات:')
+    for department, college, status, stored, actual in drift:
+        click.echo(f'  {department} / {college or "-"} / {status}: المخزن={stored} الفعلي={actual}')
+    for student_id, field, stored, actual in summary_drift:
+        click.echo(f'  الطالب {student_id} / {field}: المخزن={stored} الفعلي={actual}')
+    raise SystemExit(1)
+
+
+@counters_cli.command('rebuild')
+def rebuild_counters_command():
+    """يعيد حساب جميع العدادات والملخصات من جدول ClearanceStatus."""
+    from app.utils.clearance_counters import verify_counters, rebuild_counters
+    from app.utils.clearance_summary import verify_summaries, rebuild_summaries
+
+    drift = verify_counters()
+    summary_drift = verify_summaries()
+    rows = rebuild_counters()
+    summaries = rebuild_summaries()
+    db.session.commit()
+    click.echo(f'تمت إعادة بناء {rows} عداد (تم تصحيح {len(drift)} فرق).')
+    click.echo(f'تمت إعادة بناء {summaries} ملخص (تم تصحيح {len(summary_drift)} فرق).')
+
+
+# مجموعة أوامر مخطط قاعدة البيانات
+schema_cli = AppGroup('schema', help='ترحيل مخطط قاعدة البيانات وفحص خطط الاستعلامات.')
+
+
+@schema_cli.command('upgrade')
+def upgrade_schema_command():
+    """يطبق خطوات الترحيل المتبقية على قاعدة البيانات الحالية."""
+    from app.migrations import upgrade
+
+    applied = upgrade()
+    click.echo(f'تم تطبيق {len(applied)} خطوة ترحيل.' if applied else 'قاعدة البيانات محدثة.')
+
+
+@schema_cli.command('status')
+def schema_status_command():
+    """يعرض خطوات الترحيل التي لم تطبق بعد."""
+    from app.migrations import pending_migrations
+
+    db.create_all()
+    pending = pending_migrations()
+    for version, description, _ in pending:
+        click.echo(f'[{version}] {description}')
+    click.echo(f'عدد الخطوات المتبقية: {len(pending)}')
+
+
+@schema_cli.command('check-plans')
+def check_plans_command():
+    """يشغل EXPLAIN على الاستعلامات الساخنة ويفشل عند وجود مسح كامل للجدول."""
+    from app.utils.query_plans import check_query_plans
+
+    failed = 0
+    for name, full_scans, lines in check_query_plans():
+        status = 'FAIL' if full_scans else 'OK'
+        failed += bool(full_scans)
+        click.echo(f'[{status}] {name}')
+        for line in lines:
+            click.echo(f'        {line}')
+    if failed:
+        click.echo(f'{failed} استعلام يستخدم مسحاً كاملاً للجدول.')
+        raise SystemExit(1)
+
+
+@schema_cli.command('sizes')
+@click.argument('tables', nargs=-1)
+def schema_sizes_command(tables):
+    """يعرض حجم الجداول وفهارسها (افتراضياً جداول سجلات براءة الذمة)."""
+    from app.utils.table_sizes import table_sizes, DEFAULT_TABLES
+
+    for table, rows, data, index in table_sizes(tables or DEFAULT_TABLES):
+        per_row = (data + index) / rows if rows else 0
+        click.echo(f'{table}: صفوف={rows} بيانات={data / 1024 / 1024:.2f}MB فهارس={index / 1024 / 1024:.2f}MB '
+                   f'لكل صف={per_row:.0f}B')
+
+
+# مجموعة أوامر قياس الأداء
+benchmark_cli = AppGroup('benchmark', help='قياس أداء العمليات الثقيلة.')
+
+
+@benchmark_cli.command('hashing')
+@click.option('--count', default=200, show_default=True, help='عدد كلمات المرور في كل تجربة.')
+@click.option('--max-processes', default=None, type=int, help='أقصى عدد من العمليات (افتراضياً عدد الأنوية).')
+def benchmark_hashing_command(count, max_processes):
+    """يقيس زمن تشفير كلمات المرور المجمع مع زيادة عدد العمليات."""
+    import time
+    from werkzeug.security import check_password_hash
+    from app.utils.passwords import generate_password, hash_passwords, default_processes
+
+    max_processes = max_processes or default_processes()
+    passwords = [generate_password() for _ in range(count)]
+
+    # عدد العمليات في كل تجربة: 1، 2، 4، ... حتى الحد الأقصى
+    steps, processes = [], 1
+    while processes < max_processes:
+        steps.append(processes)
+        processes *= 2
+    steps.append(max_processes)
+
+    click.echo(f'{"العمليات":>10} {"الزمن (ث)":>12} {"كلمة/ث":>10} {"التسريع":>8}')
+    baseline = None
+    for processes in steps:
+        started = time.perf_counter()
+        hashed = hash_passwords(passwords, processes=processes)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+
+        # التأكد من أن النتائج بنفس ترتيب المدخلات
+        if not (check_password_hash(hashed[0], passwords[0]) and check_password_hash(hashed[-1], passwords[-1])):
+            raise click.ClickException('ترتيب التجزئات لا يطابق ترتيب كلمات المرور.')
+
+        click.echo(f'{processes:>10} {elapsed:>12.2f} {count / elapsed:>10.1f} {baseline / elapsed:>7.2f}x')
+
+
+def add_outbox_commands(group, module, noun, plural, interval):
+    """
+    يضيف إلى المجموعة أوامر صندوق صادر (worker, status, requeue, purge).
+
+    المعاملات:
+    module: الوحدة التي تعرّف كائن outbox (تُستورد عند تنفيذ الأمر).
+    noun / plural: اسم الرسالة مفرداً وجمعاً في رسائل الأوامر.
+    interval: مدة انتظار العامل الافتراضية عندما يكون الصندوق فارغاً.
+    """
+    def outbox():
+        from importlib import import_module
+        return import_module(module).outbox
+
+    @group.command('worker')
+    @click.option('--batch-size', default=None, type=int, help=f'عدد {plural} في كل دفعة.')
+    @click.option('--interval', default=interval, show_default=True, help='مدة الانتظار بالثواني عندما يكون الصندوق فارغاً.')
+    @click.option('--once', is_flag=True, help=f'إفراغ {plural} المستحقة حالياً ثم الخروج.')
+    def worker_command(batch_size, interval, once):
+        """يسحب الرسائل المستحقة على دفعات ويرسلها مع إعادة المحاولة عند الفشل."""
+        import time
+
+        box = outbox()
+        click.echo(f'بدء عامل {plural}...')
+        while True:
+            stats = box.process_batch(batch_size)
+            if any(stats.values()):
+                click.echo(f'تم الإرسال: {stats["sent"]}، إعادة المحاولة لاحقاً: {stats["retried"]}، فشل نهائي: {stats["dead"]}')
+                continue
+            # إنهاء جلسة قاعدة البيانات بين الدورات حتى لا يبقى الاتصال محجوزاً
+            db.session.remove()
+            if once:
+                break
+            time.sleep(interval)
+
+    @group.command('status')
+    def status_command():
+        """يعرض عدد الرسائل في كل حالة."""
+        counts = outbox().status()
+        for status in ('pending', 'sent', 'dead'):
+            click.echo(f'{status}: {counts.get(status, 0)}')
+
+    @group.command('requeue')
+    def requeue_command():
+        """يعيد الرسائل التي فشلت نهائياً (dead) إلى الطابور."""
+        click.echo(f'تمت إعادة {outbox().requeue_dead()} {noun} إلى الطابور.')
+
+    @group.command('purge')
+    @click.option('--days', default=7, show_default=True, help=f'حذف {plural} المرسلة والميتة الأقدم من هذا العدد من الأيام.')
+    def purge_command(days):
+        """يحذف الرسائل المرسلة والميتة القديمة من الصندوق."""
+        click.echo(f'تم حذف {outbox().purge(days)} {noun}.')
+
+
+# مجموعة أوامر صندوق الإشعارات الفورية
+push_cli = AppGroup('push', help='إرسال الإشعارات الفورية من صندوق الإشعارات الصادرة.')
+add_outbox_commands(push_cli, 'app.utils.push_outbox', 'إشعار', 'الإشعارات الفورية', interval=2.0)
+
+
+# مجموعة أوامر البريد الإلكتروني
+email_cli = AppGroup('email', help='طابور إرسال البريد الإلكتروني وصندوق البريد الصادر لرسائل الترحيب.')
+add_outbox_commands(email_cli, 'app.utils.mail_outbox', 'رسالة', 'رسائل الترحيب', interval=5.0)
+
+
+@email_cli.command('send-test')
+@click.option('--to', 'recipient', required=True, help='عنوان المستلم.')
+@click.option('--count', default=1, show_default=True, help='عدد الرسائل المرسلة.')
+def email_send_test_command(recipient, count):
+    """يرسل رسائل تجريبية عبر طابور البريد ويعرض إحصائيات التسليم (مفيد مع خادم SMTP محلي)."""
+    import time
+    from flask import current_app
+    from flask_mail import Message
+    from app.extensions import email_dispatcher
+
+    started = time.perf_counter()
+    for i in range(count):
+        msg = Message(f'رسالة تجريبية {i + 1}', sender=current_app.config.get('MAIL_USERNAME'),
+                      recipients=[recipient], body='رسالة تجريبية من نظام براءة الذمة.')
+        email_dispatcher.send(msg, block=True)
+    email_dispatcher.flush()
+    elapsed = time.perf_counter() - started
+
+    for name, value in email_dispatcher.get_metrics().items():
+        click.echo(f'{name}: {value}')
+    click.echo(f'الزمن: {elapsed:.2f} ث ({count / elapsed:.1f} رسالة/ث)')
+
+
+# مجموعة أوامر الإشعارات الداخلية
+notifications_cli = AppGroup('notifications', help='تنظيف وأرشفة الإشعارات القديمة.')
+
+
+@notifications_cli.command('purge')
+@click.option('--read-days', default=None, type=int, help='عمر الإشعارات المقروءة المحذوفة (افتراضياً NOTIFICATION_RETENTION_READ_DAYS).')
+@click.option('--unread-days', default=None, type=int, help='عمر الإشعارات غير المقروءة المحذوفة (افتراضياً NOTIFICATION_RETENTION_UNREAD_DAYS).')
+@click.option('--archive/--delete', default=None, help='أرشفة الإشعارات قبل حذفها أو حذفها نهائياً (افتراضياً NOTIFICATION_RETENTION_MODE).')
+@click.option('--chunk-size', default=None, type=int, help='عدد الإشعارات في كل دفعة.')
+@click.option('--pause', default=None, type=float, help='الاستراحة بين الدفعات بالثواني.')
+@click.option('--dry-run', is_flag=True, help='عرض عدد الإشعارات المنتهية صلاحيتها دون حذفها.')
+def purge_notifications_command(read_days, unread_days, archive, chunk_size, pause, dry_run):
+    """يحذف أو يؤرشف الإشعارات القديمة حسب سياسة الاحتفاظ على دفعات صغيرة."""
+    from app.utils.notification_retention import retention_policies, count_expired, apply_retention
+
+    if dry_run:
+        for name, conditions in retention_policies(read_days, unread_days):
+            click.echo(f'{name}: {count_expired(conditions)} إشعار منتهي الصلاحية')
+        return
+
+    def progress(report):
+        click.echo(f'  الدفعة {report.chunks}: {report.processed} إشعار ({report.rows_per_second:.0f} صف/ث)')
+
+    report = apply_retention(read_days, unread_days, archive=archive, chunk_size=chunk_size,
+                             pause=pause, on_chunk=progress)
+    click.echo(f'تمت معالجة {report.processed} إشعار في {report.chunks} دفعة خلال {report.elapsed:.2f} ث '
+               f'({report.rows_per_second:.0f} صف/ث).')
+
+
+# مجموعة أوامر دورات براءة الذمة
+cycles_cli = AppGroup('cycles', help='دورات براءة الذمة وأرشفة سجلات الدورات المغلقة.')
+
+
+@cycles_cli.command('status')
+def cycles_status_command():
+    """يعرض الدورات وحالة أرشفة كل منها."""
+    from app.utils.clearance_cycles import cycle_status
+
+    for cycle, remaining in cycle_status():
+        if cycle.closed_at is None:
+            state = 'الحالية'
+        elif cycle.archived_at is None:
+            state = f'مغلقة، متبقٍ {remaining} سجل للأرشفة'
+        else:
+            state = f'مؤرشفة ({cycle.archived_rows} سجل)'
+        click.echo(f'{cycle.id:>4} {cycle.name:<15} {cycle.started_at:%Y-%m-%d}  {state}')
+
+
+@cycles_cli.command('start')
+@click.option('--name', default=None, help='اسم الدورة الجديدة (افتراضياً العام الدراسي).')
+@click.option('--no-archive', is_flag=True, help='بدء الدورة دون أرشفة سجلات الدورة السابقة الآن.')
+@click.confirmation_option(prompt='سيتم إغلاق الدورة الحالية لجميع الطلاب. هل تريد المتابعة؟')
+def cycles_start_command(name, no_archive):
+    """يغلق الدورة الحالية ويبدأ دورة جديدة، ثم يؤرشف سجلات الدورة السابقة."""
+    from app.utils.clearance_cycles import start_new_cycle
+
+    closed, cycle = start_new_cycle(name)
+    click.echo(f'تم بدء الدورة {cycle.name} وإغلاق {len(closed)} دورة.')
+    if not no_archive:
+        _archive_cycles()
+
+
+@cycles_cli.command('archive')
+@click.option('--chunk-size', default=None, type=int, help='عدد السجلات في كل دفعة (افتراضياً CYCLE_ARCHIVE_CHUNK).')
+@click.option('--pause', default=None, type=float, help='الاستراحة بين الدفعات بالثواني.')
+def cycles_archive_command(chunk_size, pause):
+    """يكمل أرشفة الدورات المغلقة (مثلاً بعد انقطاع مهمة الخلفية)."""
+    _archive_cycles(chunk_size, pause)
+
+
+def _archive_cycles(chunk_size=None, pause=None):
+    from app.utils.clearance_cycles import archive_closed_cycles
+
+    def progress(report):
+        click.echo(f'  الدفعة {report.chunks}: {report.processed} سجل ({report.rows_per_second:.0f} صف/ث)')
+
+    statuses, notifications = archive_closed_cycles(chunk_size=chunk_size, pause=pause, on_chunk=progress)
+    click.echo(f'تمت أرشفة {statuses.processed} سجل في {statuses.chunks} دفعة خلال {statuses.elapsed:.2f} ث، '
+               f'وتنظيف {notifications.processed} إشعار.')
+
+
+# مجموعة أوامر البث المباشر
+stream_cli = AppGroup('stream', help='صيانة جدول أحداث البث المباشر (SSE).')
+
+
+@stream_cli.command('purge')
+@click.option('--hours', default=None, type=int, help='حذف الأحداث الأقدم من هذا العدد من الساعات (افتراضياً STREAM_RETENTION_HOURS).')
+def stream_purge_command(hours):
+    """يحذف أحداث البث القديمة (بعد تسليمها لا يحتاجها إلا استكمال الاتصالات المنقطعة)."""
+    from flask import current_app
+    from app.utils.stream_events import purge_events
+
+    hours = hours or current_app.config.get('STREAM_RETENTION_HOURS', 24)
+    click.echo(f'تم حذف {purge_events(hours)} حدث.')
+
+
+# مجموعة أوامر إحصائيات زمن الإنجاز
+analytics_cli = AppGroup('analytics', help='التجميع اليومي لإحصائيات زمن الإنجاز من سجل انتقالات الحالة.')
+
+
+@analytics_cli.command('rollup')
+@click.option('--days', default=None, type=int, help='إعادة حساب هذا العدد من الأيام الأخيرة (افتراضياً من آخر يوم محسوب).')
+def analytics_rollup_command(days):
+    """يحدّث جدول التجميع اليومي (يمكن جدولته بـ cron؛ وتطلبه لوحة مدير النظام تلقائياً عند تقادمه)."""
+    from app.utils.turnaround import refresh_rollups
+
+    click.echo(f'تم حساب {refresh_rollups(days=days)} صف تجميع.')
+
+
+@analytics_cli.command('turnaround')
+@click.option('--days', default=None, type=int, help='طول الفترة بالأيام (افتراضياً ANALYTICS_WINDOW_DAYS).')
+def analytics_turnaround_command(days):
+    """يعرض الوسيط والمئين 95 لزمن الإنجاز لكل شعبة محسوبة مباشرة من السجل."""
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from app.utils.turnaround import turnaround_percentiles, format_duration
+
+    days = days or current_app.config.get('ANALYTICS_WINDOW_DAYS', 30)
+    end = datetime.utcnow()
+    for department, values in sorted(turnaround_percentiles(end - timedelta(days=days), end).items()):
+        click.echo(f'  {department}: قرارات={values["decisions"]} الوسيط={format_duration(values["median_seconds"])} '
+                   f'المئين 95={format_duration(values["p95_seconds"])}')
+
+
+# مجموعة أوامر الشعب
+departments_cli = AppGroup('departments', help='جدول الشعب المعنية ببراءة الذمة.')
+
+
+@departments_cli.command('list')
+def departments_list_command():
+    """يعرض الشعب بترتيب العرض مع معرفاتها."""
+    from sqlalchemy import select
+    from app.models import Department
+
+    for department in db.session.scalars(select(Department).order_by(Department.position, Department.id)):
+        click.echo(f'  {department.id}: {department.name}' + ('' if department.active else ' (غير فعالة)'))
+
+
+@departments_cli.command('add')
+@click.argument('names', nargs=-1, required=True)
+def departments_add_command(names):
+    """يضيف شعباً جديدة في نهاية الترتيب (تظهر في طلبات براءة الذمة الجديدة)."""
+    from app.utils.departments import add_departments
+
+    click.echo(f'تمت إضافة {add_departments(names)} شعبة.')
+
+
+# مجموعة أوامر شهادات براءة الذمة
+certificates_cli = AppGroup('certificates', help='شهادات براءة الذمة المعروضة مسبقاً.')
+
+
+@certificates_cli.command('snapshot')
+def certificates_snapshot_command():
+    """يعرض شهادات الطلاب المكتملين الذين ليست لديهم شهادة (مثلاً بعد التثبيت أو حذف الملفات)."""
+    from flask import current_app
+    from sqlalchemy import select
+    from app.models import ClearanceSummary, ClearanceCertificate
+    from app.utils.certificates import snapshot_many
+
+    student_ids = db.session.scalars(
+        select(ClearanceSummary.student_id)
+        .outerjoin(ClearanceCertificate, ClearanceCertificate.student_id == ClearanceSummary.student_id)
+        .where(ClearanceSummary.completed.is_(True), ClearanceCertificate.student_id.is_(None))
+    ).all()
+    # سياق طلب حتى تعمل url_for داخل القالب
+    with current_app.test_request_context():
+        click.echo(f'تم عرض {snapshot_many(student_ids)} شهادة من {len(student_ids)}.')
+
+
+@certificates_cli.command('purge')
+def certificates_purge_command():
+    """يحذف ملفات الشهادات المبطلة التي لا يشير إليها أي طالب."""
+    from app.utils.certificates import purge_orphans
+
+    click.echo(f'تم حذف {purge_orphans()} ملف.')
+
+
+def register_commands(app):
+    """يسجل جميع أوامر سطر الأوامر في التطبيق."""
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(benchmark_cli)
+    app.cli.add_command(push_cli)
+    app.cli.add_command(email_cli)
+    app.cli.add_command(notifications_cli)
+    app.cli.add_command(stream_cli)
+    app.cli.add_command(cycles_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(departments_cli)
+    app.cli.add_command(certificates_cli)
@@ -2,6 +2,10 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
 from flask_mail import Mail
+from app.utils.background import BackgroundExecutor
+from app.utils.email_dispatcher import EmailDispatcher
+from app.utils.fragment_cache import FragmentCache
+from app.utils.event_broker import EventBroker
 
 # تهيئة كائن قاعدة البيانات (SQLAlchemy)
 db = SQLAlchemy()
@@ -15,8 +19,21 @@ csrf = CSRFProtect()
 # تهيئة نظام البريد الإلكتروني (Flask-Mail)
 mail = Mail()
 
-# قائمة بالأقسام المتاحة في النظام لاستخدامها في القوائم المنسدلة والتحقق
-DEPARTMENTS = [
+# تهيئة طابور إرسال البريد (دفعات عبر اتصال SMTP واحد بدلاً من خيط واتصال لكل رسالة)
+email_dispatcher = EmailDispatcher(mail)
+
+# تهيئة منفذ المهام في الخلفية (مثل استيراد ملفات Excel الكبيرة)
+background = BackgroundExecutor()
+
+# تهيئة ذاكرة أجزاء لوحات التحكم (تُبطل تلقائياً عند تغير بيانات براءة الذمة)
+fragment_cache = FragmentCache()
+
+# تهيئة موزع أحداث البث المباشر (قراءة دورية واحدة لكل عملية بدلاً من استعلام لكل اتصال مفتوح)
+event_broker = EventBroker()
+
+# الشعب الافتراضية التي يُعبأ بها جدول department عند أول تشغيل
+# (القائمة الفعلية تُقرأ من الجدول عبر app/utils/departments.py)
+DEFAULT_DEPARTMENTS = [
     'مجانية التعليم', 'معاون العميد للشؤون العلمية', 'الشعبة العلمية',
     'الأقسام الداخلية', 'الهويات', 'الوحدة الرياضية',
     'المكتبة المركزية', 'مكتبة الكلية', 'الحسابات', 'التسجيل'
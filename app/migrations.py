@@ -0,0 +1,443 @@
+# app/migrations.py
+# ترحيل مخطط قاعدة البيانات (Schema Migrations) لقواعد البيانات القائمة
+# الدالة db.create_all() تنشئ الجداول الجديدة فقط ولا تضيف الفهارس أو الأعمدة للجداول الموجودة،
+# لذلك يتم تسجيل كل تغيير على جدول قائم هنا كخطوة مرقمة تُطبق مرة واحدة.
+# جميع الخطوات قابلة لإعادة التنفيذ (Idempotent) حتى تعمل على قواعد البيانات الجديدة والقديمة.
+# التشغيل: flask --app run schema upgrade
+
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from app.extensions import db
+from app.models import SchemaMigration
+
+# قائمة الخطوات المسجلة بالترتيب: (version, description, function)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """مزخرف (Decorator) لتسجيل خطوة ترحيل جديدة."""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+
+def _existing_indexes(table_name):
+    """يعيد أسماء الفهارس الموجودة فعلياً على الجدول."""
+    return {ix['name'] for ix in inspect(db.engine).get_indexes(table_name)}
+
+
+def _existing_columns(table_name):
+    """يعيد أسماء الأعمدة الموجودة فعلياً في الجدول."""
+    return {col['name'] for col in inspect(db.engine).get_columns(table_name)}
+
+
+def _ensure_columns(model, names):
+    """يضيف أعمدة النموذج المحددة إذا لم تكن موجودة في الجدول (ALTER TABLE ... ADD COLUMN)."""
+    table = model.__table__
+    existing = _existing_columns(table.name)
+    added = []
+    for name in names:
+        if name in existing:
+            continue
+        column = table.c[name]
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {name} {column_type} NULL'))
+        added.append(name)
+    db.session.commit()
+    return added
+
+
+def _ensure_indexes(model, names=None):
+    """
+    ينشئ فهارس النموذج غير الموجودة في قاعدة البيانات.
+
+    names: أسماء الفهارس المطلوبة فقط (كل خطوة تنشئ الفهارس التي أضافتها، لأن فهارس الخطوات
+    اللاحقة قد تعتمد على أعمدة لم تُضف بعد).
+    """
+    existing = _existing_indexes(model.__tablename__)
+    created = []
+    for index in model.__table__.indexes:
+        if names is not None and index.name not in names:
+            continue
+        if index.name not in existing:
+            index.create(db.engine)
+            created.append(index.name)
+    return created
+
+
+def _create_index(table_name, name, columns, unique=False):
+    """
+    ينشئ فهرساً بتعريف صريح إذا لم يكن موجوداً، للخطوات التي تعمل على أعمدة لم تعد في النموذج الحالي.
+    """
+    if name in _existing_indexes(table_name):
+        return False
+    db.session.execute(text(
+        f'CREATE {"UNIQUE " if unique else ""}INDEX {name} ON {table_name} ({", ".join(columns)})'))
+    db.session.commit()
+    return True
+
+
+def _rebuild_table(model):
+    """
+    يعيد إنشاء جدول SQLite بتعريف النموذج الحالي مع نقل بياناته (SQLite لا يدعم تعديل قيد NOT NULL لعمود قائم).
+    لا يصلح إلا لجدول لا تشير إليه مفاتيح أجنبية من جداول أخرى.
+    """
+    table = model.__tablename__
+    columns = ', '.join(name for name in model.__table__.columns.keys() if name in _existing_columns(table))
+    _drop_indexes(table, _existing_indexes(table))
+    db.session.execute(text(f'ALTER TABLE {table} RENAME TO {table}__old'))
+    db.session.commit()
+    model.__table__.create(db.engine)
+    db.session.execute(text(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}__old'))
+    db.session.execute(text(f'DROP TABLE {table}__old'))
+    db.session.commit()
+
+
+def _set_not_null(model, names):
+    """يجعل أعمدة النموذج المحددة NOT NULL إذا كانت تقبل NULL في قاعدة البيانات، ويعيد أسماءها."""
+    table = model.__table__
+    nullable = [col['name'] for col in inspect(db.engine).get_columns(table.name)
+                if col['name'] in names and col['nullable']]
+    if not nullable:
+        return []
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        _rebuild_table(model)
+        return nullable
+    for name in nullable:
+        if dialect == 'mysql':
+            column_type = table.c[name].type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {table.name} MODIFY {name} {column_type} NOT NULL'))
+        else:
+            db.session.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {name} SET NOT NULL'))
+    db.session.commit()
+    return nullable
+
+
+def _ensure_foreign_keys(model):
+    """يضيف المفاتيح الأجنبية المعرفة في النموذج وغير الموجودة في الجدول، ويعيد أسماء أعمدتها."""
+    table = model.__table__
+    existing = {tuple(fk['constrained_columns']) for fk in inspect(db.engine).get_foreign_keys(table.name)}
+    missing = [fk for fk in table.foreign_keys if (fk.parent.name,) not in existing]
+    if not missing:
+        return []
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite لا يضيف قيداً لجدول قائم: إعادة إنشاء الجدول بتعريف النموذج
+        _rebuild_table(model)
+        return [fk.parent.name for fk in missing]
+    for fk in missing:
+        column, target = fk.parent.name, fk.column
+        db.session.execute(text(
+            f'ALTER TABLE {table.name} ADD CONSTRAINT fk_{table.name}_{column} '
+            f'FOREIGN KEY ({column}) REFERENCES {target.table.name} ({target.name})'))
+    db.session.commit()
+    return [fk.parent.name for fk in missing]
+
+
+def _drop_indexes(table_name, names):
+    """يحذف الفهارس المحددة إذا كانت موجودة (بعد إنشاء بدائلها)."""
+    existing = _existing_indexes(table_name)
+    dropped = []
+    for name in names:
+        if name not in existing:
+            continue
+        if db.engine.dialect.name == 'mysql':
+            db.session.execute(text(f'DROP INDEX {name} ON {table_name}'))
+        else:
+            db.session.execute(text(f'DROP INDEX {name}'))
+        dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+@migration('0001', 'فهارس مركبة وقيد التفرد على (student_id, department)')
+def add_clearance_indexes():
+    from app.models import User, ClearanceStatus, Notification, PushSubscription
+
+    # حذف السجلات المكررة لنفس (الطالب، الشعبة) قبل إنشاء قيد التفرد، مع الإبقاء على أقدم سجل.
+    # الجدول المشتق (keep) ضروري لأن MySQL لا يسمح بالحذف من جدول مستخدم في استعلام فرعي مباشر.
+    if ('uq_clearance_status_student_department' not in _existing_indexes('clearance_status')
+            and 'department' in _existing_columns('clearance_status')):
+        removed = db.session.execute(text(
+            'DELETE FROM clearance_status WHERE id NOT IN ('
+            ' SELECT id FROM (SELECT MIN(id) AS id FROM clearance_status'
+            ' GROUP BY student_id, department) AS keep)'
+        )).rowcount
+        db.session.commit()
+        if removed:
+            print(f'تم حذف {removed} سجل مكرر من clearance_status. يرجى تشغيل: flask counters rebuild')
+
+    indexes = {
+        User: ['ix_user_role_department', 'ix_user_role_college'],
+        ClearanceStatus: ['uq_clearance_status_student_department', 'ix_clearance_status_department_status'],
+        Notification: ['ix_notification_user_read'],
+        PushSubscription: ['ix_push_subscription_user_id'],
+    }
+    for model, names in indexes.items():
+        for name in _ensure_indexes(model, names):
+            print(f'تم إنشاء الفهرس {name}')
+
+
+@migration('0002', 'فهرس صفحات الإشعارات (user_id, id)')
+def add_notification_feed_index():
+    from app.models import Notification
+
+    for name in _ensure_indexes(Notification, ['ix_notification_user_id']):
+        print(f'تم إنشاء الفهرس {name}')
+
+
+@migration('0003', 'أعمدة نوع الإشعار والطالب والشعبة المعنية')
+def add_notification_targeting():
+    from sqlalchemy import select, update, literal
+    from app.extensions import DEFAULT_DEPARTMENTS
+    from app.models import Notification, User
+    from app.utils.departments import add_departments
+    from app.utils.notifications import CLEARANCE_REQUEST, STATUS_UPDATE
+
+    for name in _ensure_columns(Notification, ['type', 'related_student_id', 'department_id']):
+        print(f'تمت إضافة العمود notification.{name}')
+
+    # الشعبة تُحفظ بمعرفها: تعبئة جدول الشعب قبل أول UPDATE (القراءة على اتصال مستقل أثناء المعاملة تنتظر قفلها)
+    add_departments(DEFAULT_DEPARTMENTS)
+
+    # تعبئة الحقول للإشعارات القديمة من نص الرسالة (مرة واحدة فقط)
+    request_prefix = 'طلب براءة ذمة جديد من الطالب '
+    student_id = (
+        select(User.id)
+        .where(Notification.message == literal(request_prefix) + User.university_id + literal('.'))
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Notification)
+        .where(Notification.type.is_(None), Notification.message.like(request_prefix + '%'))
+        .values(type=CLEARANCE_REQUEST, related_student_id=student_id),
+        execution_options={'synchronize_session': False},
+    )
+    for department in DEFAULT_DEPARTMENTS:
+        db.session.execute(
+            update(Notification)
+            .where(Notification.type.is_(None), Notification.message.like(f'شعبة {department} غيّرت حالتك إلى %'))
+            .values(type=STATUS_UPDATE, related_student_id=Notification.user_id, department=department),
+            execution_options={'synchronize_session': False},
+        )
+    db.session.commit()
+
+    for name in _ensure_indexes(Notification, ['ix_notification_user_type_student', 'ix_notification_related_student']):
+        print(f'تم إنشاء الفهرس {name}')
+
+
+@migration('0004', 'فهرس تنظيف الإشعارات (is_read, timestamp) وجدول الأرشيف')
+def add_notification_retention_index():
+    from app.models import Notification
+
+    # جدول notification_archive الجديد ينشئه db.create_all() في upgrade()
+    for name in _ensure_indexes(Notification, ['ix_notification_read_timestamp']):
+        print(f'تم إنشاء الفهرس {name}')
+
+
+@migration('0005', 'فهارس آخر تحديث لسجلات براءة الذمة (ETag لواجهات JSON)')
+def add_clearance_updated_indexes():
+    from app.models import ClearanceStatus
+
+    for name in _ensure_indexes(ClearanceStatus, ['ix_clearance_status_department_updated',
+                                                  'ix_clearance_status_updated_at']):
+        print(f'تم إنشاء الفهرس {name}')
+
+
+@migration('0006', 'دورات براءة الذمة: عمود cycle_id وفهارس تبدأ بالدورة')
+def add_clearance_cycles():
+    from sqlalchemy import select, update, func
+    from app.models import ClearanceStatus, ClearanceCycle
+    from app.utils.clearance_cycles import default_cycle_name
+
+    # جدولا clearance_cycle و clearance_status_history ينشئهما db.create_all() في upgrade()
+    for name in _ensure_columns(ClearanceStatus, ['cycle_id']):
+        print(f'تمت إضافة العمود clearance_status.{name}')
+
+    # السجلات الموجودة تنتمي إلى الدورة الأولى (المفتوحة حالياً)
+    cycle_id = db.session.scalar(select(func.min(ClearanceCycle.id)).where(ClearanceCycle.closed_at.is_(None)))
+    if cycle_id is None:
+        started_at = db.session.scalar(select(func.min(ClearanceStatus.updated_at))) or datetime.utcnow()
+        cycle = ClearanceCycle(name=default_cycle_name(started_at), started_at=started_at)
+        db.session.add(cycle)
+        db.session.commit()
+        cycle_id = cycle.id
+        print(f'تم إنشاء الدورة {cycle.name}')
+
+    # تعبئة العمود على نطاقات من المعرفات (commit لكل نطاق) بدلاً من UPDATE واحد للجدول كاملاً
+    low, high = db.session.execute(select(func.min(ClearanceStatus.id), func.max(ClearanceStatus.id))).one()
+    step = 10000
+    for start in range(low or 0, (high or 0) + 1, step):
+        db.session.execute(
+            update(ClearanceStatus)
+            .where(ClearanceStatus.id >= start, ClearanceStatus.id < start + step, ClearanceStatus.cycle_id.is_(None))
+            .values(cycle_id=cycle_id),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+    # الفهارس الجديدة أولاً (قيد التفرد الجديد يخدم المفتاح الأجنبي student_id في MySQL) ثم حذف القديمة.
+    # تعريفات صريحة على أعمدة الشعبة والحالة النصية (تحولت إلى معرفات في الخطوة 0007)
+    if 'department' in _existing_columns('clearance_status'):
+        for name, columns, unique in (
+            ('uq_clearance_status_student_cycle_department', ('student_id', 'cycle_id', 'department'), True),
+            ('ix_clearance_status_cycle_department_status', ('cycle_id', 'department', 'status'), False),
+            ('ix_clearance_status_cycle_department_updated', ('cycle_id', 'department', 'updated_at'), False),
+        ):
+            if _create_index('clearance_status', name, columns, unique):
+                print(f'تم إنشاء الفهرس {name}')
+    for name in _ensure_indexes(ClearanceStatus, ['ix_clearance_status_cycle_updated_at']):
+        print(f'تم إنشاء الفهرس {name}')
+    for name in _drop_indexes('clearance_status', ['uq_clearance_status_student_department',
+                                                   'ix_clearance_status_department_status',
+                                                   'ix_clearance_status_department_updated',
+                                                   'ix_clearance_status_updated_at']):
+        print(f'تم حذف الفهرس {name}')
+
+
+@migration('0007', 'جدول الشعب ومعرفات صغيرة لأعمدة الشعبة والحالة')
+def add_department_keys():
+    from app.extensions import DEFAULT_DEPARTMENTS
+    from app.models import (ClearanceStatus, ClearanceStatusHistory, StatusTransition, StatusDailyRollup, Notification,
+                            NotificationArchive, STATUS_CODES)
+    from app.utils.departments import add_departments
+
+    # (النموذج، {عمود الشعبة القديم: الجديد}، {أعمدة الحالة القديمة: الجديدة}، الفهارس الجديدة)
+    conversions = [
+        (ClearanceStatus, {'department': 'department_id'}, {'status': 'status_code'},
+         ['uq_clearance_status_student_cycle_department_id', 'ix_clearance_status_cycle_department_id_status',
+          'ix_clearance_status_cycle_department_id_updated']),
+        (ClearanceStatusHistory, {'department': 'department_id'}, {'status': 'status_code'}, []),
+        (StatusTransition, {'department': 'department_id'},
+         {'old_status': 'old_status_code', 'new_status': 'new_status_code'},
+         ['ix_status_transition_student_department_id']),
+        # الشعبة في الإشعارات (قواعد البيانات التي طبقت الخطوة 0003 بعمود نصي)
+        (Notification, {'department': 'department_id'}, {}, []),
+        (NotificationArchive, {'department': 'department_id'}, {}, []),
+    ]
+    status_case = ' '.join(f"WHEN '{name}' THEN {code}" for name, code in STATUS_CODES.items())
+
+    # جدول department ينشئه db.create_all() في upgrade()؛ يُعبأ بالشعب الافتراضية، وبأي شعبة أخرى موجودة
+    # في السجلات القديمة كشعبة غير فعالة (تبقى سجلاتها ولا تُطلب في الطلبات الجديدة)
+    legacy = []
+    for model, departments, _, _ in conversions:
+        table = model.__tablename__
+        if 'department' in _existing_columns(table):
+            legacy += [name for (name,) in db.session.execute(
+                           text(f'SELECT DISTINCT department FROM {table} WHERE department IS NOT NULL'))
+                       if name not in DEFAULT_DEPARTMENTS and name not in legacy]
+    db.session.commit()
+    added = add_departments(DEFAULT_DEPARTMENTS) + add_departments(legacy, active=False)
+    if added:
+        print(f'تمت إضافة {added} شعبة إلى جدول department')
+
+    for model, departments, statuses, indexes in conversions:
+        table = model.__tablename__
+        old_columns = [name for name in (*departments, *statuses) if name in _existing_columns(table)]
+        if not old_columns:
+            continue
+
+        for name in _ensure_columns(model, [*departments.values(), *statuses.values()]):
+            print(f'تمت إضافة العمود {table}.{name}')
+
+        # تعبئة الأعمدة الجديدة على نطاقات من المعرفات (commit لكل نطاق)
+        assignments = [f'{new} = (SELECT department.id FROM department WHERE department.name = {table}.{old})'
+                       for old, new in departments.items()]
+        assignments += [f'{new} = CASE {old} {status_case} END' for old, new in statuses.items()]
+        low, high = db.session.execute(text(f'SELECT MIN(id), MAX(id) FROM {table}')).one()
+        step = 10000
+        for start in range(low or 0, (high or 0) + 1, step):
+            db.session.execute(
+                text(f'UPDATE {table} SET {", ".join(assignments)} WHERE id >= :start AND id < :end'),
+                {'start': start, 'end': start + step},
+            )
+            db.session.commit()
+
+        # قيمة لا مقابل لها في جدول الشعب أو STATUS_CODES تصبح NULL: التوقف قبل حذف العمود القديم
+        # (يُعاد تنفيذ الخطوة بعد تصحيح القيم، فالأعمدة الجديدة موجودة وتُعبأ من جديد)
+        unmapped = {
+            old: [value for (value,) in db.session.execute(text(
+                f'SELECT DISTINCT {old} FROM {table} WHERE {new} IS NULL AND {old} IS NOT NULL'))]
+            for old, new in {**departments, **statuses}.items()
+        }
+        unmapped = {old: values for old, values in unmapped.items() if values}
+        if unmapped:
+            raise RuntimeError(f'قيم غير معروفة في {table} (لم يُحذف أي عمود): {unmapped}')
+        print(f'تم تحويل {table}')
+
+        # الفهارس الجديدة أولاً، ثم حذف الفهارس والأعمدة النصية القديمة
+        for name in _ensure_indexes(model, indexes):
+            print(f'تم إنشاء الفهرس {name}')
+        stale = [ix['name'] for ix in inspect(db.engine).get_indexes(table)
+                 if set(ix['column_names']) & set(old_columns)]
+        for name in _drop_indexes(table, stale):
+            print(f'تم حذف الفهرس {name}')
+        for name in old_columns:
+            db.session.execute(text(f'ALTER TABLE {table} DROP COLUMN {name}'))
+            db.session.commit()
+            print(f'تم حذف العمود {table}.{name}')
+
+    # جدول التجميع اليومي مشتق من سجل الانتقالات: يُعاد إنشاؤه ثم يُحسب من جديد
+    if 'department' in _existing_columns('status_daily_rollup'):
+        StatusDailyRollup.__table__.drop(db.engine)
+        StatusDailyRollup.__table__.create(db.engine)
+        print('تمت إعادة إنشاء status_daily_rollup. يرجى تشغيل: flask analytics rollup')
+
+
+@migration('0008', 'قيد NOT NULL والمفتاح الأجنبي لمعرفات الشعبة والحالة، ومعرف الشعبة في جدول العدادات')
+def enforce_department_keys():
+    from app.models import ClearanceStatus, ClearanceStatusHistory, StatusTransition, ClearanceCounter, Notification
+    from app.utils.clearance_counters import rebuild_counters
+
+    # الخطوة 0007 أضافت الأعمدة الجديدة بقيمة NULL افتراضية لتعبئتها على نطاقات
+    required = [
+        (ClearanceStatus, ['department_id', 'status_code']),
+        (ClearanceStatusHistory, ['department_id']),
+        (StatusTransition, ['department_id', 'new_status_code']),
+    ]
+    for model, names in required:
+        table = model.__tablename__
+        missing = {name: db.session.execute(text(f'SELECT COUNT(*) FROM {table} WHERE {name} IS NULL')).scalar()
+                   for name in names}
+        missing = {name: count for name, count in missing.items() if count}
+        if missing:
+            raise RuntimeError(f'صفوف بقيمة NULL في {table}: {missing}. يجب تصحيحها قبل إضافة قيد NOT NULL')
+        for name in _set_not_null(model, names):
+            print(f'تم جعل العمود {table}.{name} NOT NULL')
+
+    # ALTER TABLE ... ADD COLUMN في الخطوة 0007 لا ينشئ المفتاح الأجنبي المعرف في النموذج:
+    # يُضاف بعد التعبئة حتى تطابق قواعد البيانات المرحّلة الجديدة المنشأة بـ create_all
+    for model in (ClearanceStatus, ClearanceStatusHistory, StatusTransition, Notification):
+        for name in _ensure_foreign_keys(model):
+            print(f'تمت إضافة المفتاح الأجنبي {model.__tablename__}.{name}')
+
+    # جدول العدادات مشتق من سجلات براءة الذمة: يُعاد إنشاؤه بمعرف الشعبة ثم يُبنى من جديد
+    if 'department' in _existing_columns(ClearanceCounter.__tablename__):
+        ClearanceCounter.__table__.drop(db.engine)
+        ClearanceCounter.__table__.create(db.engine)
+        print(f'تمت إعادة إنشاء clearance_counter وبناء {rebuild_counters()} عداد')
+        db.session.commit()
+
+
+def pending_migrations():
+    """يعيد خطوات الترحيل التي لم تطبق بعد."""
+    applied = {m.version for m in SchemaMigration.query.all()}
+    return [m for m in MIGRATIONS if m[0] not in applied]
+
+
+def upgrade():
+    """يطبق جميع خطوات الترحيل المتبقية بالترتيب ويعيد أرقامها."""
+    # التأكد من وجود الجداول الجديدة (بما فيها جدول تتبع الترحيل نفسه)
+    db.create_all()
+
+    applied = []
+    for version, description, func in pending_migrations():
+        print(f'[{version}] {description}')
+        func()
+        db.session.add(SchemaMigration(version=version, applied_at=datetime.utcnow()))
+        db.session.commit()
+        applied.append(version)
+    return applied
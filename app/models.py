@@ -5,6 +5,49 @@ from .extensions import db
 from datetime import datetime
 
 
+# رموز حالات براءة الذمة المخزنة في قاعدة البيانات (SmallInteger بدلاً من النص)
+STATUS_CODES = {'pending': 0, 'approved': 1, 'rejected': 2}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+# نوع عمود حالة براءة الذمة: النص في Python ('pending'...) ورمز صغير في الجدول،
+# فتبقى المقارنات والإدخالات في الكود كما هي (ClearanceStatus.status == 'approved')
+class StatusCode(db.TypeDecorator):
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        # الحالة غير المعروفة تصبح NULL فلا تطابق أي سجل عند التصفية
+        return None if value is None else STATUS_CODES.get(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else STATUS_NAMES.get(value)
+
+
+# نوع عمود الشعبة: اسم الشعبة في Python ومعرفها الصغير (department.id) في الجدول،
+# والتحويل من سجل الشعب المحفوظ في ذاكرة العملية (app/utils/departments.py) دون استعلام
+class DepartmentKey(db.TypeDecorator):
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        from app.utils.departments import department_id
+        return None if value is None else department_id(value)
+
+    def process_result_value(self, value, dialect):
+        from app.utils.departments import department_name
+        return None if value is None else department_name(value)
+
+
+# نموذج الشعب (Department Model)
+# الشعب المعنية ببراءة الذمة، مرتبة حسب position. تشير إليها جداول السجلات بمعرف صغير بدلاً من تكرار الاسم.
+class Department(db.Model):
+    id       = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    name     = db.Column(db.String(100), nullable=False, unique=True) # اسم الشعبة
+    position = db.Column(db.SmallInteger, nullable=False, default=0) # ترتيب العرض
+    active   = db.Column(db.Boolean, nullable=False, default=True) # تُطلب موافقتها في الطلبات الجديدة
+
+
 # نموذج المستخدم (User Model)
 # يمثل جدول المستخدمين في قاعدة البيانات ويحتوي على بيانات الطلاب والموظفين والمدراء
 class User(db.Model, UserMixin):
@@ -21,6 +64,12 @@ class User(db.Model, UserMixin):
     study_type = db.Column(db.String(50), nullable=True)  # نوع الدراسة: صباحي/مسائي (للطلاب)
     created_at = db.Column(db.DateTime, default=datetime.utcnow) # تاريخ إنشاء الحساب
 
+    # فهارس مركبة للاستعلامات المتكررة: البحث عن مسؤولي الشعب، والتصفية حسب الدور والكلية
+    __table_args__ = (
+        db.Index('ix_user_role_department', 'role', 'department'),
+        db.Index('ix_user_role_college', 'role', 'college'),
+    )
+
     # خاصية لعرض الاسم المناسب حسب دور المستخدم
     @property
     def display_name(self):
@@ -61,14 +110,57 @@ class User(db.Model, UserMixin):
 class ClearanceStatus(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # معرف الطالب
-    department = db.Column(db.String(100), nullable=False)  # اسم الشعبة المعنية بالموافقة
-    status = db.Column(db.String(20), default='pending')  # الحالة: pending (قيد الانتظار), approved (موافق), rejected (مرفوض)
+    cycle_id = db.Column(db.Integer, db.ForeignKey('clearance_cycle.id'), nullable=False) # دورة براءة الذمة
+    department = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=False)  # الشعبة المعنية بالموافقة (اسمها في Python ومعرفها في الجدول)
+    status = db.Column('status_code', StatusCode, nullable=False, default='pending')  # الحالة: pending (قيد الانتظار), approved (موافق), rejected (مرفوض)
     comment = db.Column(db.Text, nullable=True) # ملاحظات مسؤول الشعبة
     updated_at = db.Column(db.DateTime, default=datetime.utcnow) # تاريخ آخر تحديث
 
     # علاقة مع نموذج المستخدم (الطالب)
     student = db.relationship('User', backref='clearance_statuses')
 
+    # سجل واحد فقط لكل (طالب، دورة، شعبة)، وفهرس لطلبات الشعبة حسب الحالة
+    # وفهرسا آخر تحديث (للشعبة وللنظام كاملاً) لحساب ETag لواجهات JSON دون قراءة السجلات
+    # جميع الاستعلامات تقتصر على الدورة الحالية، لذلك تبدأ الفهارس بعمود الدورة (بعد الطالب في قيد التفرد)
+    __table_args__ = (
+        db.Index('uq_clearance_status_student_cycle_department_id', 'student_id', 'cycle_id', 'department_id', unique=True),
+        db.Index('ix_clearance_status_cycle_department_id_status', 'cycle_id', 'department_id', 'status_code'),
+        db.Index('ix_clearance_status_cycle_department_id_updated', 'cycle_id', 'department_id', 'updated_at'),
+        db.Index('ix_clearance_status_cycle_updated_at', 'cycle_id', 'updated_at'),
+    )
+
+
+# نموذج دورات براءة الذمة (ClearanceCycle Model)
+# كل سجل براءة ذمة ينتمي إلى دورة، والدورة الحالية هي الدورة غير المغلقة.
+# عند إغلاق الدورة تُنقل سجلاتها إلى جدول السجل التاريخي على دفعات، فيبقى الجدول الحي صغيراً.
+class ClearanceCycle(db.Model):
+    id            = db.Column(db.Integer, primary_key=True)
+    name          = db.Column(db.String(100), nullable=False) # اسم الدورة (مثل العام الدراسي)
+    started_at    = db.Column(db.DateTime, default=datetime.utcnow, nullable=False) # تاريخ البدء
+    closed_at     = db.Column(db.DateTime, nullable=True) # تاريخ الإغلاق (فارغ للدورة الحالية)
+    archived_at   = db.Column(db.DateTime, nullable=True) # تاريخ انتهاء نقل السجلات إلى الأرشيف
+    archived_rows = db.Column(db.Integer, nullable=False, default=0) # عدد السجلات المنقولة
+
+
+# نموذج السجل التاريخي لحالات براءة الذمة (ClearanceStatusHistory Model)
+# نسخة من سجلات الدورات المغلقة بنفس المعرفات، للاطلاع والتقارير فقط
+class ClearanceStatusHistory(db.Model):
+    __tablename__ = 'clearance_status_history'
+
+    id          = db.Column(db.Integer, primary_key=True, autoincrement=False) # نفس معرف السجل الأصلي
+    cycle_id    = db.Column(db.Integer, db.ForeignKey('clearance_cycle.id'), nullable=False, index=True)
+    student_id  = db.Column(db.Integer, nullable=False) # معرف الطالب
+    department  = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=False)
+    status      = db.Column('status_code', StatusCode, nullable=True)
+    comment     = db.Column(db.Text, nullable=True)
+    updated_at  = db.Column(db.DateTime, nullable=True) # تاريخ آخر تحديث قبل الأرشفة
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow) # تاريخ الأرشفة
+
+    __table_args__ = (
+        # سجل الطالب عبر الدورات
+        db.Index('ix_clearance_status_history_student_cycle', 'student_id', 'cycle_id'),
+    )
+
 
 # نموذج الإشعارات (Notification Model)
 # يخزن الإشعارات الموجهة للمستخدمين
@@ -78,16 +170,31 @@ class Notification(db.Model):
     message = db.Column(db.String(255), nullable=False) # نص الإشعار
     timestamp = db.Column(db.DateTime, default=datetime.utcnow) # وقت الإشعار
     is_read = db.Column(db.Boolean, default=False) # هل تمت قراءة الإشعار أم لا
+    type = db.Column(db.String(30), nullable=True) # نوع الإشعار: clearance_request, status_update
+    related_student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # الطالب المعني بالإشعار
+    department = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=True) # الشعبة المعنية بالإشعار
 
     # علاقة مع نموذج المستخدم
-    user = db.relationship('User', backref='notifications')
+    user = db.relationship('User', backref='notifications', foreign_keys=[user_id])
+
+    # فهرس لعدّ الإشعارات غير المقروءة والبحث فيها لكل مستخدم
+    __table_args__ = (
+        db.Index('ix_notification_user_read', 'user_id', 'is_read'),
+        # صفحات الإشعارات (الأحدث أولاً) لكل مستخدم دون فرز
+        db.Index('ix_notification_user_id', 'user_id', 'id'),
+        # تعليم إشعارات نوع معين أو طالب معين كمقروءة بعبارة UPDATE واحدة
+        db.Index('ix_notification_user_type_student', 'user_id', 'type', 'related_student_id'),
+        db.Index('ix_notification_related_student', 'related_student_id'),
+        # مهمة تنظيف الإشعارات القديمة حسب حالة القراءة والعمر
+        db.Index('ix_notification_read_timestamp', 'is_read', 'timestamp'),
+    )
 
 
 # نموذج اشتراكات الإشعارات الفورية (PushSubscription Model)
 # يخزن بيانات الاشتراك لخدمة Web Push Notifications
 class PushSubscription(db.Model):
     id        = db.Column(db.Integer, primary_key=True)
-    user_id   = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # معرف المستخدم
+    user_id   = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True) # معرف المستخدم
     endpoint  = db.Column(db.Text,    nullable=False) # نقطة النهاية لإرسال الإشعار
     p256dh    = db.Column(db.Text,    nullable=False) # مفتاح التشفير العام
     auth      = db.Column(db.Text,    nullable=False) # مفتاح المصادقة
@@ -95,3 +202,199 @@ class PushSubscription(db.Model):
 
     # علاقة مع نموذج المستخدم
     user      = db.relationship('User', backref='push_subscriptions')
+
+
+# نموذج إصدارات مخطط قاعدة البيانات (SchemaMigration Model)
+# يسجل خطوات الترحيل (Migrations) التي تم تطبيقها على قاعدة بيانات قائمة
+class SchemaMigration(db.Model):
+    version    = db.Column(db.String(50), primary_key=True) # رقم الترحيل
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow) # تاريخ التطبيق
+
+
+# نموذج عدادات براءة الذمة (ClearanceCounter Model)
+# يخزن عدد الطلبات المعلقة والموافق عليها والمرفوضة لكل شعبة (ولكل كلية)
+# يتم تحديثه في نفس المعاملة (Transaction) مع كل تغيير في حالة الطلبات
+class ClearanceCounter(db.Model):
+    id         = db.Column(db.Integer, primary_key=True)
+    department = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=False) # الشعبة
+    college    = db.Column(db.String(100), nullable=False, default='') # كلية الطالب (فارغ إذا لم تحدد)
+    pending    = db.Column(db.Integer, nullable=False, default=0) # عدد الطلبات قيد الانتظار
+    approved   = db.Column(db.Integer, nullable=False, default=0) # عدد الطلبات الموافق عليها
+    rejected   = db.Column(db.Integer, nullable=False, default=0) # عدد الطلبات المرفوضة
+
+    __table_args__ = (
+        db.UniqueConstraint('department_id', 'college', name='uq_clearance_counter_department_id_college'),
+    )
+
+
+# نموذج ملخص براءة الذمة للطالب (ClearanceSummary Model)
+# صف واحد لكل طالب يحتوي على عدد الموافقات والرفض والانتظار وهل اكتملت براءة ذمته
+# يتم تحديثه في نفس المعاملة مع كل تغيير في حالة طلبات الطالب
+class ClearanceSummary(db.Model):
+    student_id   = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True) # معرف الطالب
+    total        = db.Column(db.Integer, nullable=False, default=0) # عدد سجلات الطالب
+    pending      = db.Column(db.Integer, nullable=False, default=0) # عدد الطلبات قيد الانتظار
+    approved     = db.Column(db.Integer, nullable=False, default=0) # عدد الموافقات
+    rejected     = db.Column(db.Integer, nullable=False, default=0) # عدد حالات الرفض
+    completed    = db.Column(db.Boolean, nullable=False, default=False, index=True) # هل اكتملت جميع الموافقات
+    completed_at = db.Column(db.DateTime, nullable=True) # تاريخ اكتمال براءة الذمة
+    updated_at   = db.Column(db.DateTime, default=datetime.utcnow) # تاريخ آخر تحديث
+
+    # علاقة مع نموذج المستخدم (الطالب)
+    student = db.relationship('User', backref=db.backref('clearance_summary', uselist=False))
+
+
+# نموذج مهام الاستيراد في الخلفية (ImportJob Model)
+# يتتبع حالة استيراد ملف Excel أثناء تنفيذه خارج طلب HTTP
+class ImportJob(db.Model):
+    id             = db.Column(db.Integer, primary_key=True)
+    created_by     = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True) # المدير الذي رفع الملف
+    filename       = db.Column(db.String(255), nullable=False) # اسم الملف الأصلي
+    status         = db.Column(db.String(20), nullable=False, default='queued') # الحالة: queued, running, completed, failed
+    total_rows     = db.Column(db.Integer, nullable=False, default=0) # عدد الأسطر في الملف
+    processed_rows = db.Column(db.Integer, nullable=False, default=0) # عدد الأسطر التي تمت معالجتها
+    imported_count = db.Column(db.Integer, nullable=False, default=0) # عدد الطلاب المضافين
+    error_count    = db.Column(db.Integer, nullable=False, default=0) # عدد الأسطر المرفوضة
+    errors         = db.Column(db.Text, nullable=True) # قائمة الأخطاء (JSON، أول 500 خطأ فقط)
+    created_at     = db.Column(db.DateTime, default=datetime.utcnow) # وقت رفع الملف
+    started_at     = db.Column(db.DateTime, nullable=True) # وقت بدء المعالجة
+    finished_at    = db.Column(db.DateTime, nullable=True) # وقت انتهاء المعالجة
+
+
+# نموذج صندوق الإشعارات الفورية الصادرة (PushOutbox Model)
+# تضاف الإشعارات هنا داخل معاملة الطلب نفسها، ويتولى عامل منفصل (flask push worker) إرسالها
+# مع إعادة المحاولة بتأخير متزايد، وتنقل إلى الحالة dead بعد استنفاد المحاولات.
+class PushOutbox(db.Model):
+    id              = db.Column(db.Integer, primary_key=True)
+    user_id         = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True) # المستخدم المستهدف
+    endpoint        = db.Column(db.Text, nullable=False) # نسخة من بيانات الاشتراك وقت الإضافة
+    p256dh          = db.Column(db.Text, nullable=False)
+    auth            = db.Column(db.Text, nullable=False)
+    payload         = db.Column(db.Text, nullable=False) # محتوى الإشعار (JSON)
+    status          = db.Column(db.String(10), nullable=False, default='pending') # الحالة: pending, sent, dead
+    attempts        = db.Column(db.Integer, nullable=False, default=0) # عدد محاولات الإرسال
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # موعد المحاولة التالية
+    last_error      = db.Column(db.Text, nullable=True) # آخر خطأ في الإرسال
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at         = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # استعلام العامل: الإشعارات المستحقة للإرسال
+        db.Index('ix_push_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+# نموذج صندوق البريد الصادر (MailOutbox Model)
+# رسائل الترحيب ببيانات الدخول تُحفظ هنا في معاملة إنشاء الحساب نفسها بدلاً من طابور الذاكرة، فلا تضيع عند
+# إعادة تشغيل العملية. يرسلها عامل منفصل (flask email worker) مع إعادة المحاولة، ويُمسح نصها (وفيه كلمة المرور)
+# بعد الإرسال.
+class MailOutbox(db.Model):
+    __tablename__ = 'mail_outbox'
+
+    id              = db.Column(db.Integer, primary_key=True)
+    user_id         = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True) # صاحب الحساب
+    recipient       = db.Column(db.String(120), nullable=False)
+    subject         = db.Column(db.String(255), nullable=False)
+    body            = db.Column(db.Text, nullable=True) # يُمسح بعد الإرسال
+    status          = db.Column(db.String(10), nullable=False, default='pending') # الحالة: pending, sent, dead
+    attempts        = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error      = db.Column(db.Text, nullable=True)
+    created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at         = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # استعلام العامل: الرسائل المستحقة للإرسال
+        db.Index('ix_mail_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+
+# نموذج أرشيف الإشعارات (NotificationArchive Model)
+# تنقل إليه مهمة التنظيف الإشعارات القديمة بدلاً من حذفها نهائياً (بدون مفاتيح أجنبية لأنه سجل تاريخي)
+class NotificationArchive(db.Model):
+    id                 = db.Column(db.Integer, primary_key=True) # نفس معرف الإشعار الأصلي
+    user_id            = db.Column(db.Integer, nullable=False, index=True)
+    message            = db.Column(db.String(255), nullable=False)
+    timestamp          = db.Column(db.DateTime)
+    is_read            = db.Column(db.Boolean)
+    type               = db.Column(db.String(30), nullable=True)
+    related_student_id = db.Column(db.Integer, nullable=True)
+    department         = db.Column('department_id', DepartmentKey, nullable=True)
+    archived_at        = db.Column(db.DateTime, default=datetime.utcnow) # وقت الأرشفة
+
+
+# نموذج أحداث البث المباشر (StreamEvent Model)
+# يضاف الحدث داخل معاملة التغيير نفسها، وتقرأ كل عملية خادم الأحداث الجديدة باستعلام واحد دوري
+# وتوزعها على اتصالات SSE المفتوحة لأصحابها. يسمح المعرف التسلسلي للمتصفح باستكمال ما فاته (Last-Event-ID).
+class StreamEvent(db.Model):
+    id         = db.Column(db.Integer, primary_key=True)
+    user_id    = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False) # المستخدم المستهدف
+    event      = db.Column(db.String(30), nullable=False) # نوع الحدث: status_update, clearance_request
+    payload    = db.Column(db.Text, nullable=False) # بيانات الحدث (JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # استكمال أحداث مستخدم بعد آخر معرف استلمه
+        db.Index('ix_stream_event_user_id', 'user_id', 'id'),
+    )
+
+
+# نموذج سجل انتقالات الحالة (StatusTransition Model)
+# سجل إضافة فقط (Append-only): صف لكل تغيير في حالة سجل براءة الذمة (الطلب، الموافقة، الرفض، الإعادة للانتظار)
+# يُضاف في نفس معاملة التغيير، ولا يُعدل أو يُحذف إلا مع حذف الطالب. waited_seconds مدة الانتظار قبل القرار
+# (من دخول الحالة pending حتى الخروج منها)، وتُبنى عليه إحصائيات زمن الإنجاز.
+class StatusTransition(db.Model):
+    __tablename__ = 'status_transition'
+
+    id             = db.Column(db.Integer, primary_key=True)
+    cycle_id       = db.Column(db.Integer, db.ForeignKey('clearance_cycle.id'), nullable=False)
+    student_id     = db.Column(db.Integer, nullable=False) # معرف الطالب
+    department     = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=False)
+    old_status     = db.Column('old_status_code', StatusCode, nullable=True) # فارغ عند تقديم الطلب
+    new_status     = db.Column('new_status_code', StatusCode, nullable=False)
+    officer_id     = db.Column(db.Integer, nullable=True) # مسؤول الشعبة صاحب القرار
+    waited_seconds = db.Column(db.Integer, nullable=True) # مدة الانتظار قبل القرار بالثواني
+    created_at     = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # نطاقات زمنية للإحصائيات والتجميع اليومي
+        db.Index('ix_status_transition_created_at', 'created_at'),
+        # آخر دخول للانتظار لسجلات الطالب (عند القرار)، وحذف سجلات الطالب
+        db.Index('ix_status_transition_student_department_id', 'student_id', 'cycle_id', 'department_id',
+                 'new_status_code', 'created_at'),
+    )
+
+
+# نموذج التجميع اليومي لانتقالات الحالة (StatusDailyRollup Model)
+# صف لكل (يوم، شعبة): أعداد اليوم، ووسيط زمن الإنجاز والمئين 95 للفترة المنتهية بذلك اليوم
+# تقرأ لوحة مدير النظام هذه الصفوف بدلاً من المرور على سجل الانتقالات
+class StatusDailyRollup(db.Model):
+    __tablename__ = 'status_daily_rollup'
+
+    id             = db.Column(db.Integer, primary_key=True)
+    day            = db.Column(db.Date, nullable=False) # اليوم (UTC)
+    department     = db.Column('department_id', DepartmentKey, db.ForeignKey('department.id'), nullable=False)
+    requests       = db.Column(db.Integer, nullable=False, default=0) # طلبات جديدة في اليوم
+    decisions      = db.Column(db.Integer, nullable=False, default=0) # قرارات (خروج من الانتظار) في اليوم
+    approved       = db.Column(db.Integer, nullable=False, default=0)
+    rejected       = db.Column(db.Integer, nullable=False, default=0)
+    median_seconds = db.Column(db.Integer, nullable=True) # وسيط زمن الإنجاز للفترة المنتهية بهذا اليوم
+    p95_seconds    = db.Column(db.Integer, nullable=True) # المئين 95 لزمن الإنجاز للفترة نفسها
+    window_decisions = db.Column(db.Integer, nullable=False, default=0) # عدد القرارات في الفترة
+    computed_at    = db.Column(db.DateTime, default=datetime.utcnow) # وقت آخر حساب
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'department_id', name='uq_status_daily_rollup_day_department_id'),
+    )
+
+
+# نموذج شهادة براءة الذمة المعروضة مسبقاً (ClearanceCertificate Model)
+# صف لكل طالب مكتمل في الدورة الحالية يشير إلى ملف الشهادة المحفوظ باسم بصمة محتواه (SHA-256).
+# يُحذف الصف عند أي تغيير لاحق في سجلات الطالب، فتُعرض الشهادة من جديد عند الحاجة.
+class ClearanceCertificate(db.Model):
+    __tablename__ = 'clearance_certificate'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True) # معرف الطالب
+    cycle_id   = db.Column(db.Integer, db.ForeignKey('clearance_cycle.id'), nullable=False) # دورة براءة الذمة
+    digest     = db.Column(db.String(64), nullable=False) # بصمة المحتوى (اسم الملف و ETag)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow) # وقت العرض
@@ -1,19 +1,42 @@
 import os
+import queue
 import pandas as pd
-from flask import Blueprint, render_template, redirect, url_for, flash, request, abort, current_app
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, abort, current_app, jsonify,
+                   stream_with_context, send_file)
 
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from datetime import datetime
 
 # تجميع كل الاستيرادات من داخل التطبيق هنا
-from app.extensions import db, DEPARTMENTS, csrf, mail
-from app.models import User, ClearanceStatus, Notification, PushSubscription
+from app.extensions import db, csrf, mail, background, email_dispatcher, fragment_cache, event_broker
+from app.models import (User, ClearanceStatus, ClearanceStatusHistory, Notification, PushSubscription, PushOutbox,
+                        ImportJob, StreamEvent, StatusTransition, ClearanceCertificate, MailOutbox)
 from app.forms import LoginForm, UpdateStatusForm, ClearanceRequestForm, RequestResetForm, ResetPasswordForm, AddUserForm, EditUserForm
-from app.utils.push_notifications import send_push_to_subscription
+from app.utils.push_outbox import enqueue_push
+from app.utils.mail_outbox import enqueue_mail, outbox as mail_outbox
+from app.utils.officer_routing import officers_for
+from app.utils.notifications import (notification_feed, notification_to_dict, unread_count, mark_read,
+                                     CLEARANCE_REQUEST)
+from app.utils.statistics import (get_dashboard_statistics, with_clearance_records, annotate_completion,
+                                  clearance_validators)
+from app.utils.pagination import keyset_paginate, clamp_per_page
+from app.utils import clearance_counters, clearance_summary, stream_events, status_transitions, certificates
+from app.utils.clearance_summary import completed_students_query
+from app.utils.import_jobs import create_import_job, run_import_job, job_to_dict
+from app.utils.conditional import conditional_json
+from app.utils.clearance_cycles import current_cycle_id, current_cycle, start_new_cycle, archive_closed_cycles
+from app.utils.clearance_export import EXPORT_FORMATS, export_filters, stream_csv, build_xlsx, stream_file
+from app.utils.user_cache import cache_info as user_cache_info
+from app.utils.fragment_cache import scoped_changes
+from app.utils.turnaround import turnaround_overview, refresh_if_stale
+from app.utils.departments import department_names
+from app.utils.work_queue import queue_page, normalize_status
+from app.utils.clearance_decisions import apply_decisions, summarize, max_decisions, NOT_FOUND, INVALID
 from flask_mail import Message
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
 from itsdangerous import URLSafeTimedSerializer
-from threading import Thread
 
 # تعريف المخطط (Blueprint) للمسارات الرئيسية
 main_routes = Blueprint('main', __name__)
@@ -84,20 +107,15 @@ def student():
     if current_user.role != 'student':
         return redirect(url_for('main.login'))
         
-    # جلب سجلات براءة الذمة الخاصة بالطالب
-    records = ClearanceStatus.query.filter_by(student_id=current_user.id).all()
-    # التحقق مما إذا كانت جميع الموافقات مقبولة
-    all_app = all(r.status == 'approved' for r in records)
-    form = ClearanceRequestForm() 
-    
+    # سجلات الطالب وحالة الاكتمال تُقرأ داخل جزء القالب المخزن (عند تغير البيانات فقط)
     return render_template(
         'student.html',
         student=current_user,
-        clearance_records=records,
-        all_approved=all_app,
+        load_clearance_records=lambda: ClearanceStatus.query.filter_by(
+            student_id=current_user.id, cycle_id=current_cycle_id()).all(),
+        is_clearance_completed=lambda: clearance_summary.is_completed(current_user.id),
+        stream_cursor=stream_events.resume_cursor(current_user.id),
         vapid_public_key=current_app.config.get('VAPID_PUBLIC_KEY'),
-        DEPARTMENTS=DEPARTMENTS,
-        form=form 
     )
 
 
@@ -109,43 +127,53 @@ def system_administrator():
     if current_user.role != 'system_admin':
         return redirect(url_for('main.login'))
 
-    # جلب قائمة الطلاب
-    students = User.query.filter_by(role='student').all()
-    
-    # حساب الإحصائيات
-    total_students = len(students)
-    completed_count = 0
-    pending_count = 0
-    
-    # تهيئة عداد الأقسام للمعلقات
-    pending_by_dept = {dept: 0 for dept in DEPARTMENTS}
+    per_page = clamp_per_page(request.args.get('per_page', type=int))
+
+    # --- جدول الطلاب: تصفية من جهة الخادم ثم جلب الصفحة الحالية فقط ---
+    student_filters = {
+        'college': request.args.get('s_college') or None,
+        'status': request.args.get('s_status') or None,
+    }
+    students_query = User.query.filter_by(role='student')
+    if student_filters['college']:
+        students_query = students_query.filter(User.college == student_filters['college'])
+    if student_filters['status'] == 'completed':
+        students_query = students_query.filter(User.id.in_(completed_students_query()))
+    elif student_filters['status'] == 'incomplete':
+        students_query = students_query.filter(User.id.notin_(completed_students_query()))
+
+    students_page = keyset_paginate(
+        with_clearance_records(students_query), User.id,
+        after=request.args.get('s_after', type=int),
+        before=request.args.get('s_before', type=int),
+        per_page=per_page
+    )
+    students = annotate_completion(students_page.items)
+
+    # --- جدول المستخدمين: نفس الأسلوب مع التصفية حسب الدور والكلية ---
+    user_filters = {
+        'role': request.args.get('u_role') or None,
+        'college': request.args.get('u_college') or None,
+    }
+    users_query = User.query
+    if user_filters['role']:
+        users_query = users_query.filter(User.role == user_filters['role'])
+    if user_filters['college']:
+        users_query = users_query.filter(User.college == user_filters['college'])
+
+    users_page = keyset_paginate(
+        users_query, User.id,
+        after=request.args.get('u_after', type=int),
+        before=request.args.get('u_before', type=int),
+        per_page=per_page
+    )
 
-    for student in students:
-        student.records = ClearanceStatus.query.filter_by(student_id=student.id).order_by(ClearanceStatus.department).all()
-        
-        # التحقق من اكتمال براءة الذمة للطالب
-        is_completed = (
-            student.records 
-            and len(student.records) == len(DEPARTMENTS) 
-            and all(r.status == 'approved' for r in student.records)
-        )
-        
-        if is_completed:
-            completed_count += 1
-            student.final_status = 'مكتمل'
-        else:
-            pending_count += 1
-            student.final_status = 'غير مكتمل'
-            
-            # حساب الأقسام التي لم توافق بعد
-            for r in student.records:
-                if r.status == 'pending':
-                    if r.department in pending_by_dept:
-                        pending_by_dept[r.department] += 1
+    # قائمة الكليات لخيارات التصفية
+    colleges = [c for (c,) in db.session.query(User.college).filter(User.college.isnot(None)).distinct().order_by(User.college)]
 
     # --- منطق إدارة المستخدمين ---
     user_form = AddUserForm()
-    active_tab = 'analytics'
+    active_tab = request.args.get('active_tab', 'analytics')
 
     # معالجة نموذج إضافة مستخدم جديد
     if 'submit' in request.form:
@@ -165,11 +193,11 @@ def system_administrator():
             )
             try:
                 db.session.add(new_user)
+                db.session.flush()
+                # بريد ترحيبي يحتوي على بيانات الدخول (صندوق البريد الصادر، يُحفظ مع الحساب نفسه)
+                enqueue_mail([(new_user.id, welcome_email_message(new_user, user_form.password.data))])
                 db.session.commit()
                 
-                # إرسال بريد ترحيبي يحتوي على بيانات الدخول
-                send_welcome_email(new_user, user_form.password.data)
-                
                 flash(f'تم إضافة المستخدم {new_user.full_name or new_user.username} بنجاح', 'success')
                 return redirect(url_for('main.system_administrator')) # نمط Post-Redirect-Get
             except Exception as e:
@@ -178,21 +206,32 @@ def system_administrator():
         else:
             active_tab = 'users'
 
-    all_users = User.query.order_by(User.id.asc()).all()
     edit_user_form = EditUserForm() # تهيئة نموذج التعديل لاستخدامه في النافذة المنبثقة
 
+    # آخر مهام استيراد ملفات Excel لعرض تقدمها
+    import_jobs = ImportJob.query.order_by(ImportJob.id.desc()).limit(5).all()
+
+    # زمن الإنجاز من جدول التجميع اليومي (يُحدّث في الخلفية عند تقادمه)
+    refresh_if_stale(background)
+
     return render_template(
         'system_administrator.html',
         students=students,
+        students_page=students_page,
+        student_filters=student_filters,
         vapid_public_key=current_app.config.get('VAPID_PUBLIC_KEY'),
-        total_students=total_students,
-        completed_count=completed_count,
-        pending_count=pending_count,
-        pending_by_dept=pending_by_dept,
-        DEPARTMENTS=DEPARTMENTS, 
+        # الإحصائيات تُحسب داخل جزء القالب المخزن، فلا تُنفذ استعلاماتها إلا عند تغير البيانات
+        dashboard_statistics=get_dashboard_statistics,
         user_form=user_form,
         edit_user_form=edit_user_form,
-        all_users=all_users,
+        all_users=users_page.items,
+        users_page=users_page,
+        user_filters=user_filters,
+        colleges=colleges,
+        per_page=per_page,
+        import_jobs=import_jobs,
+        current_cycle=current_cycle(),
+        turnaround=turnaround_overview(),
         active_tab=active_tab
     )
 
@@ -204,19 +243,33 @@ def section_head():
     if current_user.role != 'section_head':
         return redirect(url_for('main.login'))
     
-    # جلب الطلبات الخاصة بقسم المسؤول الحالي
+    # قائمة العمل: التصفية والبحث من جهة الخادم، والطالب محمل مع كل سجل في نفس الاستعلام
     # إذا كان المسؤول مخصصاً لكلية معينة، يتم تصفية الطلاب حسب تلك الكلية
-    query = ClearanceStatus.query.filter_by(department=current_user.department)
-    
-    if current_user.college:
-        query = query.join(User, ClearanceStatus.student_id == User.id).filter(User.college == current_user.college)
-        
-    records = query.all()
-    form = UpdateStatusForm()
+    filters = {
+        'status': normalize_status(request.args.get('status')),
+        'q': (request.args.get('q') or '').strip()[:100],
+    }
+    # الصفحة تُجلب داخل جزء القالب المخزن، فلا يُنفذ استعلامها عند إصابة الذاكرة المؤقتة
+    def load_records():
+        return queue_page(
+            current_user.department,
+            college=current_user.college,
+            status=filters['status'],
+            search=filters['q'] or None,
+            after=request.args.get('after', type=int),
+            before=request.args.get('before', type=int),
+            per_page=clamp_per_page(request.args.get('per_page', type=int)),
+        )
+    # أعداد الحالات من جدول العدادات (بدون عدّ سجلات الشعبة)
+    status_counts = clearance_counters.get_department_totals(current_user.college).get(
+        current_user.department, dict.fromkeys(clearance_counters.COUNTED_STATUSES, 0))
+
     return render_template(
         'section_head.html', 
-        records=records, 
-        form=form, 
+        load_records=load_records, 
+        filters=filters,
+        status_counts=status_counts,
+        stream_cursor=stream_events.resume_cursor(current_user.id),
         vapid_public_key=current_app.config.get('VAPID_PUBLIC_KEY')
     )
 
@@ -234,6 +287,7 @@ def edit_user(user_id):
     form = EditUserForm()
 
     if form.validate_on_submit():
+        old_college = user.college
         user.username = form.username.data if form.role.data != 'student' else None
         user.full_name = form.full_name.data
         user.email = form.email.data
@@ -257,6 +311,10 @@ def edit_user(user_id):
         # تحديث كلمة المرور فقط إذا تم إدخال قيمة جديدة
         if form.password.data:
             user.password_hash = generate_password_hash(form.password.data)
+
+        # نقل سجلات الطالب في العدادات إذا تغيرت كليته، وإبطال شهادته لأنها تعرض بياناته
+        clearance_counters.record_college_change(user, old_college, user.college)
+        certificates.invalidate([user.id])
             
         try:
             db.session.commit()
@@ -273,66 +331,99 @@ def edit_user(user_id):
 @login_required
 def update_status():
     """يتعامل مع تحديث مسؤول الشعبة لحالة الطالب."""
+    if current_user.role not in ('section_head', 'system_admin'):
+        flash('غير مصرح لك بهذا الإجراء', 'danger')
+        return redirect(url_for('main.home'))
+
     form = UpdateStatusForm()
     student_id = request.form.get('student_id')
-    department = request.form.get('department')
-    rec = ClearanceStatus.query.filter_by(student_id=student_id, department=department).first()
-
-    if not rec:
-        flash('السجل غير موجود', 'danger')
-        # توجيه ذكي حسب الدور
-        if current_user.role == 'system_admin':
-            return redirect(url_for('main.system_administrator'))
-        return redirect(url_for('main.section_head'))
+    # مسؤول الشعبة يعدل سجلات شعبته فقط، ومدير النظام يحدد الشعبة
+    if current_user.role == 'section_head':
+        department = current_user.department
+    else:
+        department = request.form.get('department')
 
     if form.validate_on_submit():
-        rec.status = form.status.data
-        rec.comment = form.comment.data
-        rec.updated_at = datetime.utcnow()
-        
-        # --- التنبيه الداخلي (Notification) ---
-        student_notification = Notification(
-            user_id=student_id,
-            message=f"شعبة {rec.department} غيّرت حالتك إلى {rec.status}"
+        # نفس خدمة القرارات الجماعية لقرار واحد (المسؤول المخصص لكلية يعدل طلاب كليته فقط)
+        results, applied = apply_decisions(
+            department,
+            [{'student_id': student_id, 'status': form.status.data, 'comment': form.comment.data}],
+            officer=current_user,
+            college=_decision_college(),
         )
-        db.session.add(student_notification)
-
-        # --- التنبيه الفوري (Push Notification) للويب ---
-        student_subs = PushSubscription.query.filter_by(user_id=student_id).all()
-        for s in student_subs:
-            send_push_to_subscription(
-                sub_info={ "endpoint": s.endpoint, "keys": {"p256dh": s.p256dh, "auth": s.auth} },
-                payload={ "title": "تحديث الحالة", "body": f"شعبة {rec.department} غيّرت حالتك إلى {rec.status}" }
-            )
-        
-        # --- البريد الإلكتروني ---
-        student_user = User.query.get(student_id)
-        if student_user and student_user.email:
-            try:
-                send_status_email(student_user, rec.department, rec.status, rec.comment)
-            except Exception as e:
-                print(f"Failed to send email: {e}")
-        
-        # تنظيف الإشعارات القديمة عند المسؤول
-        if student_user:
-            message_content = f"طلب براءة ذمة جديد من الطالب {student_user.university_id}."
-            notifications_to_read = Notification.query.filter_by(
-                user_id=current_user.id,
-                message=message_content,
-                is_read=False
-            ).all()
-            
-            for notif in notifications_to_read:
-                notif.is_read = True
-        
-        db.session.commit()
-        flash('تم تحديث الحالة بنجاح', 'success')
+        result = results[0]
+        if result['result'] in (NOT_FOUND, INVALID):
+            db.session.rollback()
+            flash(result['message'], 'danger')
+        else:
+            messages = _decision_emails(department, applied)
+            db.session.commit()
+            _send_decision_emails(messages)
+            flash('تم تحديث الحالة بنجاح', 'success')
     else:
         flash('حدث خطأ أثناء تحديث الحالة. يرجى المحاولة مرة أخرى.', 'danger')
 
     if current_user.role == 'system_admin':
         return redirect(url_for('main.system_administrator'))
-    return redirect(url_for('main.section_head'))
+    # العودة إلى نفس تصفية قائمة العمل
+    return redirect(url_for('main.section_head',
+                            status=request.form.get('queue_status') or None,
+                            q=request.form.get('queue_q') or None))
+
+
+def _decision_college():
+    """الكلية التي تقتصر عليها قرارات المستخدم الحالي (None = جميع الكليات)."""
+    if current_user.role == 'section_head':
+        return current_user.college or None
+    return None
+
+
+def _decision_emails(department, applied):
+    """ينشئ رسائل تحديث الحالة قبل الحفظ (حتى لا يعاد تحميل بيانات الطلاب بعد commit)."""
+    return [status_email(student, department, status, comment)
+            for student, status, comment in applied if student.email]
+
+
+def _send_decision_emails(messages):
+    """يضيف رسائل تحديث الحالة إلى طابور البريد بعد حفظ القرارات."""
+    for msg in messages:
+        try:
+            email_dispatcher.send(msg)
+        except Exception:
+            current_app.logger.exception(f'فشل إضافة رسالة تحديث الحالة إلى طابور البريد: {msg.recipients}')
+
+
+# قرارات جماعية من مسؤول الشعبة (موافقة/رفض عدة طلاب في طلب واحد)
+@main_routes.route('/section_head/decisions', methods=['POST'])
+@login_required
+def section_head_decisions():
+    """
+    يطبق دفعة قرارات على طلبات شعبة المسؤول في معاملة واحدة ويعيد نتيجة كل قرار (JSON).
+
+    الجسم: {"decisions": [{"student_id": 1, "status": "approved", "comment": ""}, ...]}
+    """
+    if current_user.role != 'section_head':
+        return jsonify(error='غير مصرح لك بهذا الإجراء'), 403
+
+    payload = request.get_json(silent=True) or {}
+    decisions = payload.get('decisions')
+    if not isinstance(decisions, list) or not decisions:
+        return jsonify(error='لم يتم تحديد أي قرار'), 400
+    if len(decisions) > max_decisions():
+        return jsonify(error=f'الحد الأقصى {max_decisions()} قرار في الطلب الواحد'), 400
+
+    try:
+        results, applied = apply_decisions(
+            current_user.department, decisions, officer=current_user, college=_decision_college())
+        messages = _decision_emails(current_user.department, applied)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('فشل حفظ القرارات الجماعية')
+        return jsonify(error='تعذر حفظ القرارات. يرجى المحاولة مرة أخرى.'), 500
+
+    _send_decision_emails(messages)
+    return jsonify(results=results, summary=summarize(results))
 
 
 # حذف مستخدم
@@ -351,11 +442,21 @@ def delete_user(user_id):
         try:
             # تنظيف البيانات المرتبطة
             if user.role == 'student':
+                clearance_counters.record_student_removal(user)
+                clearance_summary.remove_summary(user.id)
                 ClearanceStatus.query.filter_by(student_id=user.id).delete()
+                ClearanceStatusHistory.query.filter_by(student_id=user.id).delete()
+                StatusTransition.query.filter_by(student_id=user.id).delete()
+                ClearanceCertificate.query.filter_by(student_id=user.id).delete()
             
             # حذف الإشعارات والاشتراكات المرتبطة لتجنب خطأ التكامل المرجعي
-            Notification.query.filter_by(user_id=user.id).delete()
+            Notification.query.filter(
+                (Notification.user_id == user.id) | (Notification.related_student_id == user.id)
+            ).delete(synchronize_session=False)
             PushSubscription.query.filter_by(user_id=user.id).delete()
+            PushOutbox.query.filter_by(user_id=user.id).delete()
+            MailOutbox.query.filter_by(user_id=user.id).delete()
+            StreamEvent.query.filter_by(user_id=user.id).delete()
                 
             db.session.delete(user)
             db.session.commit()
@@ -378,37 +479,47 @@ def request_clearance():
         return redirect(url_for('main.login'))
 
     if form.validate_on_submit():
-        existing = ClearanceStatus.query.filter_by(student_id=current_user.id).first()
-        if existing:
+        now = datetime.utcnow()
+
+        # إنشاء سجلات جميع الشعب بإدخال مجمع واحد؛ قيد التفرد على (student_id, cycle_id, department)
+        # يمنع تكرار الطلب في نفس الدورة حتى مع الإرسال المزدوج المتزامن (بدلاً من التحقق ثم الإدخال)
+        cycle_id = current_cycle_id()
+        departments = department_names()
+        try:
+            with scoped_changes(departments=departments, students=[current_user.id]):
+                db.session.execute(insert(ClearanceStatus), [
+                    {'student_id': current_user.id, 'cycle_id': cycle_id, 'department': dept_name,
+                     'status': 'pending', 'updated_at': now}
+                    for dept_name in departments
+                ])
+        except IntegrityError:
+            db.session.rollback()
             flash('لقد أرسلت طلبًا سابقًا.', 'warning')
             return redirect(url_for('main.student'))
 
-        # إنشاء سجل لكل قسم
-        for dept_name in DEPARTMENTS:
-            db.session.add(ClearanceStatus(
-                student_id=current_user.id,
-                department=dept_name,
-                status='pending'
-            ))
-
-            # البحث عن مسؤول الشعبة وتنبيهه
-            officer_user = User.query.filter_by(role='section_head', department=dept_name).first()
-            if officer_user:
-                
-                message_content = f"طلب براءة ذمة جديد من الطالب {current_user.university_id}."
-                
-                admin_notification = Notification(
-                    user_id=officer_user.id,
-                    message=message_content
-                )
-                db.session.add(admin_notification)
-                
-                admin_subs = PushSubscription.query.filter_by(user_id=officer_user.id).all()
-                for sub in admin_subs:
-                    send_push_to_subscription(
-                        sub_info={ "endpoint": sub.endpoint, "keys": {"p256dh": sub.p256dh, "auth": sub.auth} },
-                        payload={ "title": "طلب براءة ذمة جديد", "body": message_content }
-                    )
+        # تنبيه مسؤولي الشعب المعنيين (من جدول التوجيه المحفوظ في الذاكرة)
+        officers = officers_for(current_user.college, departments)
+        officer_ids = sorted({officer_id for ids in officers.values() for officer_id in ids})
+        if officer_ids:
+            message_content = f"طلب براءة ذمة جديد من الطالب {current_user.university_id}."
+            db.session.execute(insert(Notification), [
+                {'user_id': officer_id, 'message': message_content, 'timestamp': now, 'is_read': False,
+                 'type': CLEARANCE_REQUEST, 'related_student_id': current_user.id}
+                for officer_id in officer_ids
+            ])
+            enqueue_push(officer_ids, { "title": "طلب براءة ذمة جديد", "body": message_content })
+            stream_events.publish([
+                (officer_id, stream_events.CLEARANCE_REQUEST,
+                 {'student_id': current_user.id, 'university_id': current_user.university_id,
+                  'name': current_user.full_name, 'college': current_user.college})
+                for officer_id in officer_ids
+            ])
+
+        # تسجيل الطلب في سجل الانتقالات وتحديث عدادات الشعب وإنشاء ملخص الطالب في نفس المعاملة
+        with scoped_changes(departments=departments, students=[current_user.id]):
+            status_transitions.record_requests(current_user.id, cycle_id, departments, now)
+            clearance_counters.record_requests(current_user.college, departments)
+            clearance_summary.create_summary(current_user.id, departments)
 
         db.session.commit() 
         flash('📨 تم تقديم طلب براءة الذمة بنجاح.', 'success')
@@ -458,13 +569,139 @@ def delete_subscription():
     return jsonify({'status': 'subscription deleted'})
 
 
+# صفحات الإشعارات (تستخدمها القائمة المنسدلة لتحميل الإشعارات الأقدم)
+@main_routes.route('/notifications')
+@login_required
+def notifications_feed():
+    """يعيد صفحة من إشعارات المستخدم (الأحدث أولاً) بصيغة JSON مع عدد غير المقروءة."""
+    page = notification_feed(
+        current_user.id,
+        after=request.args.get('after', type=int),
+        per_page=request.args.get('per_page', type=int)
+    )
+    return jsonify({
+        'items': [notification_to_dict(n) for n in page.items],
+        'next_cursor': page.next_cursor,
+        'unread_count': unread_count(current_user.id),
+    })
+
+
+# البث المباشر لتحديثات الحالة (Server-Sent Events)
+@main_routes.route('/stream')
+@login_required
+def stream():
+    """
+    يفتح اتصال SSE يستلم عليه المستخدم أحداثه فور حفظها (تحديث حالة للطالب، طلب جديد لمسؤول الشعبة).
+    الاتصال الخامل لا ينفذ أي استعلام: الأحداث تصله من EventBroker عبر طابور في الذاكرة.
+    """
+    user_id = current_user.id
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT', 15)
+    q = event_broker.subscribe(user_id)
+
+    # استكمال ما فات بعد مؤشر المتصفح (ترويسة Last-Event-ID عند إعادة الاتصال، أو معامل الصفحة عند أول اتصال):
+    # أحداث المستخدم بعد الحد عدا المسلم منها، ومنها ما حُفظ متأخراً بمعرف أقل من آخر حدث مسلم.
+    # يُقرأ بعد الاشتراك حتى لا يضيع حدث بينهما، ويُتجاهل ما يصل من الطابور مكرراً
+    cursor = (stream_events.parse_cursor(request.headers.get('Last-Event-ID'))
+              or stream_events.parse_cursor(request.args.get('last_event_id')))
+    watermark, delivered = cursor or (None, set())
+    events = stream_events.backlog(user_id, watermark, delivered) if cursor else []
+    delivered.update(e.id for e in events)
+    missed = [stream_events.to_sse(e, stream_events.format_cursor(watermark, delivered)) for e in events]
+    db.session.remove()  # لا حاجة لاتصال قاعدة البيانات طوال مدة البث
+
+    def generate():
+        sent_watermark, sent = watermark or 0, delivered
+        try:
+            yield 'retry: 5000\n\n'
+            yield from missed
+            while True:
+                try:
+                    event = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event is None:
+                    return  # أُغلق الاتصال لامتلاء طابوره، والمتصفح يعيد الاتصال ويستكمل
+                if event.id in sent or event.id <= sent_watermark:
+                    continue
+                # كل ما سبق حد الحدث وصل قبله عبر الطابور أو الاستكمال، فيُرفع حد الاتصال إليه
+                sent_watermark = max(sent_watermark, event.cursor)
+                sent = {event_id for event_id in sent if event_id > sent_watermark}
+                sent.add(event.id)
+                yield stream_events.to_sse(event, stream_events.format_cursor(sent_watermark, sent))
+        finally:
+            event_broker.unsubscribe(user_id, q)
+
+    response = current_app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # تعطيل التخزين المؤقت في nginx
+    return response
+
+
+# --- واجهات JSON للوحات التحكم (تدعم ETag و 304 Not Modified) ---
+
+@main_routes.route('/api/student/status')
+@login_required
+def api_student_status():
+    """يعيد حالة براءة ذمة الطالب الحالي في كل شعبة بصيغة JSON."""
+    if current_user.role != 'student':
+        return jsonify(error='غير مصرح لك بهذا الإجراء'), 403
+
+    def build():
+        records = (ClearanceStatus.query.filter_by(student_id=current_user.id, cycle_id=current_cycle_id())
+                   .order_by(ClearanceStatus.department).all())
+        summary = clearance_summary.get_summary(current_user.id)
+        return {
+            'submitted': bool(records),
+            'completed': bool(summary and summary.completed),
+            'counts': {status: getattr(summary, status) for status in clearance_summary.SUMMARY_STATUSES}
+                      if summary else None,
+            'records': [{
+                'department': r.department,
+                'status': r.status,
+                'comment': r.comment,
+                'updated_at': r.updated_at.isoformat() if r.updated_at else None,
+            } for r in records],
+        }
+
+    return conditional_json(
+        (current_user.id, *clearance_validators(student_id=current_user.id)), build)
+
+
+@main_routes.route('/api/section_head/counts')
+@login_required
+def api_section_head_counts():
+    """يعيد أعداد طلبات شعبة المسؤول الحالي حسب الحالة بصيغة JSON."""
+    if current_user.role != 'section_head':
+        return jsonify(error='غير مصرح لك بهذا الإجراء'), 403
+
+    department, college = current_user.department, current_user.college
+
+    def build():
+        counts = clearance_counters.get_department_totals(college).get(
+            department, dict.fromkeys(clearance_counters.COUNTED_STATUSES, 0))
+        return {'department': department, 'college': college, 'counts': counts}
+
+    return conditional_json(
+        (current_user.id, department, college, *clearance_validators(department=department, college=college)),
+        build)
+
+
+@main_routes.route('/api/admin/statistics')
+@login_required
+def api_admin_statistics():
+    """يعيد إحصائيات لوحة تحكم مدير النظام بصيغة JSON."""
+    if current_user.role != 'system_admin':
+        return jsonify(error='غير مصرح لك بهذا الإجراء'), 403
+    return conditional_json(clearance_validators(), get_dashboard_statistics)
+
+
 # تعليم الإشعارات كمقروءة
 @main_routes.route('/notifications/mark_read')
 @login_required
 def mark_notifications_read():
-    """يجعل كل الإشعارات الداخلية للمستخدم مقروءة."""
-    for n in current_user.notifications:
-        n.is_read = True
+    """يجعل كل الإشعارات الداخلية للمستخدم مقروءة (عبارة UPDATE واحدة)."""
+    mark_read(current_user.id)
     db.session.commit()
     
     if current_user.role == 'student':
@@ -479,32 +716,52 @@ def mark_notifications_read():
 @main_routes.route('/download_clearance_form')
 @login_required
 def download_clearance_form():
-    """يعرض صفحة طباعة براءة الذمة للطالب (فقط عند اكتمال الموافقات)."""
+    """
+    يحول الطالب إلى رابط شهادته المعروضة مسبقاً (فقط عند اكتمال الموافقات).
+    تُعرض الشهادة هنا فقط إذا لم تكن موجودة (قبل انتهاء مهمة الخلفية أو بعد إبطالها).
+    """
     if current_user.role != 'student':
         flash('غير مصرح لك بتنزيل النموذج', 'danger')
         return redirect(url_for('main.login'))
-        
-    records = ClearanceStatus.query.filter_by(student_id=current_user.id).all()
-    all_approved = all(r.status == 'approved' for r in records)
-    
-    if not all_approved:
-        flash('لا يمكنك تنزيل النموذج قبل اكتمال جميع الموافقات', 'warning')
-        return redirect(url_for('main.student'))
-        
-    return render_template('clearance_form.html', student=current_user, records=records)
 
-# --- دوال المساعدة للبريد الإلكتروني ---
+    digest = certificates.current_digest(current_user.id)
+    if digest is None:
+        # التحقق من الاكتمال من صف الملخص قبل تحميل السجلات التفصيلية
+        if not clearance_summary.is_completed(current_user.id):
+            flash('لا يمكنك تنزيل النموذج قبل اكتمال جميع الموافقات', 'warning')
+            return redirect(url_for('main.student'))
+        digest = certificates.snapshot(current_user.id)
+        if digest is None:
+            flash('تغيرت حالة طلبك، يرجى المحاولة مرة أخرى', 'warning')
+            return redirect(url_for('main.student'))
+
+    return redirect(url_for('main.clearance_certificate', digest=digest))
 
-def send_async_email(app, msg):
-    """إرسال البريد في الخلفية لتجنب تجميد الواجهة."""
-    with app.app_context():
-        try:
-            mail.send(msg)
-        except Exception as e:
-            print(f"Failed to send async email: {e}")
 
-def send_status_email(user, department, status, comment=None):
-    """إرسال بريد إلكتروني للطالب عند تحديث حالته."""
+# شهادة براءة الذمة المحفوظة (المحتوى لا يتغير لأن الرابط يحمل بصمته)
+@main_routes.route('/certificate/<digest>')
+@login_required
+def clearance_certificate(digest):
+    """يرسل ملف الشهادة بـ ETag قوي (البصمة) وتخزين immutable؛ والشهادة المبطلة لا تُرسل."""
+    if current_user.role != 'student' or certificates.current_digest(current_user.id) != digest:
+        abort(404)
+
+    path = certificates.certificate_path(digest)
+    if not os.path.exists(path):
+        # الملف حُذف من القرص: إبطال الصف وإعادة العرض
+        certificates.invalidate([current_user.id])
+        db.session.commit()
+        return redirect(url_for('main.download_clearance_form'))
+
+    response = send_file(path, mimetype='text/html', etag=digest, conditional=True)
+    response.headers['Cache-Control'] = (
+        f"private, max-age={current_app.config.get('CERTIFICATE_MAX_AGE', 31536000)}, immutable")
+    return response
+
+# --- دوال المساعدة للبريد الإلكتروني ---
+
+def status_email(user, department, status, comment=None):
+    """ينشئ رسالة البريد الإلكتروني للطالب عند تحديث حالته."""
     status_text = {
         'approved': 'موافق ✅',
         'rejected': 'مرفوض ❌'
@@ -522,12 +779,12 @@ def send_status_email(user, department, status, comment=None):
     if comment:
         msg.body += f'ملاحظة: {comment}\n'
         
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    return msg
 
-def send_welcome_email(user, raw_password):
-    """إرسال بريد ترحيبي يحتوي على بيانات الدخول عند إنشاء الحساب."""
+def welcome_email_message(user, raw_password):
+    """رسالة الترحيب ببيانات الدخول (None إذا لم يكن للمستخدم بريد)."""
     if not user.email:
-        return
+        return None
         
     msg = Message('مرحباً بك في نظام الفضاء الوظيفي',
                   sender=current_app.config.get('MAIL_USERNAME'),
@@ -546,7 +803,7 @@ def send_welcome_email(user, raw_password):
 
 رابط النظام: {url_for('main.login', _external=True)}
 '''
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    return msg
 
 def send_reset_email(user):
     """إرسال بريد إعادة تعيين كلمة المرور."""
@@ -559,7 +816,7 @@ def send_reset_email(user):
 
 إذا لم تطلب هذا التغيير، فتجاهل هذه الرسالة ولن يحدث أي تغيير.
 '''
-    Thread(target=send_async_email, args=(current_app._get_current_object(), msg)).start()
+    email_dispatcher.send(msg)
 
 # طلب إعادة تعيين كلمة المرور
 @main_routes.route("/reset_password", methods=['GET', 'POST'])
@@ -593,27 +850,56 @@ def reset_token(token):
     return render_template('reset_token.html', title='تعيين كلمة المرور', form=form)
 
 
+# تصدير حالة براءة الذمة (CSV أو XLSX)
+@main_routes.route('/system_admin/export')
+@login_required
+def export_clearances():
+    """
+    يصدر حالة كل طالب في كل شعبة مع التصفية حسب الكلية والمرحلة ونوع الدراسة والاكتمال.
+    الملف يُكتب ويُرسل على دفعات، فلا تُحمّل بيانات جميع الطلاب في الذاكرة.
+    """
+    if current_user.role != 'system_admin':
+        abort(403)
+    file_format = request.args.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        abort(400)
+
+    filters = export_filters(request.args)
+    filename = f"clearance_{datetime.utcnow():%Y%m%d_%H%M}.{file_format}"
+    if file_format == 'csv':
+        body = stream_with_context(stream_csv(filters))
+        headers = {}
+    else:
+        path = build_xlsx(filters)
+        body = stream_file(path)
+        headers = {'Content-Length': str(os.path.getsize(path))}
+
+    response = current_app.response_class(body, mimetype=EXPORT_FORMATS[file_format], headers=headers)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
 # زر خاص لمدير النظام لتصفير البيانات (لبدء دورة جديدة)
 @main_routes.route('/system_admin/reset_all_clearances', methods=['POST'])
 @login_required
 def reset_all_clearances():
-    """يحذف جميع سجلات براءة الذمة لبدء دورة جديدة."""
+    """يغلق دورة براءة الذمة الحالية ويبدأ دورة جديدة، ثم يؤرشف سجلات الدورة السابقة في الخلفية."""
     if current_user.role != 'system_admin':
         flash('غير مصرح لك بهذا الإجراء', 'danger')
         return redirect(url_for('main.home'))
 
     try:
-        # حذف جميع السجلات من جدول ClearanceStatus
-        num_deleted_clearances = db.session.query(ClearanceStatus).delete()
-        
-        # حذف جميع الإشعارات (اختياري حسب الطلب)
-        num_deleted_notifications = db.session.query(Notification).delete()
-        
-        db.session.commit()
-        flash(f'تم بدء دورة جديدة. تم حذف {num_deleted_clearances} سجل براءة ذمة و {num_deleted_notifications} إشعار.', 'success')
+        # معاملة قصيرة: سجلات الدورة السابقة تختفي من جميع الاستعلامات فوراً دون حذفها
+        _, cycle = start_new_cycle((request.form.get('name') or '').strip()[:100] or None)
+
+        # نقل السجلات إلى الأرشيف وتنظيف الإشعارات القديمة على دفعات صغيرة بدلاً من DELETE واحد يقفل الجداول
+        background.submit(archive_closed_cycles)
+
+        flash(f'تم بدء دورة جديدة ({cycle.name}). تتم أرشفة سجلات الدورة السابقة في الخلفية.', 'success')
     except Exception as e:
         db.session.rollback()
-        flash(f'حدث خطأ أثناء إعادة التعيين: {str(e)}', 'danger')
+        flash(f'حدث خطأ أثناء بدء الدورة الجديدة: {str(e)}', 'danger')
 
     return redirect(url_for('main.system_administrator'))
 
@@ -633,84 +919,39 @@ def import_students():
         return redirect(url_for('main.system_administrator', active_tab='users'))
 
     if file and (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
-        try:
-            # قراءة ملف الإكسل باستخدام pandas
-            df = pd.read_excel(file)
-            
-            # تنظيف أسماء الأعمدة (إزالة المسافات الزائدة)
-            df.columns = df.columns.str.strip()
+        # حفظ الملف وتنفيذ الاستيراد في الخلفية حتى لا ينتظر الطلب انتهاء المعالجة
+        job, path = create_import_job(file, current_user)
+        background.submit(run_import_job, job.id, path, base_url=request.host_url)
+        flash(f'تم رفع الملف "{job.filename}" وجاري استيراده في الخلفية. يمكنك متابعة التقدم أدناه.', 'info')
+    else:
+        flash('الرجاء رفع ملف Excel بصيغة .xlsx أو .xls', 'danger')
 
-            # التحقق من الأعمدة المطلوبة
-            required_columns = ['الرقم الجامعي', 'الاسم الكامل']
-            if not all(col in df.columns for col in required_columns):
-                flash(f'الملف يجب أن يحتوي على الأعمدة التالية: {", ".join(required_columns)}', 'danger')
-                return redirect(url_for('main.system_administrator', active_tab='users'))
+    return redirect(url_for('main.system_administrator', active_tab='users'))
 
-            success_count = 0
-            errors = []
-            imported_passwords = []
 
-            for index, row in df.iterrows():
-                try:
-                    uni_id = str(row['الرقم الجامعي']).strip()
-                    full_name = str(row['الاسم الكامل']).strip()
-                    
-                    # دالة مساعدة لجلب القيمة من عدة احتمالات لاسم العمود
-                    def get_val(possible_cols):
-                        for col in possible_cols:
-                            if col in df.columns and pd.notna(row[col]):
-                                return str(row[col]).strip()
-                        return None
-
-                    email = get_val(['البريد الإلكتروني', 'البريد الالكتروني', 'email', 'Email'])
-                    department = get_val(['القسم', 'الشعبة', 'department', 'Department'])
-                    college = get_val(['الكلية', 'college', 'College'])
-                    stage = get_val(['المرحلة', 'stage', 'Stage'])
-                    study_type = get_val(['نوع الدراسة', 'نوع الدراسة', 'Study Type'])
-
-                    # التحقق مما إذا كان الطالب موجوداً مسبقاً
-                    existing_user = User.query.filter_by(university_id=uni_id).first()
-                    if existing_user:
-                        errors.append(f"الطالب {uni_id} موجود مسبقاً.")
-                        continue
-
-                    # توليد كلمة مرور قوية عشوائية (12 حرف)
-                    import string, random
-                    chars = string.ascii_letters + string.digits + '!@#$%&*'
-                    generated_password = ''.join(random.choice(chars) for _ in range(12))
-
-                    # إنشاء حساب جديد
-                    new_student = User(
-                        university_id=uni_id,
-                        username=uni_id,
-                        full_name=full_name,
-                        email=email,
-                        role='student',
-                        department=department,
-                        college=college,
-                        stage=stage,
-                        study_type=study_type
-                    )
-                    new_student.set_password(generated_password)
-                    db.session.add(new_student)
-                    
-                    # إرسال بريد ترحيبي للطالب فور إضافة الحساب
-                    send_welcome_email(new_student, generated_password)
-                    
-                    success_count += 1
-
-                except Exception as e:
-                    errors.append(f"خطأ في السطر {index + 2}: {str(e)}")
+@main_routes.route('/system_admin/email_metrics')
+@login_required
+def email_metrics():
+    """يعيد إحصائيات طابور البريد في العملية الحالية وحالات صندوق البريد الصادر (رسائل الترحيب) بصيغة JSON."""
+    if current_user.role != 'system_admin':
+        abort(403)
+    return jsonify({**email_dispatcher.get_metrics(), 'outbox': mail_outbox.status()})
 
-            db.session.commit()
-            
-            if success_count > 0:
-                flash(f'تم استيراد {success_count} طالب بنجاح.', 'success')
-            
 
-        except Exception as e:
-            flash(f'حدث خطأ أثناء معالجة الملف: {str(e)}', 'danger')
-    else:
-        flash('الرجاء رفع ملف Excel بصيغة .xlsx أو .xls', 'danger')
+@main_routes.route('/system_admin/cache_metrics')
+@login_required
+def cache_metrics():
+    """يعيد إحصائيات ذاكرة أجزاء الصفحات وذاكرة هوية المستخدم وموزع البث المباشر في العملية الحالية بصيغة JSON."""
+    if current_user.role != 'system_admin':
+        abort(403)
+    return jsonify(fragments=fragment_cache.get_metrics(), users=user_cache_info(), stream=event_broker.get_metrics())
 
-    return redirect(url_for('main.system_administrator', active_tab='users'))
+
+@main_routes.route('/system_admin/import_jobs/<int:job_id>')
+@login_required
+def import_job_status(job_id):
+    """يعيد حالة مهمة الاستيراد وتقدمها بصيغة JSON (تستدعيها الواجهة دورياً)."""
+    if current_user.role != 'system_admin':
+        abort(403)
+    job = db.session.get(ImportJob, job_id) or abort(404)
+    return jsonify(job_to_dict(job))
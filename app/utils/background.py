@@ -0,0 +1,43 @@
+# app/utils/background.py
+# تنفيذ المهام الطويلة في الخلفية خارج طلبات HTTP
+# يستخدم مجموعة خيوط محدودة (Bounded Thread Pool)، فالمهام الزائدة تنتظر في الطابور
+# بدلاً من حجز عمليات خادم الويب أو إنشاء خيط جديد لكل مهمة
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundExecutor:
+    """منفذ مهام الخلفية، يُهيأ مع التطبيق مثل بقية الإضافات (Extensions)."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        # عدد المهام التي تعمل بالتوازي (الباقي ينتظر في الطابور)
+        workers = app.config.get('BACKGROUND_WORKERS', 1)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='background')
+        app.extensions['background'] = self
+
+    def submit(self, func, *args, base_url=None, **kwargs):
+        """
+        يضيف مهمة إلى الطابور لتنفيذها داخل سياق التطبيق.
+
+        المعاملات:
+        base_url: رابط الموقع لتمكين url_for(_external=True) داخل المهمة (مثل روابط البريد).
+        """
+        app = self.app
+
+        def run():
+            # سياق طلب وهمي حتى تعمل url_for كما في الطلب الأصلي
+            with app.test_request_context(base_url=base_url):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    app.logger.exception('فشل تنفيذ مهمة في الخلفية')
+                    raise
+
+        return self._executor.submit(run)
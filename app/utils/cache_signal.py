@@ -0,0 +1,40 @@
+# app/utils/cache_signal.py
+# إشارة إبطال الذاكرة المؤقتة بين العمليات (Cross-process Cache Invalidation)
+# كل عملية من عمليات خادم الويب تحتفظ بنسختها الخاصة من الذاكرة المؤقتة، لذلك يُستخدم ملف صغير
+# داخل مجلد instance كإشارة: تغيير وقت تعديله (mtime) يعني أن جميع النسخ أصبحت قديمة.
+# قراءة الإشارة تكلف استدعاء os.stat واحد فقط بدلاً من استعلام قاعدة بيانات.
+
+import os
+import time
+
+from flask import current_app
+
+
+class FileSignal:
+    """إشارة إبطال مسماة مخزنة كملف في instance/cache/<name>.signal."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def _path(self):
+        folder = os.path.join(current_app.instance_path, 'cache')
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f'{self.name}.signal')
+
+    def version(self):
+        """يعيد رقم الإصدار الحالي للإشارة (0 إذا لم تُرسل من قبل)."""
+        try:
+            return os.stat(self._path()).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        """يبطل جميع النسخ المؤقتة المرتبطة بالإشارة في جميع العمليات."""
+        path = self._path()
+        previous = self.version()
+        with open(path, 'a'):
+            pass
+        # ضمان تغير الإصدار حتى لو تكرر الإبطال خلال نفس وحدة الزمن لنظام الملفات
+        now = max(time.time_ns(), previous + 1)
+        os.utime(path, ns=(now, now))
+        return now
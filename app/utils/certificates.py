@@ -0,0 +1,152 @@
+# app/utils/certificates.py
+# شهادات براءة الذمة المعروضة مسبقاً (Content-addressed)
+# عند اكتمال موافقات الطالب تُعرض الشهادة مرة واحدة في الخلفية (بعد حفظ القرار) وتُحفظ في ملف اسمه بصمة
+# محتواه SHA-256، ويشير صف ClearanceCertificate إلى البصمة. رابط الشهادة يحمل البصمة، فمحتواه لا يتغير أبداً
+# ويُرسل بـ ETag قوي وتخزين immutable في المتصفح. أي تغيير لاحق في سجلات الطالب يحذف الصف في نفس المعاملة،
+# فتُعرض الشهادة من جديد عند الطلب التالي.
+
+import hashlib
+import os
+import tempfile
+
+from flask import current_app, render_template
+from sqlalchemy import select, insert, delete, event
+
+from app.extensions import db
+from app.models import User, ClearanceStatus, ClearanceSummary, ClearanceCertificate
+from app.utils.clearance_cycles import current_cycle_id
+
+
+def certificate_dir():
+    folder = current_app.config.get('CERTIFICATE_DIR') or os.path.join(current_app.instance_path, 'certificates')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def certificate_path(digest):
+    return os.path.join(certificate_dir(), f'{digest}.html')
+
+
+def store(html):
+    """يحفظ المحتوى باسم بصمته (كتابة ذرية، ولا يُعاد كتابة محتوى موجود) ويعيد البصمة."""
+    data = html.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    path = certificate_path(digest)
+    if not os.path.exists(path):
+        fd, temp_path = tempfile.mkstemp(dir=certificate_dir(), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+    return digest
+
+
+def current_digest(student_id):
+    """بصمة شهادة الطالب في الدورة الحالية (None إذا لم تُعرض بعد أو أُبطلت)."""
+    return db.session.scalar(
+        select(ClearanceCertificate.digest)
+        .where(ClearanceCertificate.student_id == student_id, ClearanceCertificate.cycle_id == current_cycle_id())
+    )
+
+
+def render_certificate(student, summary):
+    records = ClearanceStatus.query.filter_by(student_id=student.id, cycle_id=current_cycle_id()).all()
+    return render_template('clearance_form.html', student=student, records=records,
+                           completed_at=summary.completed_at)
+
+
+def snapshot(student_id):
+    """
+    يعرض شهادة الطالب المكتمل ويحفظها ثم يسجل بصمتها (commit)، ويعيد البصمة
+    أو None إذا لم يكن الطالب مكتملاً.
+
+    لا تُسجل البصمة إذا تغير ملخص الطالب أثناء العرض: القرارات تقفل صف الملخص نفسه،
+    فإما أن يسبق القرار التسجيل (فيظهر التغيير هنا) أو يليه (فيحذف الصف).
+    """
+    summary = db.session.get(ClearanceSummary, student_id)
+    student = db.session.get(User, student_id)
+    if summary is None or student is None or not summary.completed:
+        return None
+    rendered_version = summary.updated_at
+    digest = store(render_certificate(student, summary))
+
+    locked = db.session.execute(
+        select(ClearanceSummary.completed, ClearanceSummary.updated_at)
+        .where(ClearanceSummary.student_id == student_id)
+        .with_for_update()
+    ).one_or_none()
+    if locked is None or not locked.completed or locked.updated_at != rendered_version:
+        db.session.rollback()
+        return None
+
+    db.session.execute(
+        delete(ClearanceCertificate).where(ClearanceCertificate.student_id == student_id),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.execute(insert(ClearanceCertificate).values(
+        student_id=student_id, cycle_id=current_cycle_id(), digest=digest))
+    db.session.commit()
+    return digest
+
+
+def snapshot_many(student_ids):
+    """يعرض شهادات دفعة من الطلاب (مهمة الخلفية بعد القرارات) ويعيد عدد المحفوظ."""
+    return sum(snapshot(student_id) is not None for student_id in student_ids)
+
+
+def invalidate(student_ids):
+    """يحذف شهادات الطلاب في المعاملة الحالية (دون commit)؛ تبقى الملفات حتى purge_orphans."""
+    if student_ids:
+        db.session.execute(
+            delete(ClearanceCertificate).where(ClearanceCertificate.student_id.in_(student_ids)),
+            execution_options={'synchronize_session': False},
+        )
+
+
+def reset_certificates():
+    """يحذف جميع الشهادات (عند بدء دورة جديدة)."""
+    db.session.execute(delete(ClearanceCertificate), execution_options={'synchronize_session': False})
+
+
+def schedule_snapshots(student_ids):
+    """يطلب عرض شهادات الطلاب في الخلفية بعد حفظ المعاملة الحالية (ويُلغى الطلب عند التراجع عنها)."""
+    if student_ids:
+        db.session.info.setdefault('certificate_snapshots', set()).update(student_ids)
+
+
+def purge_orphans():
+    """يحذف ملفات الشهادات التي لا يشير إليها أي صف، ويعيد عددها."""
+    referenced = set(db.session.scalars(select(ClearanceCertificate.digest)))
+    folder = certificate_dir()
+    removed = 0
+    for name in os.listdir(folder):
+        digest, extension = os.path.splitext(name)
+        if extension == '.html' and digest not in referenced:
+            os.remove(os.path.join(folder, name))
+            removed += 1
+    return removed
+
+
+_events = {'registered': False}
+
+
+def init_certificates(app):
+    """يربط طلبات العرض المؤجلة بحفظ الجلسة: بعد commit تُرسل إلى منفذ المهام في الخلفية."""
+    from app.extensions import background
+
+    if _events['registered']:
+        return
+    _events['registered'] = True
+
+    @event.listens_for(db.session, 'after_commit')
+    def _snapshot_after_commit(session):
+        student_ids = session.info.pop('certificate_snapshots', None)
+        if student_ids:
+            background.submit(snapshot_many, sorted(student_ids))
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard_after_rollback(session):
+        session.info.pop('certificate_snapshots', None)
@@ -0,0 +1,203 @@
+# app/utils/clearance_counters.py
+# صيانة عدادات براءة الذمة لكل شعبة وكلية بشكل تراكمي (Incremental Counters)
+# جميع الدوال هنا تعمل داخل الجلسة الحالية ولا تقوم بعمل commit،
+# لذلك يتم حفظ العدادات في نفس المعاملة مع التغيير الذي سببها
+
+from collections import defaultdict
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import User, ClearanceStatus, ClearanceCounter
+from app.utils.clearance_cycles import current_cycle_id
+
+# الحالات التي يتم عدّها (أي حالة أخرى يتم تجاهلها)
+COUNTED_STATUSES = ('pending', 'approved', 'rejected')
+
+
+def _college_key(college):
+    """يحول الكلية الفارغة إلى نص فارغ لاستخدامها كمفتاح في جدول العدادات."""
+    return college or ''
+
+
+def _apply_deltas(department, college, deltas):
+    """
+    يضيف الفروقات المحددة إلى عداد (شعبة، كلية) باستخدام UPDATE ذري،
+    وينشئ صف العداد إذا لم يكن موجوداً.
+
+    المعاملات:
+    deltas (dict): الفرق لكل حالة، مثل {'pending': -1, 'approved': 1}.
+    """
+    deltas = {status: delta for status, delta in deltas.items() if status in COUNTED_STATUSES and delta}
+    if not deltas:
+        return
+
+    college = _college_key(college)
+    values = {getattr(ClearanceCounter, status): getattr(ClearanceCounter, status) + delta
+              for status, delta in deltas.items()}
+
+    def update():
+        return (
+            db.session.query(ClearanceCounter)
+            .filter_by(department=department, college=college)
+            .update(values, synchronize_session=False)
+        )
+
+    if update():
+        return
+
+    # لا يوجد صف لهذا العداد بعد: إنشاؤه داخل نقطة حفظ (Savepoint)
+    # حتى لا يفشل الطلب بالكامل إذا أنشأه طلب متزامن آخر في نفس اللحظة
+    try:
+        with db.session.begin_nested():
+            db.session.add(ClearanceCounter(department=department, college=college, **deltas))
+    except IntegrityError:
+        update()
+
+
+def record_requests(college, departments):
+    """يسجل طلبات جديدة بحالة قيد الانتظار لكل شعبة من الشعب المحددة."""
+    # تحديث عدادات جميع الشعب الموجودة بعبارة UPDATE واحدة، ثم إنشاء العدادات الناقصة فقط
+    college_key = _college_key(college)
+    updated = (
+        db.session.query(ClearanceCounter)
+        .filter(ClearanceCounter.college == college_key, ClearanceCounter.department.in_(departments))
+        .update({ClearanceCounter.pending: ClearanceCounter.pending + 1}, synchronize_session=False)
+    )
+    if updated == len(departments):
+        return
+
+    existing = {d for (d,) in db.session.query(ClearanceCounter.department)
+                .filter(ClearanceCounter.college == college_key, ClearanceCounter.department.in_(departments))}
+    for department in departments:
+        if department not in existing:
+            _apply_deltas(department, college, {'pending': 1})
+
+
+def record_status_change(department, college, old_status, new_status):
+    """ينقل طلباً واحداً من حالته القديمة إلى الجديدة في عداد الشعبة."""
+    if old_status == new_status:
+        return
+    _apply_deltas(department, college, {old_status: -1, new_status: 1})
+
+
+def record_status_changes(department, changes):
+    """
+    يسجل دفعة من تغييرات الحالة في شعبة واحدة بعبارة UPDATE واحدة لكل كلية.
+
+    المعاملات:
+    changes: قائمة (college, old_status, new_status).
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for college, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        deltas[_college_key(college)][old_status] -= 1
+        deltas[_college_key(college)][new_status] += 1
+    for college, college_deltas in deltas.items():
+        _apply_deltas(department, college, college_deltas)
+
+
+def _student_status_counts(student_id):
+    """يعيد عدد سجلات الطالب مجمعة حسب (الشعبة، الحالة)."""
+    return (
+        db.session.query(ClearanceStatus.department, ClearanceStatus.status, func.count(ClearanceStatus.id))
+        .filter(ClearanceStatus.student_id == student_id, ClearanceStatus.cycle_id == current_cycle_id())
+        .group_by(ClearanceStatus.department, ClearanceStatus.status)
+        .all()
+    )
+
+
+def record_student_removal(student):
+    """يطرح جميع سجلات الطالب من العدادات (يستدعى قبل حذف سجلاته)."""
+    for department, status, count in _student_status_counts(student.id):
+        _apply_deltas(department, student.college, {status: -count})
+
+
+def record_college_change(student, old_college, new_college):
+    """ينقل سجلات الطالب من عداد كليته القديمة إلى الجديدة عند تعديل بياناته."""
+    if _college_key(old_college) == _college_key(new_college):
+        return
+    for department, status, count in _student_status_counts(student.id):
+        _apply_deltas(department, old_college, {status: -count})
+        _apply_deltas(department, new_college, {status: count})
+
+
+def reset_counters():
+    """يحذف جميع العدادات (عند بدء دورة جديدة)."""
+    db.session.query(ClearanceCounter).delete(synchronize_session=False)
+
+
+def get_department_totals(college=None):
+    """
+    يعيد إجمالي الحالات لكل شعبة من جدول العدادات مباشرة.
+
+    المعاملات:
+    college: لتقييد النتائج بكلية محددة (اختياري).
+
+    يعيد قاموساً بالشكل {department: {'pending': n, 'approved': n, 'rejected': n}}.
+    """
+    query = db.session.query(
+        ClearanceCounter.department,
+        func.sum(ClearanceCounter.pending),
+        func.sum(ClearanceCounter.approved),
+        func.sum(ClearanceCounter.rejected),
+    )
+    if college is not None:
+        query = query.filter(ClearanceCounter.college == _college_key(college))
+
+    totals = {}
+    for department, pending, approved, rejected in query.group_by(ClearanceCounter.department):
+        totals[department] = {
+            'pending': int(pending or 0),
+            'approved': int(approved or 0),
+            'rejected': int(rejected or 0),
+        }
+    return totals
+
+
+def compute_actual_counts():
+    """يحسب العدادات الفعلية من جدول ClearanceStatus مباشرة (عملية مكلفة، للتحقق وإعادة البناء فقط)."""
+    rows = (
+        db.session.query(ClearanceStatus.department, User.college, ClearanceStatus.status, func.count(ClearanceStatus.id))
+        .join(User, ClearanceStatus.student_id == User.id)
+        .filter(ClearanceStatus.cycle_id == current_cycle_id(), ClearanceStatus.status.in_(COUNTED_STATUSES))
+        .group_by(ClearanceStatus.department, User.college, ClearanceStatus.status)
+        .all()
+    )
+    actual = defaultdict(lambda: dict.fromkeys(COUNTED_STATUSES, 0))
+    for department, college, status, count in rows:
+        actual[(department, _college_key(college))][status] += count
+    return actual
+
+
+def verify_counters():
+    """
+    يقارن العدادات المخزنة بالقيم الفعلية ويعيد قائمة بالفروقات (Drift).
+
+    كل عنصر في القائمة: (department, college, status, stored, actual).
+    """
+    actual = compute_actual_counts()
+    stored = {
+        (c.department, c.college): {status: getattr(c, status) for status in COUNTED_STATUSES}
+        for c in ClearanceCounter.query.all()
+    }
+
+    drift = []
+    for key in sorted(set(actual) | set(stored)):
+        for status in COUNTED_STATUSES:
+            stored_value = stored.get(key, {}).get(status, 0)
+            actual_value = actual.get(key, {}).get(status, 0)
+            if stored_value != actual_value:
+                drift.append((key[0], key[1], status, stored_value, actual_value))
+    return drift
+
+
+def rebuild_counters():
+    """يعيد بناء جدول العدادات بالكامل من جدول ClearanceStatus ويعيد عدد الصفوف المنشأة."""
+    actual = compute_actual_counts()
+    reset_counters()
+    for (department, college), counts in actual.items():
+        db.session.add(ClearanceCounter(department=department, college=college, **counts))
+    return len(actual)
@@ -0,0 +1,178 @@
+# app/utils/clearance_cycles.py
+# دورات براءة الذمة
+# جميع الاستعلامات الحية تقتصر على الدورة الحالية (cycle_id)، ومعرفها محفوظ في ذاكرة العملية
+# ويُبطل في جميع العمليات عبر FileSignal عند بدء دورة جديدة.
+# بدء دورة جديدة معاملة قصيرة (إغلاق الدورة وفتح أخرى وتصفير العدادات والملخصات)، ثم تُنقل سجلات
+# الدورة المغلقة إلى جدول السجل التاريخي على دفعات مستقلة (commit لكل دفعة) بدلاً من DELETE واحد يقفل الجدول.
+
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import select, insert, delete, update, func
+
+from app.extensions import db
+from app.models import ClearanceCycle, ClearanceStatus, ClearanceStatusHistory, Notification
+from app.utils.cache_signal import FileSignal
+from app.utils.notification_retention import RetentionReport, purge_in_chunks
+
+# إشارة تغيير الدورة الحالية المشتركة بين عمليات الخادم
+cycles_signal = FileSignal('clearance_cycle')
+
+# أعمدة السجل المنسوخة إلى جدول السجل التاريخي
+HISTORY_COLUMNS = ('id', 'cycle_id', 'student_id', 'department', 'status', 'comment', 'updated_at')
+
+# معرف الدورة الحالية في ذاكرة العملية: (version, cycle_id)
+_cache = {'version': None, 'cycle_id': None}
+
+
+def default_cycle_name(now=None):
+    """اسم افتراضي للدورة حسب العام الدراسي (يبدأ في أيلول)."""
+    now = now or datetime.utcnow()
+    start = now.year if now.month >= 9 else now.year - 1
+    return f'{start}-{start + 1}'
+
+
+def _load_current_cycle_id():
+    """يقرأ الدورة المفتوحة، أو ينشئ الدورة الأولى عند عدم وجودها."""
+    cycle_id = db.session.scalar(select(func.min(ClearanceCycle.id)).where(ClearanceCycle.closed_at.is_(None)))
+    if cycle_id is not None:
+        return cycle_id
+    # اتصال مستقل حتى لا يُحفظ جزء من معاملة المستدعي؛ وعند التسابق بين عمليتين
+    # تعتمد الاثنتان أقدم دورة مفتوحة
+    with db.engine.begin() as connection:
+        connection.execute(insert(ClearanceCycle).values(name=default_cycle_name(), started_at=datetime.utcnow()))
+        return connection.scalar(select(func.min(ClearanceCycle.id)).where(ClearanceCycle.closed_at.is_(None)))
+
+
+def current_cycle_id():
+    """يعيد معرف الدورة الحالية (بدون استعلام في أغلب الطلبات)."""
+    version = cycles_signal.version()
+    if _cache['version'] != version or _cache['cycle_id'] is None:
+        _cache['cycle_id'] = _load_current_cycle_id()
+        _cache['version'] = version
+    return _cache['cycle_id']
+
+
+def current_cycle():
+    return db.session.get(ClearanceCycle, current_cycle_id())
+
+
+def start_new_cycle(name=None):
+    """
+    يغلق الدورة الحالية ويفتح دورة جديدة في معاملة واحدة قصيرة، ويعيد (closed_ids, new_cycle).
+
+    سجلات الدورة المغلقة تبقى في الجدول الحي (ولا تظهر في أي استعلام) حتى تنقلها archive_closed_cycles.
+    """
+    from app.utils import clearance_counters, clearance_summary, certificates
+
+    now = datetime.utcnow()
+    open_cycles = db.session.scalars(
+        select(ClearanceCycle).where(ClearanceCycle.closed_at.is_(None)).with_for_update()
+    ).all()
+    for cycle in open_cycles:
+        cycle.closed_at = now
+
+    new_cycle = ClearanceCycle(name=name or default_cycle_name(now), started_at=now)
+    db.session.add(new_cycle)
+
+    # العدادات والملخصات والشهادات تخص الدورة الحالية فقط
+    clearance_counters.reset_counters()
+    clearance_summary.reset_summaries()
+    certificates.reset_certificates()
+    db.session.commit()
+
+    _cache['cycle_id'] = None
+    cycles_signal.bump()
+    return [cycle.id for cycle in open_cycles], new_cycle
+
+
+def archive_cycle(cycle_id, chunk_size=None, pause=None, report=None, on_chunk=None):
+    """
+    ينقل سجلات دورة مغلقة إلى جدول السجل التاريخي على دفعات (نسخ ثم حذف بالمعرفات، commit لكل دفعة)،
+    ثم يسجل انتهاء الأرشفة على الدورة. يمكن إعادة تشغيله بأمان بعد أي انقطاع.
+
+    يعيد كائن RetentionReport.
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config.get('CYCLE_ARCHIVE_CHUNK', 1000)
+    pause = config.get('CYCLE_ARCHIVE_PAUSE', 0.05) if pause is None else pause
+    owns_report = report is None
+    report = report or RetentionReport()
+
+    cycle = db.session.get(ClearanceCycle, cycle_id)
+    if cycle is None or cycle.closed_at is None:
+        raise ValueError('لا يمكن أرشفة الدورة الحالية')
+
+    columns = [getattr(ClearanceStatus, name) for name in HISTORY_COLUMNS]
+    while True:
+        ids = db.session.scalars(
+            select(ClearanceStatus.id).where(ClearanceStatus.cycle_id == cycle_id).limit(chunk_size)
+        ).all()
+        if not ids:
+            break
+
+        db.session.execute(insert(ClearanceStatusHistory).from_select(
+            [getattr(ClearanceStatusHistory, name) for name in HISTORY_COLUMNS],
+            select(*columns).where(ClearanceStatus.id.in_(ids)),
+        ))
+        db.session.execute(
+            delete(ClearanceStatus).where(ClearanceStatus.id.in_(ids)),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.execute(
+            update(ClearanceCycle).where(ClearanceCycle.id == cycle_id)
+            .values(archived_rows=ClearanceCycle.archived_rows + len(ids)),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+        report.processed += len(ids)
+        report.chunks += 1
+        if on_chunk:
+            on_chunk(report)
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    db.session.execute(
+        update(ClearanceCycle).where(ClearanceCycle.id == cycle_id).values(archived_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    return report.finish() if owns_report else report
+
+
+def unarchived_cycles():
+    """الدورات المغلقة التي لم تكتمل أرشفتها بعد."""
+    return db.session.scalars(
+        select(ClearanceCycle.id)
+        .where(ClearanceCycle.closed_at.isnot(None), ClearanceCycle.archived_at.is_(None))
+        .order_by(ClearanceCycle.id)
+    ).all()
+
+
+def archive_closed_cycles(chunk_size=None, pause=None, on_chunk=None):
+    """
+    يؤرشف جميع الدورات المغلقة، ثم يحذف إشعارات ما قبل الدورة الحالية على دفعات
+    (أو يؤرشفها حسب NOTIFICATION_RETENTION_MODE). يعيد (statuses_report, notifications_report).
+    """
+    statuses = RetentionReport()
+    for cycle_id in unarchived_cycles():
+        archive_cycle(cycle_id, chunk_size=chunk_size, pause=pause, report=statuses, on_chunk=on_chunk)
+
+    started_at = current_cycle().started_at
+    archive = current_app.config.get('NOTIFICATION_RETENTION_MODE', 'archive') == 'archive'
+    notifications = purge_in_chunks((Notification.timestamp < started_at,), archive=archive,
+                                    chunk_size=chunk_size, pause=pause)
+    return statuses.finish(), notifications
+
+
+def cycle_status():
+    """حالة جميع الدورات مع عدد السجلات المتبقية في الجدول الحي لكل منها."""
+    remaining = dict(db.session.execute(
+        select(ClearanceStatus.cycle_id, func.count(ClearanceStatus.id)).group_by(ClearanceStatus.cycle_id)
+    ).all())
+    cycles = db.session.scalars(select(ClearanceCycle).order_by(ClearanceCycle.id)).all()
+    return [(cycle, remaining.get(cycle.id, 0)) for cycle in cycles]
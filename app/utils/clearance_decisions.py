@@ -0,0 +1,180 @@
+# app/utils/clearance_decisions.py
+# تطبيق قرارات مسؤولي الشعب (موافقة/رفض/انتظار) على سجلات براءة الذمة
+# تُستخدم نفس الخدمة لقرار واحد (update_status) ولدفعة قرارات (section_head_decisions):
+# تحميل السجلات باستعلام واحد، ثم UPDATE واحد لكل حالة (الملاحظات بتعبير CASE على المعرف)، وتحديث العدادات والملخصات
+# وتسجيل الانتقالات في السجل وإضافة إشعارات الطلاب والإشعارات الفورية وأحداث البث المباشر على دفعات. لا تقوم الخدمة بعمل commit.
+
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, insert, update
+
+from app.extensions import db
+from app.models import User, ClearanceStatus, Notification
+from app.utils import clearance_counters, clearance_summary, stream_events, status_transitions, certificates
+from app.utils.notifications import mark_read, CLEARANCE_REQUEST, STATUS_UPDATE
+from app.utils.push_outbox import enqueue_push
+from app.utils.clearance_cycles import current_cycle_id
+from app.utils.fragment_cache import scoped_changes
+
+# الحالات التي يمكن للمسؤول اختيارها
+DECISION_STATUSES = ('pending', 'approved', 'rejected')
+
+# الحد الأقصى لعدد القرارات في طلب واحد
+MAX_DECISIONS = 500
+
+# الحد الأقصى لطول الملاحظة (مثل UpdateStatusForm)
+MAX_COMMENT_LENGTH = 200
+
+# نتائج القرار لكل طالب
+UPDATED = 'updated'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def max_decisions():
+    return current_app.config.get('BULK_DECISIONS_MAX', MAX_DECISIONS)
+
+
+def _result(student_id, result, message=None):
+    return {'student_id': student_id, 'result': result, 'message': message}
+
+
+def _normalize(item):
+    """يتحقق من قرار واحد ويعيد (student_id, status, comment) أو رسالة الخطأ."""
+    try:
+        student_id = int(item.get('student_id'))
+    except (AttributeError, TypeError, ValueError):
+        return None, 'رقم الطالب غير صالح'
+
+    status = item.get('status')
+    if status not in DECISION_STATUSES:
+        return student_id, 'الحالة غير صالحة'
+
+    comment = (item.get('comment') or '').strip()
+    if len(comment) > MAX_COMMENT_LENGTH:
+        return student_id, f'الملاحظة أطول من {MAX_COMMENT_LENGTH} حرفاً'
+    return (student_id, status, comment or None), None
+
+
+def apply_decisions(department, decisions, officer=None, college=None):
+    """
+    يطبق قائمة قرارات على سجلات شعبة واحدة في المعاملة الحالية (دون commit).
+
+    المعاملات:
+    department: الشعبة التي تُعدّل سجلاتها.
+    decisions: قائمة قواميس {'student_id', 'status', 'comment'}.
+    officer: المسؤول صاحب القرار (لتعليم إشعارات طلبات هؤلاء الطلاب كمقروءة عنده).
+    college: لتقييد القرارات بطلاب كلية محددة (المسؤول المخصص لكلية).
+
+    يعيد (results, applied):
+    results: نتيجة لكل قرار بنفس الترتيب {'student_id', 'result', 'message'}.
+    applied: القرارات المطبقة فعلاً بالشكل (student, status, comment) لإرسال البريد بعد الحفظ.
+    """
+    results = []
+    valid = {}   # student_id -> (index, status, comment)
+    for index, item in enumerate(decisions):
+        decision, error = _normalize(item)
+        student_id = decision if error else decision[0]
+        if error:
+            results.append(_result(student_id, INVALID, error))
+        elif student_id in valid:
+            results.append(_result(student_id, INVALID, 'قرار مكرر لنفس الطالب'))
+        else:
+            valid[student_id] = (index, *decision[1:])
+            results.append(None)
+
+    # تحميل السجلات المطلوبة مع الطلاب باستعلام واحد (مع قفل السجلات حتى نهاية المعاملة)
+    records = {}
+    if valid:
+        query = (
+            db.session.query(ClearanceStatus.id, ClearanceStatus.student_id, ClearanceStatus.status,
+                             ClearanceStatus.comment, User)
+            .join(User, ClearanceStatus.student_id == User.id)
+            .filter(ClearanceStatus.cycle_id == current_cycle_id(), ClearanceStatus.department == department,
+                    ClearanceStatus.student_id.in_(valid))
+        )
+        if college:
+            query = query.filter(User.college == college)
+        records = {row.student_id: row for row in query.with_for_update(of=ClearanceStatus)}
+
+    groups = defaultdict(dict)   # status -> {معرف السجل: الملاحظة}
+    changes = []                 # (student, old_status, new_status, comment)
+    for student_id, (index, status, comment) in valid.items():
+        row = records.get(student_id)
+        if row is None:
+            results[index] = _result(student_id, NOT_FOUND, 'السجل غير موجود')
+        elif row.status == status and (row.comment or None) == comment:
+            results[index] = _result(student_id, UNCHANGED)
+        else:
+            groups[status][row.id] = comment
+            changes.append((row.User, row.status, status, comment))
+            results[index] = _result(student_id, UPDATED)
+
+    if not changes:
+        return results, []
+
+    now = datetime.utcnow()
+    # العبارات الجماعية تغير بيانات هذه الشعبة وهؤلاء الطلاب فقط (لإبطال أجزاء الصفحات الخاصة بهم)
+    with scoped_changes(departments=[department], students=[student.id for student, _, _, _ in changes]):
+        # عبارة واحدة لكل حالة مهما اختلفت الملاحظات (لا عبارة لكل ملاحظة مختلفة)
+        for status, comments in groups.items():
+            db.session.execute(
+                update(ClearanceStatus).where(ClearanceStatus.id.in_(comments))
+                .values(status=status, comment=case(comments, value=ClearanceStatus.id), updated_at=now),
+                execution_options={'synchronize_session': False},
+            )
+
+        # سجل الانتقالات (لإحصائيات زمن الإنجاز)، والعدادات والملخصات في نفس المعاملة
+        status_transitions.record_status_changes(
+            department, current_cycle_id(), [(student.id, old, new) for student, old, new, _ in changes],
+            officer_id=officer.id if officer is not None else None, now=now)
+        clearance_counters.record_status_changes(
+            department, [(student.college, old, new) for student, old, new, _ in changes])
+        completed = clearance_summary.record_status_changes(
+            [(student.id, old, new) for student, old, new, _ in changes])
+
+    # الشهادات المعروضة مسبقاً: أي تغيير في سجلات الطالب يبطل شهادته، ومن اكتمل يُعرض له شهادة بعد الحفظ
+    certificates.invalidate([student.id for student, _, _, _ in changes])
+    certificates.schedule_snapshots(completed)
+
+    # إشعارات الطلاب بعبارة INSERT واحدة، والإشعارات الفورية بعبارة واحدة لكل حالة
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': student.id,
+            'message': f"شعبة {department} غيّرت حالتك إلى {new}",
+            'timestamp': now,
+            'is_read': False,
+            'type': STATUS_UPDATE,
+            'related_student_id': student.id,
+            'department': department,
+        }
+        for student, _, new, _ in changes
+    ])
+    by_status = defaultdict(list)
+    for student, _, new, _ in changes:
+        by_status[new].append(student.id)
+    for status, student_ids in by_status.items():
+        enqueue_push(student_ids, {"title": "تحديث الحالة", "body": f"شعبة {department} غيّرت حالتك إلى {status}"})
+
+    # أحداث البث المباشر لصفحات الطلاب المفتوحة (تُوزع بعد حفظ المعاملة)
+    stream_events.publish([
+        (student.id, stream_events.STATUS_UPDATE,
+         {'department': department, 'status': new, 'comment': comment, 'updated_at': now.isoformat()})
+        for student, _, new, comment in changes
+    ])
+
+    if officer is not None:
+        mark_read(officer.id, type=CLEARANCE_REQUEST, related_student_id=[s.id for s, _, _, _ in changes])
+
+    return results, [(student, new, comment) for student, _, new, comment in changes]
+
+
+def summarize(results):
+    """يعيد عدد القرارات لكل نتيجة."""
+    summary = dict.fromkeys((UPDATED, UNCHANGED, NOT_FOUND, INVALID), 0)
+    for item in results:
+        summary[item['result']] += 1
+    return summary
@@ -0,0 +1,166 @@
+# app/utils/clearance_export.py
+# تصدير حالة براءة الذمة لكل طالب ولكل شعبة بصيغة CSV أو XLSX
+# القراءة على دفعات بترقيم المفتاح (Keyset) على معرف الطالب: كل دفعة استعلامان قصيران بالفهارس
+# (الطلاب ثم سجلات الشعب الخاصة بهم)، ويُغلق اتصال قاعدة البيانات بين الدفعات.
+# الكتابة تدريجية: CSV يُرسل دفعة بدفعة عبر مولد (Generator)، وXLSX يُكتب بوضع الكتابة فقط في openpyxl
+# إلى ملف مؤقت ثم يُرسل على أجزاء. لذلك تبقى الذاكرة ثابتة مهما كان عدد الطلاب.
+
+import csv
+import io
+import os
+import tempfile
+
+from flask import current_app
+from sqlalchemy import select, func
+
+from app.extensions import db
+from app.models import User, ClearanceStatus, ClearanceSummary
+from app.utils.clearance_cycles import current_cycle_id
+from app.utils.departments import department_names
+
+# الصيغ المدعومة ونوع المحتوى لكل منها
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# تسميات الحالات في الملف
+STATUS_LABELS = {'approved': 'موافق عليه', 'rejected': 'مرفوض', 'pending': 'قيد الانتظار'}
+
+# حجم الدفعة الافتراضي (عدد الطلاب في كل قراءة)
+DEFAULT_CHUNK_SIZE = 1000
+
+# حجم أجزاء إرسال ملف XLSX بالبايت
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+def export_filters(args):
+    """يستخرج معاملات التصفية من الطلب (القيم الفارغة تعني بدون تصفية)."""
+    status = args.get('status') or None
+    return {
+        'college': args.get('college') or None,
+        'stage': args.get('stage') or None,
+        'study_type': args.get('study_type') or None,
+        'status': status if status in ('completed', 'incomplete') else None,
+    }
+
+
+def header_row():
+    return ['الرقم الجامعي', 'الاسم', 'الكلية', 'المرحلة', 'نوع الدراسة', 'الحالة النهائية', *department_names()]
+
+
+def _students_chunk(filters, after, limit):
+    """دفعة من الطلاب بعد المعرف المحدد مع علامة الاكتمال من جدول الملخصات."""
+    stmt = (
+        select(User.id, User.university_id, User.full_name, User.college, User.stage, User.study_type,
+               ClearanceSummary.completed)
+        .outerjoin(ClearanceSummary, ClearanceSummary.student_id == User.id)
+        .where(User.role == 'student', User.id > after)
+    )
+    for column in ('college', 'stage', 'study_type'):
+        if filters.get(column):
+            stmt = stmt.where(getattr(User, column) == filters[column])
+    if filters.get('status') == 'completed':
+        stmt = stmt.where(ClearanceSummary.completed.is_(True))
+    elif filters.get('status') == 'incomplete':
+        stmt = stmt.where(func.coalesce(ClearanceSummary.completed, False).is_(False))
+    return db.session.execute(stmt.order_by(User.id).limit(limit)).all()
+
+
+def _statuses_for(student_ids):
+    """حالات الشعب لدفعة من الطلاب: {student_id: {department: status}}."""
+    statuses = {}
+    rows = db.session.execute(
+        select(ClearanceStatus.student_id, ClearanceStatus.department, ClearanceStatus.status)
+        .where(ClearanceStatus.cycle_id == current_cycle_id(), ClearanceStatus.student_id.in_(student_ids))
+    )
+    for student_id, department, status in rows:
+        statuses.setdefault(student_id, {})[department] = status
+    return statuses
+
+
+def iter_export_rows(filters, chunk_size=None):
+    """
+    يولد دفعات من صفوف التصدير (قائمة صفوف لكل دفعة).
+    لا يحتفظ إلا بدفعة واحدة في الذاكرة، ويغلق الجلسة بعد كل دفعة حتى لا يبقى الاتصال محجوزاً
+    أثناء انتظار العميل.
+    """
+    chunk_size = chunk_size or current_app.config.get('EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    departments = department_names()
+    after = 0
+    while True:
+        try:
+            students = _students_chunk(filters, after, chunk_size)
+            statuses = _statuses_for([s.id for s in students]) if students else {}
+        finally:
+            db.session.close()
+        if not students:
+            return
+
+        rows = []
+        for s in students:
+            records = statuses.get(s.id, {})
+            final_status = 'مكتمل' if s.completed else ('غير مكتمل' if records else 'لم يقدم طلباً')
+            rows.append([
+                s.university_id, s.full_name, s.college, s.stage, s.study_type, final_status,
+                *(STATUS_LABELS.get(records.get(dept), '') for dept in departments),
+            ])
+        yield rows
+
+        if len(students) < chunk_size:
+            return
+        after = students[-1].id
+
+
+def stream_csv(filters, chunk_size=None):
+    """يولد ملف CSV على أجزاء (جزء لكل دفعة)، مع BOM حتى يعرض Excel النص العربي بشكل صحيح."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(header_row())
+    for rows in iter_export_rows(filters, chunk_size):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def build_xlsx(filters, chunk_size=None):
+    """
+    يكتب ملف XLSX بوضع الكتابة فقط (write_only) إلى ملف مؤقت ويعيد مساره.
+    في هذا الوضع يكتب openpyxl الصفوف مباشرة إلى القرص بدلاً من الاحتفاظ بها في الذاكرة.
+    على المستدعي حذف الملف بعد إرساله (stream_file يقوم بذلك).
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('براءة الذمة')
+    sheet.sheet_view.rightToLeft = True
+    sheet.append(header_row())
+    for rows in iter_export_rows(filters, chunk_size):
+        for row in rows:
+            sheet.append(row)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def stream_file(path, block_size=FILE_BLOCK_SIZE):
+    """يرسل الملف على أجزاء ثم يحذفه (حتى عند انقطاع الاتصال)."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
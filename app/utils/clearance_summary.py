@@ -0,0 +1,182 @@
+# app/utils/clearance_summary.py
+# صيانة صف الملخص لكل طالب (عدد الموافقات/الرفض/الانتظار وعلامة الاكتمال)
+# مثل العدادات، لا تقوم هذه الدوال بعمل commit حتى يُحفظ الملخص في نفس المعاملة
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import func, case
+
+from app.extensions import db
+from app.models import ClearanceStatus, ClearanceSummary
+from app.utils.clearance_cycles import current_cycle_id
+
+# الحالات التي يتم عدّها في الملخص
+SUMMARY_STATUSES = ('pending', 'approved', 'rejected')
+
+
+def _refresh_completion(summary, now=None):
+    """
+    يحدّث علامة الاكتمال وتاريخه حسب الأعداد الحالية في الملخص.
+    الاكتمال موافقة جميع سجلات الطالب نفسه (total)، لا عدد الشعب الحالي: إضافة شعبة أثناء الدورة
+    لا تغير الشعب المطلوبة لطلب قُدم قبلها.
+    """
+    now = now or datetime.utcnow()
+    is_completed = summary.total > 0 and summary.approved == summary.total
+    if is_completed and not summary.completed:
+        summary.completed_at = now
+    elif not is_completed:
+        summary.completed_at = None
+    summary.completed = is_completed
+    summary.updated_at = now
+
+
+def create_summary(student_id, departments):
+    """ينشئ ملخص الطالب عند تقديم طلب براءة الذمة (جميع الشعب قيد الانتظار)."""
+    summary = ClearanceSummary(
+        student_id=student_id,
+        total=len(departments),
+        pending=len(departments),
+        approved=0,
+        rejected=0,
+    )
+    _refresh_completion(summary)
+    db.session.add(summary)
+    return summary
+
+
+def record_status_change(student_id, old_status, new_status):
+    """
+    ينقل سجلاً واحداً من حالته القديمة إلى الجديدة في ملخص الطالب.
+    يتم قفل صف الملخص (SELECT ... FOR UPDATE) لتجنب تضارب التحديثات المتزامنة.
+
+    يعيد الملخص بعد التحديث (أو None إذا لم يكن موجوداً).
+    """
+    summary = db.session.get(ClearanceSummary, student_id, with_for_update=True)
+    if summary is None or old_status == new_status:
+        return summary
+
+    if old_status in SUMMARY_STATUSES:
+        setattr(summary, old_status, getattr(summary, old_status) - 1)
+    if new_status in SUMMARY_STATUSES:
+        setattr(summary, new_status, getattr(summary, new_status) + 1)
+    _refresh_completion(summary)
+    return summary
+
+
+def record_status_changes(changes):
+    """
+    يسجل دفعة من تغييرات الحالة في ملخصات الطلاب، مع قفل جميع الملخصات المعنية باستعلام واحد.
+
+    المعاملات:
+    changes: قائمة (student_id, old_status, new_status).
+
+    يعيد معرفات الطلاب الذين اكتملت براءة ذمتهم بهذه التغييرات.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for student_id, old_status, new_status in changes:
+        if old_status != new_status:
+            deltas[student_id][old_status] -= 1
+            deltas[student_id][new_status] += 1
+    if not deltas:
+        return []
+
+    now = datetime.utcnow()
+    summaries = (
+        ClearanceSummary.query
+        .filter(ClearanceSummary.student_id.in_(deltas))
+        .with_for_update()
+        .all()
+    )
+    completed = []
+    for summary in summaries:
+        was_completed = summary.completed
+        for status, delta in deltas[summary.student_id].items():
+            if status in SUMMARY_STATUSES and delta:
+                setattr(summary, status, getattr(summary, status) + delta)
+        _refresh_completion(summary, now)
+        if summary.completed and not was_completed:
+            completed.append(summary.student_id)
+    return completed
+
+
+def remove_summary(student_id):
+    """يحذف ملخص الطالب (عند حذف حسابه)."""
+    db.session.query(ClearanceSummary).filter_by(student_id=student_id).delete()
+
+
+def reset_summaries():
+    """يحذف جميع الملخصات (عند بدء دورة جديدة)."""
+    db.session.query(ClearanceSummary).delete()
+
+
+def get_summary(student_id):
+    """يعيد ملخص الطالب دون تحميل سجلات الأقسام التفصيلية."""
+    return db.session.get(ClearanceSummary, student_id)
+
+
+def is_completed(student_id):
+    """يتحقق من اكتمال براءة ذمة الطالب باستعلام واحد على صف الملخص."""
+    summary = get_summary(student_id)
+    return bool(summary and summary.completed)
+
+
+def completed_students_query():
+    """استعلام فرعي بمعرفات الطلاب المكتملين (يعتمد على الفهرس على عمود completed)."""
+    return db.session.query(ClearanceSummary.student_id).filter(ClearanceSummary.completed.is_(True))
+
+
+def compute_actual_summaries():
+    """يحسب الملخصات الفعلية من جدول ClearanceStatus (للتحقق وإعادة البناء فقط)."""
+    columns = [func.count(ClearanceStatus.id)] + [
+        func.sum(case((ClearanceStatus.status == status, 1), else_=0)) for status in SUMMARY_STATUSES
+    ]
+    rows = (
+        db.session.query(ClearanceStatus.student_id, *columns)
+        .filter(ClearanceStatus.cycle_id == current_cycle_id())
+        .group_by(ClearanceStatus.student_id)
+        .all()
+    )
+    return {
+        student_id: dict(total=int(total), **{s: int(v or 0) for s, v in zip(SUMMARY_STATUSES, values)})
+        for student_id, total, *values in rows
+    }
+
+
+def verify_summaries():
+    """
+    يقارن الملخصات المخزنة بالقيم الفعلية ويعيد قائمة بالفروقات.
+
+    كل عنصر في القائمة: (student_id, field, stored, actual).
+    """
+    actual = compute_actual_summaries()
+    stored = {s.student_id: s for s in ClearanceSummary.query.all()}
+
+    drift = []
+    for student_id in sorted(set(actual) | set(stored)):
+        summary = stored.get(student_id)
+        expected = actual.get(student_id, {})
+        expected['completed'] = expected.get('total', 0) > 0 and expected.get('approved') == expected.get('total')
+        for field in ('total',) + SUMMARY_STATUSES + ('completed',):
+            stored_value = getattr(summary, field) if summary else (False if field == 'completed' else 0)
+            actual_value = expected.get(field, 0)
+            if stored_value != actual_value:
+                drift.append((student_id, field, stored_value, actual_value))
+    return drift
+
+
+def rebuild_summaries():
+    """يعيد بناء جميع الملخصات من جدول ClearanceStatus ويعيد عدد الصفوف المنشأة."""
+    actual = compute_actual_summaries()
+    previous = {s.student_id: s.completed_at for s in ClearanceSummary.query.all()}
+    reset_summaries()
+
+    now = datetime.utcnow()
+    for student_id, counts in actual.items():
+        summary = ClearanceSummary(student_id=student_id, **counts)
+        _refresh_completion(summary, now)
+        # الاحتفاظ بتاريخ الاكتمال السابق إن وجد
+        if summary.completed and previous.get(student_id):
+            summary.completed_at = previous[student_id]
+        db.session.add(summary)
+    return len(actual)
@@ -0,0 +1,31 @@
+# app/utils/conditional.py
+# طلبات GET الشرطية لواجهات JSON (ETag / If-None-Match)
+# يُحسب ETag من قيم صغيرة رخيصة (آخر وقت تحديث وأعداد السجلات) قبل بناء الاستجابة،
+# فإذا طابق ما لدى المتصفح يُعاد 304 دون قراءة البيانات الكاملة أو تحويلها إلى JSON.
+
+import hashlib
+
+from flask import current_app, jsonify, request
+
+
+def make_etag(*validators):
+    """يبني ETag من قيم التحقق (أي قيم قابلة للتحويل إلى نص)."""
+    raw = '|'.join(str(v) for v in validators)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def conditional_json(validators, build):
+    """
+    يعيد 304 إذا طابق ETag المحسوب من validators ترويسة If-None-Match،
+    وإلا يستدعي build() ويعيد نتيجتها بصيغة JSON مع ETag.
+
+    الاستجابة خاصة بالمستخدم (private) ويجب التحقق منها في كل مرة (no-cache).
+    """
+    etag = make_etag(*validators)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
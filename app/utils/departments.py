@@ -0,0 +1,103 @@
+# app/utils/departments.py
+# سجل الشعب المحفوظ في ذاكرة العملية
+# جدول department صغير ونادر التغير، لذلك يُقرأ مرة واحدة في كل عملية ويُستخدم في:
+# - تحويل اسم الشعبة إلى معرفها والعكس في أعمدة DepartmentKey (بدون استعلام لكل قيمة).
+# - قائمة الشعب المرتبة للمسارات والقوالب (department_names).
+# تُبطل النسخ في جميع العمليات عبر FileSignal عند إضافة شعب؛ والتحويل لا يفحص الإشارة إلا عند ظهور اسم أو معرف
+# غير معروف (الشعب لا تُحذف ولا يُعاد تسميتها، فالقيم المعروفة تبقى صحيحة).
+
+from sqlalchemy import select, insert, func
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db, DEFAULT_DEPARTMENTS
+from app.models import Department
+from app.utils.cache_signal import FileSignal
+
+# إشارة تغيير جدول الشعب المشتركة بين عمليات الخادم
+departments_signal = FileSignal('department')
+
+# نسخة العملية: الأسماء مرتبة، والتحويل في الاتجاهين
+_cache = {'version': None, 'names': (), 'ids': {}, 'by_id': {}}
+
+
+def _insert_missing(connection, names, active=True):
+    """يضيف الشعب غير الموجودة بمعرفات وترتيب متتالية، ويعيد عددها."""
+    existing = set(connection.scalars(select(Department.name)))
+    missing = [name for name in names if name not in existing]
+    if not missing:
+        return 0
+    last = connection.scalar(select(func.coalesce(func.max(Department.id), 0)))
+    connection.execute(insert(Department), [
+        {'id': last + i, 'name': name, 'position': last + i, 'active': active}
+        for i, name in enumerate(missing, start=1)
+    ])
+    return len(missing)
+
+
+def _load():
+    """
+    يقرأ الشعب على اتصال مستقل (قد يُستدعى أثناء تنفيذ عبارة في جلسة المستدعي)،
+    ويعبئ الجدول بالشعب الافتراضية عند أول تشغيل.
+    """
+    statement = select(Department.id, Department.name, Department.active).order_by(Department.position, Department.id)
+    with db.engine.connect() as connection:
+        rows = connection.execute(statement).all()
+    if not rows:
+        try:
+            with db.engine.begin() as connection:
+                _insert_missing(connection, DEFAULT_DEPARTMENTS)
+        except IntegrityError:
+            pass  # عملية أخرى عبأت الجدول في الوقت نفسه
+        with db.engine.connect() as connection:
+            rows = connection.execute(statement).all()
+
+    _cache['names'] = tuple(name for _, name, active in rows if active)
+    _cache['ids'] = {name: department_id for department_id, name, _ in rows}
+    _cache['by_id'] = {department_id: name for department_id, name, _ in rows}
+
+
+def _refresh(force=False):
+    version = departments_signal.version()
+    if force or _cache['version'] != version:
+        _load()
+        _cache['version'] = version
+
+
+def department_names():
+    """أسماء الشعب الفعالة بترتيب العرض."""
+    _refresh()
+    return _cache['names']
+
+
+def department_id(name):
+    """معرف الشعبة من اسمها (None للاسم غير المعروف)."""
+    department = _cache['ids'].get(name)
+    if department is None:
+        _refresh()
+        department = _cache['ids'].get(name)
+    return department
+
+
+def department_name(department):
+    """اسم الشعبة من معرفها."""
+    name = _cache['by_id'].get(department)
+    if name is None:
+        _refresh()
+        name = _cache['by_id'].get(department)
+    return name
+
+
+def add_departments(names, active=True):
+    """
+    يضيف شعباً جديدة (في نهاية الترتيب) ويبطل السجل في جميع العمليات. يعيد عدد المضاف.
+    active=False لشعب السجلات القديمة التي لا تُطلب موافقتها في الطلبات الجديدة.
+    """
+    with db.engine.begin() as connection:
+        added = _insert_missing(connection, names, active)
+    if added:
+        from app.utils.fragment_cache import bump_data_version
+
+        departments_signal.bump()
+        bump_data_version()
+        _refresh(force=True)
+    return added
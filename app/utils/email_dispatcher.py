@@ -0,0 +1,171 @@
+# app/utils/email_dispatcher.py
+# خدمة إرسال البريد الإلكتروني عبر طابور محدود وخيط إرسال واحد لكل عملية
+# بدلاً من خيط جديد واتصال SMTP جديد لكل رسالة: تُجمع الرسائل في دفعات وتُرسل كل دفعة
+# عبر اتصال واحد (mail.connect())، مع تحديد معدل الإرسال وإحصائيات للتسليم.
+
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+from smtplib import SMTPServerDisconnected
+
+from flask import current_app
+
+
+class EmailDispatcher:
+    """طابور إرسال البريد، يُهيأ مع التطبيق مثل بقية الإضافات (Extensions)."""
+
+    def __init__(self, mail=None, app=None):
+        self.mail = mail
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._next_send_at = 0.0
+        self.metrics = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 50)
+        # أقصى عدد رسائل في الثانية (0 يعني بدون حد)
+        self.rate_limit = app.config.get('MAIL_RATE_LIMIT', 0)
+        self._queue = queue.Queue(maxsize=app.config.get('MAIL_QUEUE_SIZE', 10000))
+        self.metrics = {
+            'enqueued': 0,      # الرسائل المضافة للطابور
+            'sent': 0,          # الرسائل المرسلة بنجاح
+            'failed': 0,        # الرسائل التي فشل إرسالها
+            'dropped': 0,       # الرسائل المرفوضة لامتلاء الطابور
+            'connections': 0,   # اتصالات SMTP المفتوحة
+            'batches': 0,       # الدفعات المرسلة
+            'last_error': None,
+            'last_sent_at': None,
+        }
+        app.extensions['email_dispatcher'] = self
+        # محاولة إرسال ما تبقى في الطابور عند إيقاف العملية
+        atexit.register(self.flush, app.config.get('MAIL_SHUTDOWN_TIMEOUT', 10))
+
+    def _ensure_worker(self):
+        # يبدأ خيط الإرسال عند أول رسالة (وليس عند الاستيراد) حتى لا يتأثر بتفرع عمليات خادم الويب
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='email-dispatcher', daemon=True)
+                self._thread.start()
+
+    def send(self, msg, block=False, timeout=None):
+        """
+        يضيف رسالة إلى طابور الإرسال ويعيد True إذا أضيفت.
+
+        المعاملات:
+        block: الانتظار حتى يتوفر مكان في الطابور (مناسب لمهام الخلفية مثل الاستيراد، وليس لطلبات HTTP).
+        timeout: أقصى مدة للانتظار بالثواني عند block=True.
+        """
+        try:
+            self._queue.put(msg, block=block, timeout=timeout)
+        except queue.Full:
+            self._count('dropped')
+            current_app.logger.error(f'طابور البريد ممتلئ، تم تجاهل رسالة إلى {msg.recipients}')
+            return False
+        self._count('enqueued')
+        self._ensure_worker()
+        return True
+
+    def flush(self, timeout=None):
+        """ينتظر حتى تُرسل جميع الرسائل في الطابور، ويعيد True إذا فرغ الطابور قبل انتهاء المهلة."""
+        if self._queue is None or self._thread is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def get_metrics(self):
+        """يعيد نسخة من إحصائيات الإرسال مع حجم الطابور الحالي."""
+        with self._lock:
+            metrics = dict(self.metrics)
+        metrics['queued'] = self._queue.qsize() if self._queue else 0
+        return metrics
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.metrics[name] += value
+
+    def _next_batch(self):
+        """ينتظر أول رسالة ثم يضيف إليها ما هو متوفر في الطابور حتى حجم الدفعة."""
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _throttle(self):
+        """ينتظر عند الحاجة حتى لا يتجاوز معدل الإرسال MAIL_RATE_LIMIT رسالة في الثانية."""
+        if not self.rate_limit:
+            return
+        now = time.monotonic()
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+        self._next_send_at = max(now, self._next_send_at) + 1.0 / self.rate_limit
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with self.app.app_context():
+                    self._send_batch(batch)
+            except Exception as e:
+                # حماية خيط الإرسال من التوقف بسبب خطأ غير متوقع
+                self.app.logger.error(f'فشل إرسال دفعة البريد: {e!r}')
+                with self._lock:
+                    self.metrics['last_error'] = repr(e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send_batch(self, batch):
+        """يرسل دفعة من الرسائل عبر اتصال SMTP واحد، مع إعادة الاتصال مرة واحدة إذا انقطع."""
+        pending = list(batch)
+        self._count('batches')
+        reconnected = False
+        while pending:
+            try:
+                with self.mail.connect() as connection:
+                    self._count('connections')
+                    while pending:
+                        self._throttle()
+                        msg = pending[0]
+                        try:
+                            connection.send(msg)
+                        except SMTPServerDisconnected:
+                            raise
+                        except Exception as e:
+                            self._record_failure(msg, e)
+                        else:
+                            self._count('sent')
+                            with self._lock:
+                                self.metrics['last_sent_at'] = datetime.utcnow().isoformat()
+                        pending.pop(0)
+            except (SMTPServerDisconnected, OSError) as e:
+                if not reconnected and pending:
+                    reconnected = True
+                    continue
+                for msg in pending:
+                    self._record_failure(msg, e)
+                return
+            except Exception as e:
+                # خطأ في الاتصال لا تفيد معه إعادة المحاولة (مثل فشل المصادقة)
+                for msg in pending:
+                    self._record_failure(msg, e)
+                return
+
+    def _record_failure(self, msg, error):
+        self._count('failed')
+        with self._lock:
+            self.metrics['last_error'] = repr(error)
+        current_app.logger.error(f'فشل إرسال البريد إلى {msg.recipients}: {error!r}')
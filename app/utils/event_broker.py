@@ -0,0 +1,152 @@
+# app/utils/event_broker.py
+# موزع أحداث البث المباشر (SSE) داخل عملية الخادم
+# خيط واحد فقط لكل عملية يقرأ الأحداث الجديدة من جدول StreamEvent باستعلام دوري واحد،
+# ثم يوزع كل حدث على طوابير الاتصالات المفتوحة لصاحبه في الذاكرة.
+# الاتصال الخامل لا يكلف أي استعلام ولا يحجز اتصالاً بقاعدة البيانات، بل طابوراً صغيراً فقط،
+# لذلك يمكن للعملية الواحدة خدمة آلاف الاتصالات (مع عامل غير متزامن مثل gevent).
+# القراءة تبدأ من الحد المستقر (watermark) وتعيد فحص ما بعده، فيصل الحدث المحفوظ متأخراً بمعرف أقل مرة واحدة
+# (انظر stream_events). كل حدث موزع يحمل الحد كما كان قبل قراءته، وهو مؤشر آمن للاستكمال بعد تسليمه.
+
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+class EventBroker:
+    """موزع الأحداث، يُهيأ مع التطبيق مثل بقية الإضافات (Extensions)."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._subscribers = {}      # user_id -> set(queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._watermark = None      # كل حدث حتى هذا المعرف قُرئ ووُزع
+        self._top = None            # أكبر معرف مقروء
+        self._seen = {}             # المقروء بعد الحد: id -> created_at
+        self.metrics = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('STREAM_POLL_INTERVAL', 1.0)
+        self.batch_size = app.config.get('STREAM_BATCH_SIZE', 500)
+        self.queue_size = app.config.get('STREAM_QUEUE_SIZE', 100)
+        self.settle_seconds = app.config.get('STREAM_SETTLE_SECONDS', 30)
+        self.metrics = {
+            'connections': 0,   # الاتصالات المفتوحة حالياً
+            'delivered': 0,     # الأحداث الموزعة على الاتصالات
+            'dropped': 0,       # الاتصالات المغلقة لامتلاء طوابيرها (يستكملها المتصفح عند إعادة الاتصال)
+            'polls': 0,         # عدد مرات قراءة الجدول
+            'late': 0,          # الأحداث المحفوظة بعد قراءة معرف أعلى منها
+            'last_error': None,
+        }
+        app.extensions['event_broker'] = self
+
+    def _ensure_worker(self):
+        # يبدأ خيط القراءة عند أول اتصال (وليس عند الاستيراد) حتى لا يتأثر بتفرع عمليات خادم الويب
+        from app.utils.stream_events import settled_event_id, recent_events
+
+        with self._lock:
+            if self._watermark is None:
+                # البدء من الحد المستقر مع اعتبار المحفوظ بعده مقروءاً (يستكمله الاتصال نفسه عبر Last-Event-ID)،
+                # فيصل ما يُحفظ بعد ذلك فقط، ومنه المحفوظ متأخراً بمعرف أقل
+                self._watermark = settled_event_id()
+                self._seen = recent_events(self._watermark)
+                self._top = max(self._seen, default=self._watermark)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='event-broker', daemon=True)
+                self._thread.start()
+
+    def subscribe(self, user_id):
+        """يفتح طابوراً لاتصال جديد للمستخدم ويعيده."""
+        q = queue.Queue(maxsize=self.queue_size)
+        self._ensure_worker()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(q)
+            self.metrics['connections'] += 1
+        return q
+
+    def unsubscribe(self, user_id, q):
+        """يغلق طابور الاتصال عند انقطاعه."""
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues and q in queues:
+                queues.discard(q)
+                self.metrics['connections'] -= 1
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def dispatch(self, events):
+        """يوزع الأحداث (كائنات لها user_id) على طوابير أصحابها ويعيد عدد مرات التسليم."""
+        delivered = 0
+        with self._lock:
+            for event in events:
+                for q in list(self._subscribers.get(event.user_id, ())):
+                    try:
+                        q.put_nowait(event)
+                        delivered += 1
+                    except queue.Full:
+                        # اتصال متوقف عن القراءة: إغلاقه بدلاً من تراكم الأحداث في الذاكرة
+                        self._subscribers[event.user_id].discard(q)
+                        self.metrics['connections'] -= 1
+                        self.metrics['dropped'] += 1
+                        self._close(q)
+            self.metrics['delivered'] += delivered
+        return delivered
+
+    @staticmethod
+    def _close(q):
+        """يفرغ الطابور ويضع علامة الإغلاق (None) لينهي الاتصال بثه."""
+        try:
+            while True:
+                q.get_nowait()
+        except queue.Empty:
+            pass
+        q.put_nowait(None)
+
+    def _advance(self, now):
+        """يرفع الحد إلى أكبر معرف مقروء مضى عليه زمن الاستقرار، ويحذف ما دونه من المقروء."""
+        cutoff = now - timedelta(seconds=self.settle_seconds)
+        settled = [event_id for event_id, created_at in self._seen.items() if created_at < cutoff]
+        if settled:
+            self._watermark = max(self._watermark, max(settled))
+            self._seen = {event_id: created_at for event_id, created_at in self._seen.items()
+                          if event_id > self._watermark}
+
+    def _poll(self):
+        from app.extensions import db
+        from app.utils.stream_events import unseen_events
+
+        try:
+            now = datetime.utcnow()
+            events = unseen_events(self._watermark, self._top, self._seen, limit=self.batch_size)
+            self.metrics['polls'] += 1
+            if events:
+                self.metrics['late'] += sum(event.id <= self._top for event in events)
+                for event in events:
+                    self._seen[event.id] = event.created_at
+                    event.cursor = self._watermark
+                self._top = max(self._top, events[-1].id)
+                self.dispatch(events)
+            self._advance(now)
+            return len(events)
+        finally:
+            db.session.remove()
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    count = self._poll()
+                if count and count >= self.batch_size:
+                    continue  # ما زالت هناك أحداث متراكمة
+            except Exception as e:
+                self.metrics['last_error'] = str(e)
+                self.app.logger.exception('فشل قراءة أحداث البث المباشر')
+            time.sleep(self.poll_interval)
+
+    def get_metrics(self):
+        with self._lock:
+            return dict(self.metrics, users=len(self._subscribers))
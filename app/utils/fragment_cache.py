@@ -0,0 +1,396 @@
+# app/utils/fragment_cache.py
+# ذاكرة مؤقتة لأجزاء الصفحات (Fragment Cache) في لوحات التحكم
+# كل جزء يُخزن بمفتاح يتضمن "إصدار بيانات براءة الذمة"، وهذا الإصدار يتغير تلقائياً عند حفظ أي تغيير
+# على الطلاب أو سجلات براءة الذمة أو الملخصات أو العدادات (إرسال طلب، تحديث حالة، استيراد، تصفير النظام).
+# لذلك لا حاجة لحذف الأجزاء القديمة: تصبح غير قابلة للوصول وتُزال بسياسة LRU.
+#
+# الأجزاء الخاصة بشعبة أو طالب تُعلن نطاقها (departments/students)، فيتضمن مفتاحها إصدار نطاقها فقط:
+# القرار في شعبة يبطل أجزاء تلك الشعبة وأجزاء الطلاب المعنيين، لا قوائم الشعب الأخرى. التغيير الذي لا يُعرف
+# نطاقه (تعديل مستخدم، دورة جديدة، استيراد) يرفع الإصدار العام الذي تتضمنه جميع المفاتيح.
+# نطاق الطالب مجموعة من STUDENT_BUCKETS إشارة (معرف الطالب mod العدد) حتى يبقى عدد ملفات الإشارات محدوداً.
+#
+# الاستخدام في القوالب:
+#     {% call cache_fragment('admin-stats') %} ... {% endcall %}
+#     {% call cache_fragment('section-queue', department, college, departments=[department]) %} ... {% endcall %}
+# عند وجود الجزء في الذاكرة لا يُنفذ محتوى الكتلة إطلاقاً (ولا الاستعلامات التي بداخلها).
+# رمز CSRF يختلف لكل جلسة، لذلك يُكتب داخل الأجزاء المخزنة كعلامة (fragment_csrf_field) ويُستبدل عند العرض.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import g, has_request_context
+from markupsafe import Markup
+from sqlalchemy import event
+
+from app.utils.cache_signal import FileSignal
+
+# إشارة إصدار بيانات براءة الذمة المشتركة بين عمليات الخادم (تتغير مع أي حفظ)
+clearance_signal = FileSignal('clearance_data')
+
+# إشارة التغييرات غير محددة النطاق (تبطل أجزاء الشعب والطلاب أيضاً)
+unscoped_signal = FileSignal('clearance_data.all')
+
+# الجداول التي يغير حفظها محتوى لوحات التحكم
+TRACKED_TABLES = ('user', 'clearance_status', 'clearance_summary', 'clearance_counter', 'clearance_cycle')
+
+# عدد إشارات نطاق الطلاب
+STUDENT_BUCKETS = 256
+
+# علامة رمز CSRF داخل الأجزاء المخزنة
+CSRF_PLACEHOLDER = '__fragment_csrf_token__'
+
+
+def data_version():
+    """يعيد الإصدار الحالي لبيانات براءة الذمة."""
+    return clearance_signal.version()
+
+
+def bump_data_version():
+    """يبطل جميع الأجزاء المخزنة في جميع العمليات."""
+    unscoped_signal.bump()
+    return clearance_signal.bump()
+
+
+def _scope_signal(scope):
+    from app.utils.departments import department_id
+
+    kind, value = scope
+    if kind == 'department':
+        return FileSignal(f'clearance_data.department.{department_id(value)}')
+    return FileSignal(f'clearance_data.student.{int(value) % STUDENT_BUCKETS}')
+
+
+def _scopes(departments=(), students=()):
+    return {('department', d) for d in departments} | {('student', s) for s in students}
+
+
+def bump_scopes(scopes):
+    """يبطل أجزاء النطاقات المحددة والأجزاء العامة، دون أجزاء النطاقات الأخرى."""
+    for signal_name in {_scope_signal(scope).name for scope in scopes}:
+        FileSignal(signal_name).bump()
+    return clearance_signal.bump()
+
+
+def _mark_changed(session, scopes=None):
+    """يسجل في الجلسة تغييراً ينتظر commit؛ scopes=None لتغيير غير محدد النطاق."""
+    if scopes is None:
+        session.info['clearance_data_unscoped'] = True
+    else:
+        session.info.setdefault('clearance_data_scopes', set()).update(scopes)
+
+
+@contextmanager
+def scoped_changes(departments=(), students=()):
+    """
+    العبارات الجماعية (update/insert/delete) داخل الكتلة تغير بيانات هذه الشعب والطلاب فقط.
+    خارجها تُعد العبارة الجماعية على الجداول المتتبعة تغييراً غير محدد النطاق.
+    """
+    from app.extensions import db
+
+    info = db.session.info
+    previous = info.get('clearance_data_scope')
+    info['clearance_data_scope'] = _scopes(departments, students)
+    try:
+        yield
+    finally:
+        info['clearance_data_scope'] = previous
+
+
+class MemoryBackend:
+    """تخزين داخل ذاكرة العملية مع إزالة الأقدم استخداماً (LRU) عند تجاوز عدد الأجزاء أو حجمها."""
+
+    def __init__(self, max_entries=500, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """يخزن الجزء ويعيد عدد الأجزاء التي أُزيلت لإفساح المجال."""
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.encode('utf-8'))
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, removed = self._entries.popitem(last=False)
+                self._bytes -= len(removed.encode('utf-8'))
+                evicted += 1
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+
+class FileSystemBackend:
+    """
+    تخزين مشترك بين العمليات في مجلد (ملف لكل جزء).
+    الكتابة ذرية (ملف مؤقت ثم os.replace)، وعند تجاوز الحد تُحذف الملفات الأقدم استخداماً (حسب mtime).
+    """
+
+    # عدد مرات الكتابة بين كل عملية تنظيف للمجلد
+    PRUNE_EVERY = 50
+
+    def __init__(self, path, max_entries=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{key}.html')
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # تحديث وقت آخر استخدام لسياسة LRU
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._file(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.replace(tmp, path)
+
+        with self._lock:
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY:
+                return 0
+        return self._prune()
+
+    def _prune(self):
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.html'):
+                try:
+                    files.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        excess = len(files) - self.max_entries
+        if excess <= 0:
+            return 0
+        files.sort()
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return excess
+
+    def clear(self):
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.html'):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def info(self):
+        entries = [e for e in os.scandir(self.path) if e.name.endswith('.html')]
+        return {'entries': len(entries), 'bytes': sum(e.stat().st_size for e in entries)}
+
+
+class NullBackend:
+    """تعطيل التخزين (كل طلب يعيد عرض الأجزاء)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        return 0
+
+    def clear(self):
+        pass
+
+    def info(self):
+        return {'entries': 0, 'bytes': 0}
+
+
+class FragmentCache:
+    """واجهة ذاكرة الأجزاء: اختيار الخلفية من الإعدادات، بناء المفاتيح، والإحصائيات."""
+
+    def __init__(self):
+        self.backend = NullBackend()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        kind = config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+        if kind == 'memory':
+            self.backend = MemoryBackend(
+                max_entries=config.get('FRAGMENT_CACHE_MAX_ENTRIES', 500),
+                max_bytes=config.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+            )
+        elif kind == 'filesystem':
+            self.backend = FileSystemBackend(
+                config.get('FRAGMENT_CACHE_DIR') or os.path.join(app.instance_path, 'cache', 'fragments'),
+                max_entries=config.get('FRAGMENT_CACHE_MAX_ENTRIES', 500),
+            )
+        else:
+            self.backend = NullBackend()
+
+        app.extensions['fragment_cache'] = self
+        app.before_request(_pin_data_version)
+        _register_session_events()
+        app.jinja_env.globals['cache_fragment'] = self.cache_fragment
+        app.jinja_env.globals['fragment_csrf_field'] = fragment_csrf_field
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    @staticmethod
+    def key(name, parts, scopes=None):
+        """
+        مفتاح الجزء: الاسم والمعاملات والإصدار. للجزء العام إصدار البيانات المثبت في بداية الطلب،
+        ولجزء النطاق إصدار التغييرات غير محددة النطاق مع إصدار كل نطاق (يُقرأ قبل عرض الجزء).
+        """
+        if scopes:
+            versions = [unscoped_signal.version()] + [_scope_signal(scope).version() for scope in sorted(scopes)]
+        else:
+            version = g.get('clearance_data_version') if has_request_context() else None
+            versions = [data_version() if version is None else version]
+        raw = '\x1f'.join([name, *(str(v) for v in versions), *(str(p) for p in parts)])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def get_or_render(self, name, parts, render, scopes=None):
+        """يعيد الجزء المخزن، أو يعرضه بالدالة render ويخزنه."""
+        key = self.key(name, parts, scopes)
+        value = self.backend.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+        value = str(render())
+        self._count('evictions', self.backend.set(key, value) or 0)
+        self._count('sets')
+        return value
+
+    def cache_fragment(self, name, *parts, caller, departments=(), students=()):
+        """
+        دالة القوالب: {% call cache_fragment(name, *parts) %} ... {% endcall %}
+        departments/students: نطاق بيانات الجزء (دونهما يُبطل الجزء مع أي تغيير).
+        """
+        from flask_wtf.csrf import generate_csrf
+
+        html = self.get_or_render(name, parts, caller, _scopes(departments, students))
+        if CSRF_PLACEHOLDER in html:
+            html = html.replace(CSRF_PLACEHOLDER, generate_csrf())
+        return Markup(html)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_metrics(self):
+        """إحصائيات الإصابة والإخفاق في هذه العملية مع حجم الخلفية."""
+        with self._lock:
+            metrics = dict(self._stats)
+        lookups = metrics['hits'] + metrics['misses']
+        metrics['hit_ratio'] = round(metrics['hits'] / lookups, 3) if lookups else 0.0
+        metrics['backend'] = type(self.backend).__name__
+        metrics.update(self.backend.info())
+        return metrics
+
+
+def _pin_data_version():
+    # قراءة الإصدار قبل أي استعلام في الطلب، حتى لا يُخزن جزء ببيانات أقدم من إصدار مفتاحه
+    g.clearance_data_version = data_version()
+
+
+def fragment_csrf_field():
+    """حقل CSRF داخل جزء مخزن (تُستبدل العلامة برمز الجلسة الحالية عند العرض)."""
+    return Markup(f'<input id="csrf_token" name="csrf_token" type="hidden" value="{CSRF_PLACEHOLDER}">')
+
+
+_events = {'registered': False}
+
+
+def _register_session_events():
+    """
+    يربط أحداث الجلسة بإصدار البيانات: أي حفظ يغير الجداول المتتبعة يرفع الإصدار بعد commit.
+    يشمل ذلك تغييرات الكائنات (flush) والعبارات الجماعية (insert/update/delete عبر الجلسة).
+    نطاق تغييرات الكائنات يُستنتج منها (الشعبة والطالب)، ونطاق العبارات الجماعية من scoped_changes.
+    """
+    from app.extensions import db
+
+    if _events['registered']:
+        return
+    _events['registered'] = True
+
+    def object_scopes(obj):
+        """نطاق تغيير الكائن، أو None إذا كان غير محدد النطاق."""
+        table = obj.__table__.name
+        if table == 'clearance_status':
+            return _scopes([obj.department], [obj.student_id])
+        if table == 'clearance_summary':
+            return _scopes(students=[obj.student_id])
+        if table == 'clearance_counter':
+            return _scopes(departments=[obj.department])
+        return None
+
+    def tracked(obj):
+        table = getattr(getattr(obj, '__table__', None), 'name', None)
+        return table in TRACKED_TABLES
+
+    @event.listens_for(db.session, 'before_flush')
+    def _track_flush(session, flush_context, instances):
+        changed = [obj for obj in (*session.new, *session.deleted) if tracked(obj)]
+        changed += [obj for obj in session.dirty if tracked(obj) and session.is_modified(obj)]
+        for obj in changed:
+            _mark_changed(session, object_scopes(obj))
+
+    @event.listens_for(db.session, 'do_orm_execute')
+    def _track_statements(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.local_table.name in TRACKED_TABLES:
+            session = orm_execute_state.session
+            _mark_changed(session, session.info.get('clearance_data_scope'))
+
+    @event.listens_for(db.session, 'after_commit')
+    def _bump_after_commit(session):
+        unscoped = session.info.pop('clearance_data_unscoped', False)
+        scopes = session.info.pop('clearance_data_scopes', None)
+        if unscoped:
+            bump_data_version()
+        elif scopes:
+            bump_scopes(scopes)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard_after_rollback(session):
+        session.info.pop('clearance_data_unscoped', None)
+        session.info.pop('clearance_data_scopes', None)
@@ -0,0 +1,116 @@
+# app/utils/import_jobs.py
+# استيراد ملفات Excel كمهام في الخلفية
+# يحفظ الطلب الملف ويسجل مهمة في جدول ImportJob ثم يعود مباشرة،
+# وتتولى مجموعة خيوط الخلفية المعالجة مع تحديث التقدم بعد كل دفعة حتى تتابعه الواجهة.
+
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import ImportJob, User
+from app.utils.mail_outbox import enqueue_mail
+from app.utils.student_import import import_student_frame, missing_required_columns, REQUIRED_COLUMNS
+
+# أقصى عدد من الأخطاء المحفوظة لكل مهمة (لتجنب تخزين نصوص ضخمة في قاعدة البيانات)
+MAX_STORED_ERRORS = 500
+
+
+def _upload_folder():
+    """مجلد حفظ الملفات المرفوعة بانتظار المعالجة (داخل مجلد instance)."""
+    folder = os.path.join(current_app.instance_path, 'imports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def create_import_job(file, user):
+    """
+    يحفظ الملف المرفوع وينشئ مهمة استيراد بحالة queued.
+
+    يعيد (job, path) حيث path هو مسار الملف المحفوظ.
+    """
+    job = ImportJob(created_by=user.id, filename=file.filename, status='queued')
+    db.session.add(job)
+    db.session.commit()
+
+    extension = os.path.splitext(file.filename)[1].lower()
+    path = os.path.join(_upload_folder(), f'{job.id}{extension}')
+    file.save(path)
+    return job, path
+
+
+def _update_job(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+
+
+def run_import_job(job_id, path):
+    """
+    ينفذ مهمة الاستيراد (يُستدعى من خيط الخلفية داخل سياق التطبيق).
+
+    رسائل الترحيب تُضاف إلى صندوق البريد الصادر في معاملة كل دفعة مع حساباتها، وتكتمل المهمة بعد حفظ
+    الصفوف مباشرة دون انتظار الإرسال (يتولاه عامل البريد بالمعدل المسموح).
+    """
+    from app.routes import welcome_email_message
+
+    def enqueue_welcome(credentials):
+        # معرفات الحسابات المضافة للتو (الإدخال المجمع لا يعيدها) باستعلام IN واحد للدفعة
+        ids = dict(db.session.execute(
+            select(User.university_id, User.id)
+            .where(User.university_id.in_([row['university_id'] for row, _ in credentials]))
+        ).all())
+        enqueue_mail(
+            (ids[row['university_id']],
+             welcome_email_message(User(**{k: v for k, v in row.items() if k != 'password_hash'}), password))
+            for row, password in credentials
+        )
+
+    job = db.session.get(ImportJob, job_id)
+    _update_job(job, status='running', started_at=datetime.utcnow())
+
+    try:
+        df = pd.read_excel(path)
+        if missing_required_columns(df):
+            raise ValueError(f'الملف يجب أن يحتوي على الأعمدة التالية: {", ".join(REQUIRED_COLUMNS)}')
+        _update_job(job, total_rows=len(df))
+
+        def on_progress(report, processed):
+            _update_job(job, processed_rows=processed,
+                        imported_count=report.imported, error_count=len(report.errors))
+
+        report = import_student_frame(df, on_progress=on_progress, on_insert=enqueue_welcome)
+
+        _update_job(job, status='completed', finished_at=datetime.utcnow(),
+                    processed_rows=len(df), imported_count=report.imported, error_count=len(report.errors),
+                    errors=json.dumps(report.error_messages[:MAX_STORED_ERRORS], ensure_ascii=False))
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(ImportJob, job_id)
+        _update_job(job, status='failed', finished_at=datetime.utcnow(),
+                    errors=json.dumps([f'حدث خطأ أثناء معالجة الملف: {e}'], ensure_ascii=False))
+    finally:
+        db.session.remove()
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def job_to_dict(job):
+    """يحول المهمة إلى قاموس لاستجابة JSON."""
+    percent = round(100 * job.processed_rows / job.total_rows) if job.total_rows else 0
+    return {
+        'id': job.id,
+        'filename': job.filename,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'imported_count': job.imported_count,
+        'error_count': job.error_count,
+        'percent': 100 if job.status == 'completed' else percent,
+        'errors': json.loads(job.errors) if job.errors else [],
+        'finished': job.status in ('completed', 'failed'),
+    }
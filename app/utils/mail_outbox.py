@@ -0,0 +1,81 @@
+# app/utils/mail_outbox.py
+# صندوق البريد الصادر لرسائل الترحيب (Transactional Outbox)
+# رسالة الترحيب تحمل كلمة مرور مولدة لا يمكن استرجاعها، فلا تُترك في طابور الذاكرة (تضيع عند إعادة التشغيل):
+# تُضاف إلى جدول MailOutbox في معاملة إنشاء الحساب نفسها، ويتولى العامل (flask --app run email worker)
+# سحبها على دفعات وإرسال كل دفعة عبر اتصال SMTP واحد مع إعادة المحاولة، بنفس منطق صندوق الإشعارات الفورية
+# (app/utils/outbox.py). يُمسح نص الرسالة بعد إرسالها، وتُحذف الرسائل الميتة مع المرسلة عند التنظيف (purge).
+
+import time
+from datetime import datetime
+
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import insert
+
+from app.extensions import db, mail
+from app.models import MailOutbox
+from app.utils.outbox import Outbox
+
+
+def enqueue_mail(items):
+    """
+    يضيف رسائل إلى الصندوق بعبارة INSERT واحدة دون حفظ المعاملة.
+
+    المعاملات:
+    items: قائمة (user_id, msg) حيث msg رسالة flask_mail (المستلم الأول فقط).
+
+    يعيد عدد الرسائل المضافة.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {'user_id': user_id, 'recipient': msg.recipients[0], 'subject': msg.subject, 'body': msg.body,
+         'status': 'pending', 'attempts': 0, 'next_attempt_at': now, 'created_at': now}
+        for user_id, msg in items if msg is not None
+    ]
+    if rows:
+        db.session.execute(insert(MailOutbox), rows)
+    return len(rows)
+
+
+def _throttle(state):
+    """لا يتجاوز MAIL_RATE_LIMIT رسالة في الثانية (0 = بدون حد)."""
+    rate_limit = current_app.config.get('MAIL_RATE_LIMIT', 0)
+    if not rate_limit:
+        return
+    now = time.monotonic()
+    if state['next_send_at'] > now:
+        time.sleep(state['next_send_at'] - now)
+    state['next_send_at'] = max(now, state['next_send_at']) + 1.0 / rate_limit
+
+
+def _send(batch):
+    """يرسل دفعة الرسائل عبر اتصال SMTP واحد."""
+    state = {'next_send_at': 0.0}
+    sender = current_app.config.get('MAIL_USERNAME')
+    sent, failures = [], {}
+    try:
+        with mail.connect() as connection:
+            for item in batch:
+                _throttle(state)
+                try:
+                    connection.send(Message(item.subject, sender=sender, recipients=[item.recipient], body=item.body))
+                except Exception as e:
+                    failures[item.id] = (repr(e), False)
+                else:
+                    sent.append(item.id)
+    except Exception as e:
+        # تعذر الاتصال بخادم البريد أو انقطع: محاولة لاحقة لما لم يُرسل من الدفعة
+        current_app.logger.exception('تعذر الاتصال بخادم البريد لإرسال صندوق البريد الصادر')
+        done = set(sent) | set(failures)
+        failures.update({item.id: (repr(e), False) for item in batch if item.id not in done})
+    return sent, failures
+
+
+# صندوق البريد: الحجز وإعادة المحاولة والحالات من Outbox المشترك
+outbox = Outbox(
+    MailOutbox, _send,
+    columns=('recipient', 'subject', 'body'),
+    config_prefix='MAIL_OUTBOX',
+    defaults={'BATCH_SIZE': 50, 'MAX_ATTEMPTS': 8, 'BACKOFF_BASE': 60, 'BACKOFF_MAX': 3600, 'LEASE_SECONDS': 600},
+    on_sent={'body': None},  # لا تبقى كلمة المرور في قاعدة البيانات بعد الإرسال
+)
@@ -0,0 +1,125 @@
+# app/utils/notification_retention.py
+# سياسة الاحتفاظ بالإشعارات: حذف أو أرشفة الإشعارات القديمة على دفعات صغيرة
+# كل دفعة تُحفظ في معاملة مستقلة وتحذف الصفوف بالمفتاح الأساسي (IN)، فلا يُقفل الجدول بالكامل
+# ويمكن تشغيل المهمة أثناء عمل النظام، مع استراحة قصيرة بين الدفعات لتخفيف الحمل.
+# التشغيل: flask --app run notifications purge
+
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, insert, delete, func
+
+from app.extensions import db
+from app.models import Notification, NotificationArchive
+
+# أعمدة الإشعار المنسوخة إلى الأرشيف (أسماء الأعمدة في الجدول)
+ARCHIVE_COLUMNS = ('id', 'user_id', 'message', 'timestamp', 'is_read', 'type', 'related_student_id', 'department_id')
+
+
+class RetentionReport:
+    """نتيجة مهمة التنظيف: عدد الصفوف والدفعات والزمن."""
+
+    def __init__(self):
+        self.processed = 0
+        self.chunks = 0
+        self._started = time.perf_counter()
+        self._finished = None
+
+    def finish(self):
+        self._finished = time.perf_counter()
+        return self
+
+    @property
+    def elapsed(self):
+        return (self._finished or time.perf_counter()) - self._started
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def retention_policies(read_days=None, unread_days=None):
+    """
+    يعيد شروط الإشعارات المنتهية صلاحيتها حسب السياسة: قائمة (name, condition).
+
+    المقروءة تُحذف بعد read_days يوماً، وغير المقروءة بعد unread_days يوماً (None أو 0 = عدم الحذف).
+    كل شرط يستخدم الفهرس (is_read, timestamp).
+    """
+    config = current_app.config
+    read_days = config.get('NOTIFICATION_RETENTION_READ_DAYS', 30) if read_days is None else read_days
+    unread_days = config.get('NOTIFICATION_RETENTION_UNREAD_DAYS', 180) if unread_days is None else unread_days
+
+    now = datetime.utcnow()
+    policies = []
+    if read_days:
+        policies.append(('read', (Notification.is_read.is_(True),
+                                  Notification.timestamp < now - timedelta(days=read_days))))
+    if unread_days:
+        policies.append(('unread', (Notification.is_read.is_(False),
+                                    Notification.timestamp < now - timedelta(days=unread_days))))
+    return policies
+
+
+def count_expired(conditions):
+    """يعيد عدد الإشعارات المطابقة للشروط (للتشغيل التجريبي)."""
+    return db.session.query(func.count(Notification.id)).filter(*conditions).scalar()
+
+
+def purge_in_chunks(conditions=(), archive=False, chunk_size=None, pause=None, report=None, on_chunk=None):
+    """
+    يحذف (أو يؤرشف ثم يحذف) الإشعارات المطابقة للشروط على دفعات، مع commit بعد كل دفعة.
+
+    المعاملات:
+    conditions: شروط SQLAlchemy (بدون شروط = جميع الإشعارات).
+    archive: نسخ الصفوف إلى NotificationArchive قبل حذفها.
+    chunk_size: عدد الصفوف في كل دفعة.
+    pause: مدة الاستراحة بين الدفعات بالثواني.
+    on_chunk: دالة اختيارية تستدعى بعد كل دفعة بالشكل on_chunk(report).
+
+    يعيد كائن RetentionReport.
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config.get('NOTIFICATION_RETENTION_CHUNK', 1000)
+    pause = config.get('NOTIFICATION_RETENTION_PAUSE', 0.05) if pause is None else pause
+    owns_report = report is None
+    report = report or RetentionReport()
+
+    while True:
+        ids = db.session.scalars(select(Notification.id).where(*conditions).limit(chunk_size)).all()
+        if not ids:
+            break
+
+        if archive:
+            columns = [Notification.__table__.c[name] for name in ARCHIVE_COLUMNS]
+            db.session.execute(insert(NotificationArchive).from_select(
+                list(ARCHIVE_COLUMNS),
+                select(*columns).where(Notification.id.in_(ids)),
+            ))
+        db.session.execute(
+            delete(Notification).where(Notification.id.in_(ids)),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+        report.processed += len(ids)
+        report.chunks += 1
+        if on_chunk:
+            on_chunk(report)
+        if len(ids) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return report.finish() if owns_report else report
+
+
+def apply_retention(read_days=None, unread_days=None, archive=None, chunk_size=None, pause=None, on_chunk=None):
+    """يطبق سياسة الاحتفاظ بالكامل ويعيد كائن RetentionReport واحداً لجميع السياسات."""
+    if archive is None:
+        archive = current_app.config.get('NOTIFICATION_RETENTION_MODE', 'archive') == 'archive'
+    report = RetentionReport()
+    for _, conditions in retention_policies(read_days, unread_days):
+        purge_in_chunks(conditions, archive=archive, chunk_size=chunk_size, pause=pause,
+                        report=report, on_chunk=on_chunk)
+    return report.finish()
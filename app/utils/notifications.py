@@ -0,0 +1,85 @@
+# app/utils/notifications.py
+# خدمة الإشعارات الداخلية
+# بدلاً من تحميل سجل إشعارات المستخدم بالكامل (current_user.notifications) في كل صفحة،
+# يُحسب عدد غير المقروءة باستعلام COUNT على الفهرس، وتُعرض آخر الإشعارات فقط،
+# ويُجلب الباقي عند الطلب على صفحات بالمؤشر (الأحدث أولاً).
+
+from flask import current_app
+from sqlalchemy import func, update
+
+from app.extensions import db
+from app.models import Notification
+from app.utils.pagination import keyset_paginate
+
+# عدد الإشعارات المعروضة في القائمة المنسدلة
+DROPDOWN_LIMIT = 10
+
+# أنواع الإشعارات
+CLEARANCE_REQUEST = 'clearance_request'   # طلب براءة ذمة جديد (لمسؤول الشعبة)
+STATUS_UPDATE = 'status_update'           # تغيير حالة الطالب في شعبة (للطالب)
+
+
+def unread_count(user_id):
+    """يعيد عدد الإشعارات غير المقروءة (يستخدم الفهرس (user_id, is_read) دون قراءة الصفوف)."""
+    return (
+        db.session.query(func.count(Notification.id))
+        .filter(Notification.user_id == user_id, Notification.is_read.is_(False))
+        .scalar()
+    )
+
+
+def mark_read(user_id, type=None, related_student_id=None, department=None):
+    """
+    يعلّم إشعارات المستخدم غير المقروءة كمقروءة بعبارة UPDATE واحدة دون تحميلها،
+    مع إمكانية التحديد حسب النوع أو الطالب المعني (معرف أو قائمة معرفات) أو الشعبة. لا يقوم بعمل commit.
+
+    يعيد عدد الإشعارات التي تم تعليمها.
+    """
+    conditions = [Notification.user_id == user_id, Notification.is_read.is_(False)]
+    if type is not None:
+        conditions.append(Notification.type == type)
+    if isinstance(related_student_id, (list, tuple, set)):
+        conditions.append(Notification.related_student_id.in_(related_student_id))
+    elif related_student_id is not None:
+        conditions.append(Notification.related_student_id == related_student_id)
+    if department is not None:
+        conditions.append(Notification.department == department)
+
+    result = db.session.execute(
+        update(Notification).where(*conditions).values(is_read=True),
+        execution_options={'synchronize_session': False},
+    )
+    return result.rowcount
+
+
+def notification_feed(user_id, after=None, per_page=None):
+    """
+    يعيد صفحة من إشعارات المستخدم من الأحدث إلى الأقدم.
+
+    المعاملات:
+    after: معرف آخر إشعار معروض (لجلب الإشعارات الأقدم منه).
+    """
+    query = Notification.query.filter(Notification.user_id == user_id)
+    return keyset_paginate(query, Notification.id, after=after, per_page=per_page, descending=True)
+
+
+def latest_notifications(user_id):
+    """يعيد صفحة بآخر الإشعارات لعرضها في القائمة المنسدلة."""
+    limit = current_app.config.get('NOTIFICATIONS_DROPDOWN_LIMIT', DROPDOWN_LIMIT)
+    return notification_feed(user_id, per_page=limit)
+
+
+def notification_to_dict(notification):
+    """يحول الإشعار إلى قاموس لاستجابة JSON."""
+    from app import format_local_time
+
+    return {
+        'id': notification.id,
+        'message': notification.message,
+        'timestamp': notification.timestamp.isoformat() if notification.timestamp else None,
+        'local_time': format_local_time(notification.timestamp),
+        'is_read': bool(notification.is_read),
+        'type': notification.type,
+        'related_student_id': notification.related_student_id,
+        'department': notification.department,
+    }
@@ -0,0 +1,97 @@
+# app/utils/officer_routing.py
+# جدول توجيه طلبات براءة الذمة إلى مسؤولي الشعب: (الشعبة، الكلية) -> معرفات المسؤولين
+# يُبنى الجدول باستعلام واحد لجميع مسؤولي الشعب ويحفظ في ذاكرة العملية،
+# ويُبطل تلقائياً (في جميع العمليات) عند حفظ أي تغيير على مسؤول شعبة.
+
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+
+from app.extensions import db
+from app.models import User
+from app.utils.cache_signal import FileSignal
+
+# إشارة الإبطال المشتركة بين عمليات الخادم
+routing_signal = FileSignal('officer_routing')
+
+# الجدول المحفوظ في ذاكرة العملية الحالية: (version, {department: [(officer_id, college), ...]})
+_cache = {'version': None, 'routes': None}
+
+
+def _load_routes():
+    """يقرأ جميع مسؤولي الشعب باستعلام واحد ويجمعهم حسب الشعبة."""
+    routes = defaultdict(list)
+    rows = db.session.query(User.id, User.department, User.college).filter(User.role == 'section_head')
+    for officer_id, department, college in rows:
+        if department:
+            routes[department].append((officer_id, college))
+    return dict(routes)
+
+
+def _routes():
+    version = routing_signal.version()
+    if _cache['version'] != version or _cache['routes'] is None:
+        _cache['routes'] = _load_routes()
+        _cache['version'] = version
+    return _cache['routes']
+
+
+def officers_for(college, departments):
+    """
+    يعيد المسؤولين المعنيين بطلب طالب من كلية معينة لكل شعبة.
+
+    المسؤول المخصص لكلية يرى طلبات طلاب تلك الكلية فقط، والمسؤول بدون كلية يرى جميع الطلبات
+    (نفس منطق لوحة مسؤول الشعبة).
+
+    يعيد قاموساً {department: [officer_id, ...]}.
+    """
+    routes = _routes()
+    return {
+        department: [officer_id for officer_id, officer_college in routes.get(department, [])
+                     if not officer_college or officer_college == college]
+        for department in departments
+    }
+
+
+def invalidate_routes():
+    """يبطل جدول التوجيه في جميع العمليات."""
+    _cache['routes'] = None
+    routing_signal.bump()
+
+
+def _affects_routing(user, deleted=False):
+    """هل يغير حفظ هذا المستخدم جدول التوجيه؟ (مسؤول شعبة حالياً أو سابقاً، أو تغيرت شعبته أو كليته)"""
+    state = inspect(user)
+    if 'section_head' in (state.attrs.role.history.deleted or ()):
+        return True
+    if user.role != 'section_head':
+        return False
+    return (deleted or state.pending or
+            any(state.attrs[name].history.has_changes() for name in ('department', 'college')))
+
+
+_events = {'registered': False}
+
+
+def init_officer_routing(app):
+    """يربط أحداث الجلسة بإبطال جدول التوجيه: أي حفظ يغير مسؤول شعبة يبطله بعد commit."""
+    if _events['registered']:
+        return
+    _events['registered'] = True
+
+    @event.listens_for(db.session, 'before_flush')
+    def _track_routing_changes(session, flush_context, instances):
+        changed = [(obj, False) for obj in (*session.new, *session.dirty) if isinstance(obj, User)]
+        changed += [(obj, True) for obj in session.deleted if isinstance(obj, User)]
+        if any(_affects_routing(user, deleted) for user, deleted in changed):
+            session.info['officer_routing_dirty'] = True
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate_after_commit(session):
+        # الإبطال بعد الحفظ فقط، حتى لا تعيد عملية أخرى بناء الجدول من بيانات لم تُحفظ بعد
+        if session.info.pop('officer_routing_dirty', False):
+            invalidate_routes()
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard_after_rollback(session):
+        session.info.pop('officer_routing_dirty', None)
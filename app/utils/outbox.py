@@ -0,0 +1,158 @@
+# app/utils/outbox.py
+# المنطق المشترك لصناديق الرسائل الصادرة (Transactional Outbox) للإشعارات الفورية ورسائل الترحيب
+# المسار يضيف الرسالة إلى جدول صندوقها داخل معاملته، والعامل يحجز دفعة مستحقة ويرسلها بدالة الإرسال الخاصة
+# بالصندوق، ثم يسجل النتائج بعبارة UPDATE واحدة لكل نتيجة (مرسلة، إعادة محاولة، فشل نهائي) مع تأجيل
+# إعادة المحاولة تصاعدياً (Exponential Backoff).
+#
+# الدفعة تُقرأ كصفوف (Row) قبل حفظ الحجز لا ككائنات ORM، فلا يعيد commit الحجز تحميلها صفاً صفاً
+# بعد تحرير قفل FOR UPDATE.
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, func, update, delete, case, or_, and_
+
+from app.extensions import db
+
+# حالات الرسالة في الصندوق
+PENDING = 'pending'
+SENT = 'sent'
+DEAD = 'dead'
+
+# أقصى طول لرسالة الخطأ المحفوظة
+MAX_ERROR_LENGTH = 1000
+
+
+class Outbox:
+    """
+    صندوق صادر لجدول محدد.
+
+    المعاملات:
+    model: نموذج الجدول (الأعمدة status, attempts, next_attempt_at, last_error, created_at, sent_at).
+    send: دالة الإرسال send(batch) حيث batch صفوف الدفعة (id, attempts ثم columns)، وتعيد (sent_ids, failures)
+          و failures قاموس {id: (error, permanent)}. permanent=True للفشل الذي لا تفيد معه إعادة المحاولة.
+          ما لا يرد في أي منهما يُعد فشلاً مؤقتاً.
+    columns: أسماء الأعمدة التي تحتاجها دالة الإرسال.
+    config_prefix: بادئة الإعدادات (<prefix>_BATCH_SIZE, _MAX_ATTEMPTS, _BACKOFF_BASE, _BACKOFF_MAX, _LEASE_SECONDS).
+    defaults: القيم الافتراضية لهذه الإعدادات (بدون البادئة).
+    on_sent: قيم إضافية تُعين للرسائل المرسلة.
+    """
+
+    def __init__(self, model, send, columns, config_prefix, defaults, on_sent=None):
+        self.model = model
+        self.send = send
+        self.columns = columns
+        self.config_prefix = config_prefix
+        self.defaults = defaults
+        self.on_sent = on_sent or {}
+
+    def config(self, name):
+        return current_app.config.get(f'{self.config_prefix}_{name}', self.defaults[name])
+
+    def backoff_delay(self, attempts):
+        """مدة الانتظار قبل المحاولة التالية: تتضاعف مع كل محاولة فاشلة حتى حد أقصى."""
+        base = self.config('BACKOFF_BASE')
+        return timedelta(seconds=min(base * 2 ** (attempts - 1), self.config('BACKOFF_MAX')))
+
+    def claim_batch(self, batch_size=None):
+        """
+        يحجز دفعة من الرسائل المستحقة ويعيد صفوفها.
+
+        الحجز يؤجل موعد المحاولة التالية بمدة <prefix>_LEASE_SECONDS، فلا يلتقطها عامل آخر أثناء الإرسال،
+        وتعود متاحة تلقائياً إذا توقف العامل قبل إنهائها. SKIP LOCKED يسمح بتشغيل أكثر من عامل على MySQL 8.
+        """
+        model = self.model
+        now = datetime.utcnow()
+        batch = db.session.execute(
+            select(model.id, model.attempts, *(getattr(model, name) for name in self.columns))
+            .where(model.status == PENDING, model.next_attempt_at <= now)
+            .order_by(model.next_attempt_at, model.id)
+            .limit(batch_size or self.config('BATCH_SIZE'))
+            .with_for_update(skip_locked=True)
+        ).all()
+        if batch:
+            db.session.execute(
+                update(model).where(model.id.in_([row.id for row in batch]))
+                .values(next_attempt_at=now + timedelta(seconds=self.config('LEASE_SECONDS'))),
+                execution_options={'synchronize_session': False},
+            )
+        db.session.commit()
+        return batch
+
+    def process_batch(self, batch_size=None):
+        """يرسل دفعة واحدة من الرسائل المستحقة ويعيد قاموساً بعدد (sent, retried, dead)."""
+        stats = {SENT: 0, 'retried': 0, DEAD: 0}
+        batch = self.claim_batch(batch_size)
+        if not batch:
+            return stats
+
+        default_error = 'لم تُرسل ضمن الدفعة'
+        try:
+            sent, failures = self.send(batch)
+        except Exception as e:
+            current_app.logger.exception(f'فشل إرسال دفعة من {self.model.__tablename__}')
+            sent, failures, default_error = (), {}, repr(e)
+
+        sent = set(sent)
+        now = datetime.utcnow()
+        dead, retried, retry_at = {}, {}, {}
+        for row in batch:
+            if row.id in sent:
+                continue
+            error, permanent = failures.get(row.id, (default_error, False))
+            error = str(error)[:MAX_ERROR_LENGTH]
+            if permanent or row.attempts + 1 >= self.config('MAX_ATTEMPTS'):
+                dead[row.id] = error
+            else:
+                retried[row.id] = error
+                retry_at[row.id] = now + self.backoff_delay(row.attempts + 1)
+
+        # عبارة UPDATE واحدة لكل نتيجة (الخطأ وموعد المحاولة التالية بتعبير CASE على المعرف)
+        model = self.model
+        attempts = model.attempts + 1
+        statements = []
+        if sent:
+            statements.append(update(model).where(model.id.in_(sent))
+                              .values(status=SENT, attempts=attempts, sent_at=now, **self.on_sent))
+        if dead:
+            statements.append(update(model).where(model.id.in_(dead))
+                              .values(status=DEAD, attempts=attempts, last_error=case(dead, value=model.id)))
+        if retried:
+            statements.append(update(model).where(model.id.in_(retried))
+                              .values(attempts=attempts, last_error=case(retried, value=model.id),
+                                      next_attempt_at=case(retry_at, value=model.id)))
+        for statement in statements:
+            db.session.execute(statement, execution_options={'synchronize_session': False})
+        db.session.commit()
+
+        stats.update({SENT: len(sent), 'retried': len(retried), DEAD: len(dead)})
+        return stats
+
+    def status(self):
+        """يعيد عدد الرسائل في كل حالة."""
+        model = self.model
+        return dict(db.session.execute(select(model.status, func.count(model.id)).group_by(model.status)).all())
+
+    def requeue_dead(self):
+        """يعيد الرسائل التي فشلت نهائياً (dead) إلى الطابور بمحاولات جديدة، ويعيد عددها."""
+        model = self.model
+        result = db.session.execute(
+            update(model).where(model.status == DEAD)
+            .values(status=PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def purge(self, days):
+        """
+        يحذف الرسائل المرسلة والميتة الأقدم من عدد الأيام المحدد، ويعيد عددها.
+        الميتة تُحذف أيضاً حتى لا يبقى محتواها (مثل كلمة مرور رسالة الترحيب) في الجدول بلا نهاية.
+        """
+        model = self.model
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        result = db.session.execute(delete(model).where(or_(
+            and_(model.status == SENT, model.sent_at < cutoff),
+            and_(model.status == DEAD, model.created_at < cutoff),
+        )))
+        db.session.commit()
+        return result.rowcount
@@ -0,0 +1,73 @@
+# app/utils/pagination.py
+# ترقيم الصفحات بطريقة المؤشر (Keyset / Seek Pagination)
+# بدلاً من OFFSET يتم البحث مباشرة عن أول سجل بعد (أو قبل) آخر معرف معروض،
+# فتبقى كلفة الصفحة ثابتة مهما تقدم المستخدم في الصفحات
+
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def clamp_per_page(per_page, default=DEFAULT_PER_PAGE, maximum=MAX_PER_PAGE):
+    """يحصر حجم الصفحة بين 1 والحد الأقصى المسموح."""
+    if not per_page or per_page < 1:
+        return default
+    return min(per_page, maximum)
+
+
+class KeysetPage:
+    """صفحة واحدة من النتائج مع مؤشرات الصفحة التالية والسابقة."""
+
+    def __init__(self, items, per_page, has_next, has_prev, key):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        # المؤشرات هي قيمة المفتاح لأول وآخر عنصر في الصفحة
+        self.next_cursor = key(items[-1]) if items and has_next else None
+        self.prev_cursor = key(items[0]) if items and has_prev else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_paginate(query, column, after=None, before=None, per_page=None, key=None, descending=False):
+    """
+    يجلب صفحة واحدة من الاستعلام مرتبة حسب العمود المحدد (تصاعدياً افتراضياً).
+
+    المعاملات:
+    query: استعلام SQLAlchemy (بعد تطبيق الفلاتر).
+    column: عمود المفتاح الفريد المستخدم في الترتيب (مثل User.id).
+    after: جلب العناصر التي تلي هذه القيمة (الصفحة التالية).
+    before: جلب العناصر التي تسبق هذه القيمة (الصفحة السابقة).
+    per_page: حجم الصفحة (يتم حصره بالحد الأقصى).
+    key: دالة لاستخراج قيمة المفتاح من العنصر (افتراضياً الخاصية بنفس اسم العمود).
+    descending: الترتيب تنازلياً (الأحدث أولاً)، وعندها تعني "التالية" القيم الأصغر.
+    """
+    per_page = clamp_per_page(per_page)
+    if key is None:
+        key = lambda item: getattr(item, column.key)
+
+    # اتجاه الترتيب والمقارنة للصفحة التالية، وعكسهما للصفحة السابقة
+    if descending:
+        forward_order, backward_order = column.desc(), column.asc()
+        is_after, is_before = (lambda value: column < value), (lambda value: column > value)
+    else:
+        forward_order, backward_order = column.asc(), column.desc()
+        is_after, is_before = (lambda value: column > value), (lambda value: column < value)
+
+    if before is not None:
+        # الصفحة السابقة: نرتب بالاتجاه المعاكس ثم نعكس النتيجة
+        rows = query.filter(is_before(before)).order_by(backward_order).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        return KeysetPage(items, per_page, has_next=True, has_prev=has_prev, key=key)
+
+    if after is not None:
+        query = query.filter(is_after(after))
+
+    rows = query.order_by(forward_order).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return KeysetPage(rows[:per_page], per_page, has_next=has_next, has_prev=after is not None, key=key)
@@ -0,0 +1,125 @@
+# app/utils/passwords.py
+# توليد كلمات المرور وتشفيرها على دفعات باستخدام عدة عمليات (Process Pool)
+# دالة generate_password_hash تستهلك المعالج بالكامل (CPU-bound)، لذلك لا تفيد الخيوط (Threads)
+# بسبب قفل GIL، بينما توزيع العمل على عمليات منفصلة يستفيد من جميع أنوية المعالج.
+# يجب أن تستخدم أي عملية إنشاء حسابات مجمعة الدالة generate_credentials من هذا الملف.
+#
+# مجموعة العمليات واحدة طوال عمر العملية وتُنشأ بطريقة forkserver (أو spawn)، لا fork: التشفير يُستدعى من خيط
+# في الخلفية داخل عامل ويب متعدد الخيوط، ونسخ العملية بـ fork أثناء حجز خيط آخر لقفل (التسجيل، مجمع اتصالات
+# SQLAlchemy) يترك القفل محجوزاً في العملية الفرعية إلى الأبد.
+
+import atexit
+import multiprocessing
+import os
+import random
+import string
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash
+
+# الأحرف المستخدمة في توليد كلمات المرور
+PASSWORD_CHARS = string.ascii_letters + string.digits + '!@#$%&*'
+
+# أقل عدد من كلمات المرور يستحق إنشاء مجموعة عمليات (تكلفة تشغيل العمليات أعلى من الفائدة دونه)
+PARALLEL_THRESHOLD = 32
+
+
+def generate_password(length=12):
+    """يولد كلمة مرور قوية عشوائية."""
+    rng = random.SystemRandom()
+    return ''.join(rng.choice(PASSWORD_CHARS) for _ in range(length))
+
+
+def _hash_chunk(passwords):
+    """يشفر مجموعة من كلمات المرور داخل عملية منفصلة (يجب أن تبقى دالة على مستوى الملف ليمكن نقلها للعمليات)."""
+    return [generate_password_hash(password) for password in passwords]
+
+
+def default_processes():
+    """عدد العمليات الافتراضي: عدد الأنوية المتاحة لهذه العملية."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+_pool = {'executor': None, 'processes': 0}
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def _get_pool(processes):
+    """مجموعة العمليات المشتركة (تُنشأ عند أول استخدام، ويُعاد إنشاؤها إذا تغير عدد العمليات أو تعطلت)."""
+    with _pool_lock:
+        executor = _pool['executor']
+        if executor is None or _pool['processes'] != processes:
+            if executor is not None:
+                executor.shutdown(wait=False)
+            executor = ProcessPoolExecutor(max_workers=processes, mp_context=_pool_context())
+            _pool.update(executor=executor, processes=processes)
+        return executor
+
+
+def _discard_pool(executor):
+    with _pool_lock:
+        if _pool['executor'] is executor:
+            _pool.update(executor=None, processes=0)
+    executor.shutdown(wait=False)
+
+
+@atexit.register
+def shutdown_pool():
+    """يوقف مجموعة العمليات عند إنهاء العملية."""
+    with _pool_lock:
+        executor = _pool['executor']
+        _pool.update(executor=None, processes=0)
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def hash_passwords(passwords, processes=None, chunk_size=None):
+    """
+    يشفر قائمة من كلمات المرور ويعيد التجزئات (Hashes) بنفس ترتيب المدخلات.
+
+    المعاملات:
+    passwords (list): كلمات المرور الأصلية.
+    processes (int): عدد العمليات (افتراضياً عدد الأنوية). القيمة 1 تعني التشفير في العملية الحالية.
+    chunk_size (int): عدد كلمات المرور المرسلة لكل عملية في المرة الواحدة.
+    """
+    passwords = list(passwords)
+    processes = processes or default_processes()
+    if processes <= 1 or len(passwords) < PARALLEL_THRESHOLD:
+        return _hash_chunk(passwords)
+
+    processes = min(processes, len(passwords))
+    # تقسيم العمل إلى أجزاء متساوية تقريباً (عدة أجزاء لكل عملية لموازنة الحمل)
+    chunk_size = chunk_size or max(1, len(passwords) // (processes * 4))
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+
+    executor = _get_pool(processes)
+    try:
+        # executor.map يحافظ على ترتيب النتائج حسب ترتيب المدخلات
+        hashed = []
+        for result in executor.map(_hash_chunk, chunks):
+            hashed.extend(result)
+    except BrokenProcessPool:
+        # توقفت إحدى العمليات (مثلاً أنهاها النظام لنفاد الذاكرة): مجموعة جديدة للطلب التالي
+        _discard_pool(executor)
+        raise
+    return hashed
+
+
+def generate_credentials(count, processes=None, length=12):
+    """
+    يولد عدداً من كلمات المرور العشوائية مع تجزئاتها.
+
+    يعيد قائمة (password, password_hash) بطول count.
+    """
+    passwords = [generate_password(length) for _ in range(count)]
+    return list(zip(passwords, hash_passwords(passwords, processes=processes)))
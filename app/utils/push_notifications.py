@@ -2,34 +2,26 @@
 # أدوات مساعدة لإرسال إشعارات الويب الفورية (Web Push Notifications)
 
 import json
-from pywebpush import webpush, WebPushException
+from pywebpush import webpush
 from flask import current_app
 
-def send_push_to_subscription(sub_info: dict, payload: dict):
+def deliver_push(sub_info: dict, payload: dict, ttl: int = 0, session=None):
     """
-    يرسل إشعار فوري (Push Notification) إلى اشتراك مستخدم واحد باستخدام مكتبة pywebpush.
-    
+    يرسل إشعاراً فورياً واحداً ويرفع WebPushException عند الفشل (يستخدمها عامل صندوق الإشعارات).
+
     المعاملات:
-    sub_info (dict): معلومات الاشتراك (endpoint, keys) المخزنة في قاعدة البيانات.
-    payload (dict): البيانات المراد إرسالها (العنوان، المحتوى، أيقونة، رابط..).
+    sub_info (dict): معلومات الاشتراك (endpoint, keys).
+    payload (dict): البيانات المراد إرسالها.
+    ttl (int): مدة احتفاظ خدمة الإشعارات بالرسالة إذا كان المتصفح غير متصل (بالثواني).
+    session: جلسة requests لإعادة استخدام الاتصالات عند إرسال عدة إشعارات متتالية.
     """
-    try:
-        # إرسال الإشعار باستخدام مفاتيح VAPID
-        webpush(
-            subscription_info=sub_info,
-            data=json.dumps(payload),
-            vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
-            vapid_claims={"sub": current_app.config['VAPID_EMAIL']}
-        )
-        return True
+    webpush(
+        subscription_info=sub_info,
+        data=json.dumps(payload),
+        vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
+        vapid_claims={"sub": current_app.config['VAPID_EMAIL']},
+        ttl=ttl,
+        timeout=current_app.config.get('PUSH_TIMEOUT', 10),
+        requests_session=session,
+    )
 
-    except WebPushException as ex:
-        # التعامل مع أخطاء بروتوكول WebPush وتوثيقها
-        print(f"!!! فشل إرسال الإشعار (WebPushException): {repr(ex)}")
-        current_app.logger.error(f"فشل إرسال الإشعار: {repr(ex)}")
-        return False
-    
-    except Exception as e:
-        # التعامل مع أي أخطاء أخرى غير متوقعة
-        print(f"!!! حدث خطأ عام غير متوقع: {repr(e)}")
-        return False
\ No newline at end of file
@@ -0,0 +1,87 @@
+# app/utils/push_outbox.py
+# صندوق الإشعارات الفورية الصادرة (Transactional Outbox)
+# المسارات لا ترسل الإشعارات بنفسها، بل تضيفها إلى جدول PushOutbox داخل معاملتها (استعلام INSERT ... SELECT واحد)،
+# فلا يتأخر الطلب ولا تبقى المعاملة مفتوحة بانتظار خدمة الإشعارات، ولا يضيع إشعار إذا فشلت المعاملة.
+# يتولى العامل (flask --app run push worker) سحب الإشعارات على دفعات وإرسالها مع إعادة المحاولة (app/utils/outbox.py).
+
+import json
+from datetime import datetime
+
+import requests
+from pywebpush import WebPushException
+from sqlalchemy import insert, select, literal, delete
+
+from app.extensions import db
+from app.models import PushOutbox, PushSubscription
+from app.utils.outbox import Outbox
+from app.utils.push_notifications import deliver_push
+
+# رموز الاستجابة التي تعني أن الاشتراك لم يعد صالحاً (لا فائدة من إعادة المحاولة)
+GONE_STATUS_CODES = (404, 410)
+
+
+def enqueue_push(user_ids, payload):
+    """
+    يضيف إشعاراً فورياً لكل اشتراكات المستخدمين المحددين إلى الصندوق دون حفظ المعاملة.
+
+    المعاملات:
+    user_ids: معرف مستخدم واحد أو قائمة معرفات.
+    payload (dict): محتوى الإشعار (title, body, ...).
+
+    يعيد عدد الإشعارات المضافة.
+    """
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    if not user_ids:
+        return 0
+
+    now = datetime.utcnow()
+    rows = select(
+        PushSubscription.user_id,
+        PushSubscription.endpoint,
+        PushSubscription.p256dh,
+        PushSubscription.auth,
+        literal(json.dumps(payload, ensure_ascii=False)),
+        literal('pending'),
+        literal(0),
+        literal(now),
+        literal(now),
+    ).where(PushSubscription.user_id.in_(user_ids))
+
+    result = db.session.execute(insert(PushOutbox).from_select(
+        ['user_id', 'endpoint', 'p256dh', 'auth', 'payload', 'status', 'attempts', 'next_attempt_at', 'created_at'],
+        rows,
+    ))
+    return result.rowcount
+
+
+def _send(batch):
+    """يرسل دفعة الإشعارات عبر جلسة HTTP واحدة ويحذف الاشتراكات التي أبلغت خدمة الإشعارات بانتهائها."""
+    sent, failures, gone_endpoints = [], {}, set()
+    with requests.Session() as session:
+        for item in batch:
+            sub_info = {'endpoint': item.endpoint, 'keys': {'p256dh': item.p256dh, 'auth': item.auth}}
+            try:
+                deliver_push(sub_info, json.loads(item.payload), session=session)
+            except WebPushException as ex:
+                gone = getattr(ex.response, 'status_code', None) in GONE_STATUS_CODES
+                if gone:
+                    gone_endpoints.add(item.endpoint)
+                failures[item.id] = (repr(ex), gone)
+            except Exception as e:
+                failures[item.id] = (repr(e), False)
+            else:
+                sent.append(item.id)
+
+    if gone_endpoints:
+        db.session.execute(delete(PushSubscription).where(PushSubscription.endpoint.in_(gone_endpoints)))
+    return sent, failures
+
+
+# صندوق الإشعارات: الحجز وإعادة المحاولة والحالات من Outbox المشترك
+outbox = Outbox(
+    PushOutbox, _send,
+    columns=('endpoint', 'p256dh', 'auth', 'payload'),
+    config_prefix='PUSH',
+    defaults={'BATCH_SIZE': 100, 'MAX_ATTEMPTS': 8, 'BACKOFF_BASE': 30, 'BACKOFF_MAX': 3600, 'LEASE_SECONDS': 300},
+)
@@ -0,0 +1,136 @@
+# app/utils/query_plans.py
+# أداة فحص خطط تنفيذ الاستعلامات المتكررة (EXPLAIN)
+# تُشغّل EXPLAIN على كل استعلام ساخن وتفشل إذا لجأ أي منها إلى مسح كامل للجدول (Full Table Scan).
+# يفضل تشغيلها على قاعدة بيانات تحتوي على بيانات فعلية، لأن MySQL قد يختار المسح الكامل
+# للجداول شبه الفارغة حتى مع وجود الفهرس المناسب.
+# التشغيل: flask --app run schema check-plans
+
+from sqlalchemy import select, func
+
+from app.extensions import db
+from app.models import (User, ClearanceStatus, Notification, ClearanceSummary, PushSubscription, PushOutbox, MailOutbox,
+                        StreamEvent, StatusTransition)
+from app.utils.departments import department_names
+
+
+def hot_queries():
+    """يعيد قائمة الاستعلامات الساخنة في النظام بالشكل (name, statement)."""
+    department = department_names()[0]
+    cycle = ClearanceStatus.cycle_id == 1
+    return [
+        ('update_status: البحث عن سجل (طالب، دورة، شعبة)',
+         select(ClearanceStatus).where(ClearanceStatus.student_id == 1, cycle, ClearanceStatus.department == department)),
+        ('student: سجلات الطالب في الدورة الحالية',
+         select(ClearanceStatus).where(ClearanceStatus.student_id == 1, cycle)),
+        ('section_head: طلبات الشعبة حسب الكلية',
+         select(ClearanceStatus)
+         .join(User, ClearanceStatus.student_id == User.id)
+         .where(cycle, ClearanceStatus.department == department, User.college == 'college')),
+        ('section_head: صفحة قائمة العمل حسب الحالة',
+         select(ClearanceStatus, User)
+         .join(User, ClearanceStatus.student_id == User.id)
+         .where(cycle, ClearanceStatus.department == department, ClearanceStatus.status == 'pending',
+                ClearanceStatus.id > 1000)
+         .order_by(ClearanceStatus.id).limit(51)),
+        ('ETag: آخر تحديث لسجلات الشعبة',
+         select(func.max(ClearanceStatus.updated_at)).where(cycle, ClearanceStatus.department == department)),
+        ('ETag: آخر تحديث في النظام',
+         select(func.max(ClearanceStatus.updated_at)).where(cycle)),
+        ('أرشفة الدورة: دفعة سجلات الدورة المغلقة',
+         select(ClearanceStatus.id).where(cycle).limit(1000)),
+        ('request_clearance: بناء جدول توجيه مسؤولي الشعب',
+         select(User.id, User.department, User.college).where(User.role == 'section_head')),
+        ('update_status: إشعارات المسؤول غير المقروءة عن طالب',
+         select(Notification.id).where(Notification.user_id == 1, Notification.type == 'clearance_request',
+                                       Notification.related_student_id == 2, Notification.is_read.is_(False))),
+        ('delete_user: الإشعارات المتعلقة بالطالب',
+         select(Notification.id).where(Notification.related_student_id == 2)),
+        ('عدد الإشعارات غير المقروءة',
+         select(func.count(Notification.id)).where(Notification.user_id == 1, Notification.is_read.is_(False))),
+        ('صفحات الإشعارات (الأحدث أولاً)',
+         select(Notification).where(Notification.user_id == 1, Notification.id < 1000)
+         .order_by(Notification.id.desc()).limit(11)),
+        ('تنظيف الإشعارات المقروءة القديمة',
+         select(Notification.id).where(Notification.is_read.is_(True),
+                                       Notification.timestamp < func.now()).limit(1000)),
+        ('اشتراكات الإشعارات الفورية للمستخدم',
+         select(PushSubscription).where(PushSubscription.user_id == 1)),
+        ('الطلاب المكتملون',
+         select(ClearanceSummary.student_id).where(ClearanceSummary.completed.is_(True))),
+        ('admin: عدد المستخدمين حسب الدور',
+         select(func.count(User.id)).where(User.role == 'student')),
+        ('login: البحث بالرقم الجامعي',
+         select(User).where(User.university_id == '1')),
+        ('push worker: الإشعارات المستحقة للإرسال',
+         select(PushOutbox).where(PushOutbox.status == 'pending', PushOutbox.next_attempt_at <= func.now())
+         .order_by(PushOutbox.next_attempt_at, PushOutbox.id).limit(100)),
+        ('email worker: رسائل الترحيب المستحقة للإرسال',
+         select(MailOutbox).where(MailOutbox.status == 'pending', MailOutbox.next_attempt_at <= func.now())
+         .order_by(MailOutbox.next_attempt_at, MailOutbox.id).limit(50)),
+        ('stream: الأحداث الجديدة لجميع الاتصالات',
+         select(StreamEvent).where(StreamEvent.id > 1000).order_by(StreamEvent.id).limit(500)),
+        ('stream: استكمال أحداث المستخدم بعد إعادة الاتصال',
+         select(StreamEvent).where(StreamEvent.user_id == 1, StreamEvent.id > 1000)
+         .order_by(StreamEvent.id).limit(100)),
+        ('قرار الشعبة: آخر دخول للانتظار لسجلات الطلاب',
+         select(StatusTransition.student_id, func.max(StatusTransition.created_at))
+         .where(StatusTransition.student_id.in_([1, 2]), StatusTransition.cycle_id == 1,
+                StatusTransition.department == department, StatusTransition.new_status == 'pending')
+         .group_by(StatusTransition.student_id)),
+        ('التجميع اليومي: انتقالات فترة زمنية',
+         select(StatusTransition.department, func.count(StatusTransition.id))
+         .where(StatusTransition.created_at >= func.now(), StatusTransition.created_at < func.now())
+         .group_by(StatusTransition.department)),
+    ]
+
+
+def _compile(statement):
+    """يحول الاستعلام إلى نص SQL بالقيم الحرفية حسب لهجة قاعدة البيانات الحالية."""
+    return str(statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+
+
+def explain(statement):
+    """
+    يشغل EXPLAIN على الاستعلام ويعيد (full_scan_tables, plan_lines).
+
+    full_scan_tables: أسماء الجداول التي تتم قراءتها بمسح كامل.
+    plan_lines: أسطر خطة التنفيذ كما أعادتها قاعدة البيانات (للعرض).
+    """
+    return explain_sql(_compile(statement))
+
+
+def explain_sql(sql, parameters=None):
+    """مثل explain لنص SQL كما أرسله التطبيق مع معاملاته (مثل العبارات الملتقطة من أحداث المحرك في الاختبارات)."""
+    connection = db.session.connection()
+    dialect = db.engine.dialect.name
+    full_scans, lines = [], []
+
+    if dialect == 'sqlite':
+        for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, parameters):
+            detail = row[-1]
+            lines.append(detail)
+            # "SCAN table" بدون استخدام فهرس يعني مسحاً كاملاً
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                full_scans.append(detail.split()[1])
+    else:
+        # MySQL / MariaDB: العمود type بقيمة ALL يعني مسحاً كاملاً للجدول
+        result = connection.exec_driver_sql('EXPLAIN ' + sql, parameters)
+        columns = list(result.keys())
+        for row in result:
+            info = dict(zip(columns, row))
+            lines.append(', '.join(f'{k}={info[k]}' for k in ('table', 'type', 'key', 'rows') if k in info))
+            if str(info.get('type', '')).upper() == 'ALL':
+                full_scans.append(info.get('table'))
+
+    return full_scans, lines
+
+
+def check_query_plans():
+    """يفحص جميع الاستعلامات الساخنة ويعيد قائمة بالنتائج (name, full_scan_tables, plan_lines)."""
+    return [(name, *explain(statement)) for name, statement in hot_queries()]
+
+
+def assert_no_full_scans():
+    """يرفع AssertionError إذا لجأ أي استعلام ساخن إلى مسح كامل (للاستخدام في الاختبارات)."""
+    failures = [(name, tables) for name, tables, _ in check_query_plans() if tables]
+    assert not failures, f'استعلامات تستخدم مسحاً كاملاً للجدول: {failures}'
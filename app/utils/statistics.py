@@ -0,0 +1,122 @@
+# app/utils/statistics.py
+# طبقة الإحصائيات للوحة تحكم مدير النظام
+# تعتمد على استعلامات تجميعية (GROUP BY) بدلاً من المرور على كل طالب بشكل منفصل
+
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
+from app.extensions import db
+from app.models import User, ClearanceStatus, ClearanceSummary, ClearanceCounter
+from app.utils.clearance_counters import get_department_totals
+from app.utils.clearance_cycles import current_cycle_id
+from app.utils.departments import department_names
+
+
+def get_dashboard_statistics():
+    """
+    يحسب إحصائيات لوحة التحكم بعدد ثابت من الاستعلامات مهما كان عدد الطلاب.
+
+    يعيد قاموساً يحتوي على:
+    total_students, completed_count, pending_count, pending_by_dept
+    """
+    # إجمالي الطلاب
+    total_students = (
+        db.session.query(func.count(User.id))
+        .filter(User.role == 'student')
+        .scalar()
+    ) or 0
+
+    # عدد الطلاب المكتملين (من جدول الملخصات المفهرس)
+    completed_count = (
+        db.session.query(func.count(ClearanceSummary.student_id))
+        .filter(ClearanceSummary.completed.is_(True))
+        .scalar()
+    ) or 0
+
+    # عدد الطلبات المعلقة لكل شعبة (من جدول العدادات التراكمية)
+    pending_by_dept = {dept: 0 for dept in department_names()}
+    for department, counts in get_department_totals().items():
+        if department in pending_by_dept:
+            pending_by_dept[department] = counts['pending']
+
+    return {
+        'total_students': total_students,
+        'completed_count': completed_count,
+        'pending_count': total_students - completed_count,
+        'pending_by_dept': pending_by_dept,
+    }
+
+
+def with_clearance_records(query):
+    """يضيف إلى استعلام الطلاب تحميل سجلات الدورة الحالية وملخصاتها مسبقاً (استعلام إضافي لكل منهما)."""
+    return query.options(
+        selectinload(User.clearance_statuses.and_(ClearanceStatus.cycle_id == current_cycle_id())),
+        selectinload(User.clearance_summary),
+    )
+
+
+def annotate_completion(students):
+    """
+    يضيف لكل طالب الخاصيتين records و final_status المستخدمتين في القالب
+    اعتماداً على السجلات والملخصات المحملة مسبقاً (بدون استعلامات إضافية).
+    """
+    for student in students:
+        student.records = sorted(student.clearance_statuses, key=lambda r: r.department)
+        summary = student.clearance_summary
+        student.final_status = 'مكتمل' if summary and summary.completed else 'غير مكتمل'
+    return students
+
+
+def load_students_with_records(query=None):
+    """
+    يجلب الطلاب مع سجلات براءة الذمة الخاصة بهم في دفعة واحدة (Eager Loading).
+
+    المعاملات:
+    query: استعلام اختياري على جدول المستخدمين (افتراضياً جميع الطلاب).
+    """
+    if query is None:
+        query = User.query.filter_by(role='student')
+    return annotate_completion(with_clearance_records(query).all())
+
+
+def _counter_total(department=None, college=None):
+    """مجموع السجلات في جدول العدادات (بديل رخيص عن COUNT على ClearanceStatus)."""
+    query = db.session.query(
+        func.sum(ClearanceCounter.pending + ClearanceCounter.approved + ClearanceCounter.rejected))
+    if department is not None:
+        query = query.filter(ClearanceCounter.department == department)
+    if college is not None:
+        query = query.filter(ClearanceCounter.college == (college or ''))
+    return int(query.scalar() or 0)
+
+
+def clearance_validators(student_id=None, department=None, college=None):
+    """
+    يعيد قيماً صغيرة تتغير عند أي تغيير في البيانات المعروضة (لحساب ETag):
+    الدورة الحالية وآخر وقت تحديث لسجلاتها وعدد السجلات.
+
+    المعاملات:
+    student_id: سجلات طالب واحد (فهرس (student_id, cycle_id, department)).
+    department, college: سجلات شعبة (فهرس (cycle_id, department, updated_at) والعدد من جدول العدادات).
+    بدون معاملات: النظام كاملاً (فهرس (cycle_id, updated_at)، والعدد من العدادات مع عدد الطلاب).
+    """
+    cycle_id = current_cycle_id()
+    if student_id is not None:
+        latest, count = (
+            db.session.query(func.max(ClearanceStatus.updated_at), func.count(ClearanceStatus.id))
+            .filter(ClearanceStatus.student_id == student_id, ClearanceStatus.cycle_id == cycle_id)
+            .one()
+        )
+        return cycle_id, latest, count
+
+    if department is not None:
+        latest = (
+            db.session.query(func.max(ClearanceStatus.updated_at))
+            .filter(ClearanceStatus.cycle_id == cycle_id, ClearanceStatus.department == department)
+            .scalar()
+        )
+        return cycle_id, latest, _counter_total(department, college)
+
+    latest = db.session.query(func.max(ClearanceStatus.updated_at)).filter(ClearanceStatus.cycle_id == cycle_id).scalar()
+    students = db.session.query(func.count(User.id)).filter(User.role == 'student').scalar()
+    return cycle_id, latest, _counter_total(), students
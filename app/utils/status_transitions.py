@@ -0,0 +1,62 @@
+# app/utils/status_transitions.py
+# سجل انتقالات الحالة (Append-only)
+# يضيف صفاً لكل تغيير في الحالة داخل معاملة التغيير نفسها (INSERT واحد للدفعة، دون commit)،
+# ولا تُعدّل صفوفه أبداً. عند القرار تُحسب مدة الانتظار (waited_seconds) من آخر دخول للحالة pending
+# باستعلام واحد على الفهرس، حتى تكون إحصائيات زمن الإنجاز تجميعاً مباشراً بدون ربط ذاتي على السجل.
+
+from datetime import datetime
+
+from sqlalchemy import insert, select, func
+
+from app.extensions import db
+from app.models import StatusTransition
+
+PENDING = 'pending'
+
+
+def record_requests(student_id, cycle_id, departments, now=None):
+    """يسجل تقديم الطلب (دخول الحالة pending) لجميع الشعب."""
+    now = now or datetime.utcnow()
+    db.session.execute(insert(StatusTransition), [
+        {'cycle_id': cycle_id, 'student_id': student_id, 'department': department,
+         'old_status': None, 'new_status': PENDING, 'created_at': now}
+        for department in departments
+    ])
+
+
+def _pending_since(cycle_id, department, student_ids):
+    """آخر وقت دخل فيه سجل كل طالب إلى الحالة pending: {student_id: created_at}."""
+    return dict(db.session.execute(
+        select(StatusTransition.student_id, func.max(StatusTransition.created_at))
+        .where(StatusTransition.student_id.in_(student_ids), StatusTransition.cycle_id == cycle_id,
+               StatusTransition.department == department, StatusTransition.new_status == PENDING)
+        .group_by(StatusTransition.student_id)
+    ).all())
+
+
+def record_status_changes(department, cycle_id, changes, officer_id=None, now=None):
+    """
+    يسجل انتقالات شعبة واحدة بعبارة INSERT واحدة.
+
+    المعاملات:
+    changes: قائمة (student_id, old_status, new_status)؛ تُتجاهل تعديلات الملاحظة فقط (old == new).
+    officer_id: المسؤول صاحب القرار.
+    """
+    changes = [(student_id, old, new) for student_id, old, new in changes if old != new]
+    if not changes:
+        return 0
+    now = now or datetime.utcnow()
+
+    leaving = [student_id for student_id, old, _ in changes if old == PENDING]
+    since = _pending_since(cycle_id, department, leaving) if leaving else {}
+
+    rows = []
+    for student_id, old, new in changes:
+        waited = None
+        if old == PENDING and student_id in since:
+            waited = max(int((now - since[student_id]).total_seconds()), 0)
+        rows.append({'cycle_id': cycle_id, 'student_id': student_id, 'department': department,
+                     'old_status': old, 'new_status': new, 'officer_id': officer_id,
+                     'waited_seconds': waited, 'created_at': now})
+    db.session.execute(insert(StatusTransition), rows)
+    return len(rows)
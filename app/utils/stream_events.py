@@ -0,0 +1,144 @@
+# app/utils/stream_events.py
+# أحداث البث المباشر (Server-Sent Events)
+# المسارات تضيف الأحداث إلى جدول StreamEvent داخل معاملتها (INSERT واحد لعدة أحداث) دون commit،
+# فلا يصل حدث لتغيير لم يُحفظ. يتولى EventBroker في كل عملية قراءتها وتوزيعها على الاتصالات المفتوحة.
+#
+# المعرفات التسلسلية تُحجز عند الإضافة لا عند الحفظ، فقد تظهر معاملة بمعرف أقل بعد قراءة معرف أعلى منه.
+# لذلك لا يُعتمد على "أكبر معرف مقروء" كمؤشر، بل على حد مستقر (watermark): أكبر معرف مضى على إنشائه
+# STREAM_SETTLE_SECONDS (أطول مدة متوقعة لمعاملة)، فلا يظهر بعده معرف أقل منه. ما بعد الحد يُعاد فحصه
+# في كل قراءة ويُستبعد المكرر بالمعرف. مؤشر الاستكمال (Last-Event-ID) هو الحد مع معرفات أحداث المستخدم
+# المسلمة بعده: "watermark:id,id".
+
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import insert, select, delete
+
+from app.extensions import db
+from app.models import StreamEvent
+
+# أنواع الأحداث
+STATUS_UPDATE = 'status_update'           # تغيرت حالة الطالب في شعبة (للطالب)
+CLEARANCE_REQUEST = 'clearance_request'   # طلب براءة ذمة جديد (لمسؤولي الشعب)
+
+# أقصى عدد أحداث تُستكمل عند إعادة الاتصال
+BACKLOG_LIMIT = 100
+
+
+def publish(events):
+    """
+    يضيف أحداثاً إلى الجدول بعبارة INSERT واحدة دون حفظ المعاملة.
+
+    المعاملات:
+    events: قائمة (user_id, event, payload) حيث payload قاموس.
+    """
+    if not events:
+        return 0
+    now = datetime.utcnow()
+    db.session.execute(insert(StreamEvent), [
+        {'user_id': user_id, 'event': event, 'payload': json.dumps(payload, ensure_ascii=False), 'created_at': now}
+        for user_id, event, payload in events
+    ])
+    return len(events)
+
+
+def settle_seconds():
+    return current_app.config.get('STREAM_SETTLE_SECONDS', 30)
+
+
+def settled_event_id():
+    """
+    الحد المستقر: أكبر معرف مضى على إنشائه STREAM_SETTLE_SECONDS (0 إذا لم يوجد).
+    كل معرف أقل منه إما حُفظ أو أُلغيت معاملته، فلا يُنتظر ظهوره لاحقاً.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settle_seconds())
+    return db.session.scalar(
+        select(StreamEvent.id)
+        .where(StreamEvent.created_at < cutoff)
+        .order_by(StreamEvent.created_at.desc(), StreamEvent.id.desc())
+        .limit(1)
+    ) or 0
+
+
+def recent_events(watermark):
+    """معرفات الأحداث بعد الحد وأوقات إنشائها: {id: created_at} (بداية قراءة EventBroker)."""
+    return dict(db.session.execute(
+        select(StreamEvent.id, StreamEvent.created_at).where(StreamEvent.id > watermark)
+    ).all())
+
+
+def unseen_events(watermark, top, seen, limit=500):
+    """
+    الأحداث غير المقروءة لجميع المستخدمين (يستخدمه EventBroker) مرتبة بالمعرف:
+    ما حُفظ متأخراً في (watermark, top] ولم يرد في seen، ثم الجديدة بعد top.
+    نافذة إعادة الفحص محدودة بأحداث STREAM_SETTLE_SECONDS الأخيرة، وتُقرأ معرفاتها فقط من المفتاح الأساسي.
+    """
+    late_ids = [
+        event_id for event_id in db.session.scalars(
+            select(StreamEvent.id).where(StreamEvent.id > watermark, StreamEvent.id <= top))
+        if event_id not in seen
+    ]
+    late = db.session.scalars(
+        select(StreamEvent).where(StreamEvent.id.in_(late_ids)).order_by(StreamEvent.id)
+    ).all() if late_ids else []
+    fresh = db.session.scalars(
+        select(StreamEvent).where(StreamEvent.id > top).order_by(StreamEvent.id).limit(limit)
+    ).all()
+    return late + fresh
+
+
+def backlog(user_id, watermark, delivered=(), limit=BACKLOG_LIMIT):
+    """يعيد أحداث المستخدم بعد الحد عدا ما سُلم منها (لاستكمال ما فات عند إعادة الاتصال)."""
+    events = db.session.scalars(
+        select(StreamEvent)
+        .where(StreamEvent.user_id == user_id, StreamEvent.id > watermark)
+        .order_by(StreamEvent.id)
+        .limit(limit + len(delivered))
+    ).all()
+    return [event for event in events if event.id not in delivered][:limit]
+
+
+def format_cursor(watermark, delivered):
+    """مؤشر الاستكمال: الحد ومعرفات الأحداث المسلمة بعده."""
+    ids = sorted(event_id for event_id in delivered if event_id > watermark)
+    return f'{watermark}:{",".join(map(str, ids))}' if ids else str(watermark)
+
+
+def parse_cursor(value):
+    """يقرأ مؤشر الاستكمال ويعيد (watermark, set(delivered))، أو None إذا كان غير صالح."""
+    if not value:
+        return None
+    watermark, _, ids = value.partition(':')
+    try:
+        return int(watermark), {int(event_id) for event_id in ids.split(',') if event_id}
+    except ValueError:
+        return None
+
+
+def resume_cursor(user_id):
+    """
+    مؤشر الصفحة عند عرضها: الحد المستقر مع أحداث المستخدم المحفوظة بعده (حالتها ظاهرة في الصفحة بالفعل)،
+    فيستلم الاتصال الأول ما يُحفظ بعد العرض فقط، ومنه ما يُحفظ متأخراً بمعرف أقل.
+    """
+    watermark = settled_event_id()
+    delivered = db.session.scalars(
+        select(StreamEvent.id).where(StreamEvent.user_id == user_id, StreamEvent.id > watermark)
+    ).all()
+    return format_cursor(watermark, delivered)
+
+
+def to_sse(event, cursor):
+    """يحول الحدث إلى رسالة SSE (المؤشر يسمح للمتصفح بالاستكمال عبر Last-Event-ID)."""
+    return f'id: {cursor}\nevent: {event.event}\ndata: {event.payload}\n\n'
+
+
+def purge_events(hours=24):
+    """يحذف الأحداث الأقدم من المدة المحددة ويعيد عددها (لا حاجة لها بعد تسليمها)."""
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    result = db.session.execute(
+        delete(StreamEvent).where(StreamEvent.created_at < cutoff),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,224 @@
+# app/utils/student_import.py
+# استيراد الطلاب من ملفات Excel على دفعات
+# 1) توحيد الأعمدة وتنظيف القيم بعمليات pandas المتجهة (Vectorized) بدلاً من المرور على كل صف
+# 2) التحقق من وجود الطلاب في قاعدة البيانات باستعلامات مجمعة (IN) بدلاً من استعلام لكل صف
+# 3) الإدخال المجمع (Bulk Insert) على دفعات مع تقرير أخطاء لكل سطر
+
+import pandas as pd
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import User
+from app.utils.passwords import generate_credentials
+
+# الأعمدة الإلزامية في ملف Excel
+REQUIRED_COLUMNS = ['الرقم الجامعي', 'الاسم الكامل']
+
+# الأسماء المحتملة لكل عمود (يؤخذ أول عمود يحتوي على قيمة)
+COLUMN_ALIASES = {
+    'university_id': ['الرقم الجامعي'],
+    'full_name': ['الاسم الكامل'],
+    'email': ['البريد الإلكتروني', 'البريد الالكتروني', 'email', 'Email'],
+    'department': ['القسم', 'الشعبة', 'department', 'Department'],
+    'college': ['الكلية', 'college', 'College'],
+    'stage': ['المرحلة', 'stage', 'Stage'],
+    'study_type': ['نوع الدراسة', 'Study Type'],
+}
+
+# حجم الدفعة الواحدة في الإدخال المجمع وفي استعلامات التحقق
+CHUNK_SIZE = 1000
+
+
+class ImportReport:
+    """نتيجة عملية الاستيراد: عدد الطلاب المضافين وقائمة الأخطاء لكل سطر."""
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []          # قائمة (رقم السطر في الملف، رسالة الخطأ)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+    @property
+    def error_messages(self):
+        return [f'السطر {row}: {message}' for row, message in sorted(self.errors)]
+
+
+def missing_required_columns(df):
+    """يعيد الأعمدة الإلزامية غير الموجودة في الملف."""
+    columns = set(df.columns.str.strip())
+    return [col for col in REQUIRED_COLUMNS if col not in columns]
+
+
+def _as_text(series):
+    """يحول عموداً إلى نصوص منظفة، مع تحويل الأرقام الصحيحة المقروءة كأعداد عشرية (12345.0) إلى 12345."""
+    if pd.api.types.is_float_dtype(series):
+        non_null = series.dropna()
+        if (non_null == non_null.round()).all():
+            series = series.astype('Int64')
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def normalize_student_frame(df):
+    """
+    يوحّد أعمدة ملف Excel إلى أسماء حقول نموذج المستخدم باستخدام عمليات pandas المتجهة.
+
+    يعيد DataFrame بالأعمدة: row, university_id, full_name, email, department, college, stage, study_type
+    حيث row هو رقم السطر في ملف Excel (لتقرير الأخطاء).
+    """
+    df = df.copy()
+    df.columns = df.columns.str.strip()
+
+    normalized = pd.DataFrame(index=df.index)
+    normalized['row'] = df.index + 2  # السطر الأول في الملف هو العناوين
+
+    for field, aliases in COLUMN_ALIASES.items():
+        present = [col for col in aliases if col in df.columns]
+        if not present:
+            normalized[field] = pd.Series(pd.NA, index=df.index, dtype='string')
+            continue
+        # أول قيمة غير فارغة من الأعمدة البديلة لكل صف
+        columns = pd.concat([_as_text(df[col]) for col in present], axis=1)
+        normalized[field] = columns.bfill(axis=1).iloc[:, 0]
+
+    return normalized
+
+
+def _existing_values(column, values):
+    """يعيد القيم الموجودة مسبقاً في عمود معين، باستعلام IN لكل دفعة."""
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values[start:start + CHUNK_SIZE]
+        found.update(v for (v,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+
+def _existing_identifiers(university_ids):
+    """يعيد الأرقام الجامعية المستخدمة مسبقاً كرقم جامعي أو كاسم مستخدم."""
+    found = set()
+    for start in range(0, len(university_ids), CHUNK_SIZE):
+        chunk = set(university_ids[start:start + CHUNK_SIZE])
+        rows = db.session.query(User.university_id, User.username).filter(
+            or_(User.university_id.in_(chunk), User.username.in_(chunk))
+        )
+        for uni_id, username in rows:
+            found.update(v for v in (uni_id, username) if v in chunk)
+    return found
+
+
+def validate_student_frame(frame, report):
+    """
+    يستبعد الصفوف غير الصالحة ويسجل أخطاءها في التقرير:
+    الحقول الإلزامية الفارغة، التكرار داخل الملف، والتعارض مع بيانات موجودة في قاعدة البيانات.
+
+    يعيد الصفوف الصالحة فقط.
+    """
+    invalid = frame['university_id'].isna() | frame['full_name'].isna()
+    for row in frame.loc[invalid, 'row']:
+        report.add_error(row, 'الرقم الجامعي والاسم الكامل مطلوبان.')
+    frame = frame[~invalid]
+
+    duplicated = frame['university_id'].duplicated(keep='first')
+    for row, uni_id in frame.loc[duplicated, ['row', 'university_id']].itertuples(index=False):
+        report.add_error(row, f'الرقم الجامعي {uni_id} مكرر في الملف.')
+    frame = frame[~duplicated]
+
+    duplicated_email = frame['email'].notna() & frame['email'].duplicated(keep='first')
+    for row, email in frame.loc[duplicated_email, ['row', 'email']].itertuples(index=False):
+        report.add_error(row, f'البريد الإلكتروني {email} مكرر في الملف.')
+    frame = frame[~duplicated_email]
+
+    # التحقق المجمع من قاعدة البيانات
+    existing_ids = _existing_identifiers(frame['university_id'].tolist())
+    exists = frame['university_id'].isin(existing_ids)
+    for row, uni_id in frame.loc[exists, ['row', 'university_id']].itertuples(index=False):
+        report.add_error(row, f'الطالب {uni_id} موجود مسبقاً.')
+    frame = frame[~exists]
+
+    existing_emails = _existing_values(User.email, frame['email'].dropna().tolist())
+    email_taken = frame['email'].isin(existing_emails)
+    for row, email in frame.loc[email_taken, ['row', 'email']].itertuples(index=False):
+        report.add_error(row, f'البريد الإلكتروني {email} مستخدم لحساب آخر.')
+    return frame[~email_taken]
+
+
+def _insert_chunk(chunk, report, on_insert=None):
+    """
+    يدخل دفعة واحدة من الطلاب في معاملة مستقلة، وعند فشلها يقسمها حتى يسجل الخطأ للصفوف المتعارضة فقط.
+
+    المعاملات:
+    chunk: قائمة (رقم السطر، بيانات الطالب، كلمة المرور).
+    on_insert: دالة اختيارية تستدعى داخل المعاملة قبل حفظها بالشكل on_insert([(بيانات الطالب، كلمة المرور)])
+               (مثل إضافة رسائل الترحيب إلى صندوق البريد الصادر مع الحسابات نفسها).
+    """
+    try:
+        db.session.execute(insert(User), [row for _, row, _ in chunk])
+        if on_insert:
+            on_insert([(row, password) for _, row, password in chunk])
+        db.session.commit()
+    except IntegrityError as e:
+        # تعارض مع بيانات أضيفت بالتزامن: إعادة المحاولة بنصفي الدفعة حتى ينحصر الخطأ في الصفوف المتعارضة،
+        # فيُستورد بقية الطلاب ويُسجل الخطأ للصف المتعارض وحده
+        db.session.rollback()
+        if len(chunk) == 1:
+            row_number, row, _ = chunk[0]
+            report.add_error(row_number, f'تعذر حفظ الطالب {row["university_id"]}: {e.orig}')
+            return
+        middle = len(chunk) // 2
+        _insert_chunk(chunk[:middle], report, on_insert)
+        _insert_chunk(chunk[middle:], report, on_insert)
+        return
+    report.imported += len(chunk)
+
+
+def import_student_frame(df, chunk_size=CHUNK_SIZE, on_progress=None, on_insert=None):
+    """
+    يستورد الطلاب من DataFrame مقروء من ملف Excel.
+
+    المعاملات:
+    df: بيانات الملف كما قرأتها pandas.
+    chunk_size: عدد الطلاب في كل دفعة إدخال.
+    on_progress: دالة اختيارية تستدعى بعد كل دفعة بالشكل on_progress(report, processed_rows).
+    on_insert: دالة اختيارية تستدعى داخل معاملة كل دفعة (انظر _insert_chunk).
+
+    يعيد كائن ImportReport.
+    """
+    report = ImportReport()
+    frame = validate_student_frame(normalize_student_frame(df), report)
+    processed = len(report.errors)
+    if on_progress:
+        on_progress(report, processed)
+
+    # تحويل القيم الفارغة (NA) إلى None لقاعدة البيانات
+    records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+
+    for start in range(0, len(records), chunk_size):
+        batch_records = records[start:start + chunk_size]
+        # توليد وتشفير كلمات مرور الدفعة بالتوازي على أنوية المعالج
+        # (لكل دفعة على حدة حتى يتقدم مؤشر التقدم أثناء التشفير الذي يستهلك معظم الوقت)
+        batch = zip(batch_records, generate_credentials(len(batch_records)))
+        chunk = []
+        for record, (password, password_hash) in batch:
+            row = {
+                'university_id': record['university_id'],
+                'username': record['university_id'],
+                'full_name': record['full_name'],
+                'email': record['email'],
+                'role': 'student',
+                'department': record['department'],
+                'college': record['college'],
+                'stage': record['stage'],
+                'study_type': record['study_type'],
+                'password_hash': password_hash,
+            }
+            chunk.append((record['row'], row, password))
+        _insert_chunk(chunk, report, on_insert)
+
+        processed += len(chunk)
+        if on_progress:
+            on_progress(report, processed)
+
+    return report
@@ -0,0 +1,45 @@
+# app/utils/table_sizes.py
+# قياس حجم الجداول وفهارسها على القرص (لمقارنة المخطط قبل التغيير وبعده)
+# MySQL: من information_schema.TABLES (عدد الصفوف تقديري في InnoDB).
+# SQLite: من الجدول الافتراضي dbstat (حجم الصفحات الفعلي لكل جدول وفهرس).
+# التشغيل: flask --app run schema sizes
+
+from sqlalchemy import text
+
+from app.extensions import db
+
+# الجداول التي تتكرر فيها الشعبة والحالة لكل سجل
+DEFAULT_TABLES = ('clearance_status', 'clearance_status_history', 'status_transition')
+
+
+def _mysql_sizes(tables):
+    rows = db.session.execute(text(
+        'SELECT TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH FROM information_schema.TABLES '
+        'WHERE TABLE_SCHEMA = DATABASE()'
+    ))
+    sizes = {name: (table_rows or 0, data or 0, index or 0) for name, table_rows, data, index in rows}
+    return [(table, *sizes.get(table, (0, 0, 0))) for table in tables]
+
+
+def _sqlite_sizes(tables):
+    pages = db.session.execute(text(
+        'SELECT m.tbl_name, m.type, SUM(s.pgsize) FROM dbstat s '
+        'JOIN sqlite_master m ON m.name = s.name GROUP BY m.tbl_name, m.type'
+    )).all()
+    data = {table: size for table, kind, size in pages if kind == 'table'}
+    index = {table: size for table, kind, size in pages if kind == 'index'}
+    result = []
+    for table in tables:
+        count = db.session.execute(text(f'SELECT COUNT(*) FROM {table}')).scalar()
+        result.append((table, count, data.get(table, 0), index.get(table, 0)))
+    return result
+
+
+def table_sizes(tables=DEFAULT_TABLES):
+    """يعيد [(table, rows, data_bytes, index_bytes)] للجداول المحددة."""
+    dialect = db.engine.dialect.name
+    if dialect == 'mysql':
+        return _mysql_sizes(tables)
+    if dialect == 'sqlite':
+        return _sqlite_sizes(tables)
+    raise NotImplementedError(f'قياس الحجم غير مدعوم لقاعدة البيانات {dialect}')
@@ -0,0 +1,233 @@
+# app/utils/turnaround.py
+# إحصائيات زمن الإنجاز وحجم العمل اليومي للشعب من سجل انتقالات الحالة
+# الحسابات استعلامات SQL على نطاق زمني من السجل (فهرس created_at):
+# - الوسيط والمئين 95 لزمن الإنجاز بدوال النوافذ ROW_NUMBER و COUNT لكل شعبة (طريقة الرتبة الأقرب،
+#   وتعمل على MySQL 8 و SQLite دون PERCENTILE_CONT غير المتوفرة في MySQL).
+# - الطلبات والقرارات اليومية بتجميع GROUP BY على (اليوم، الشعبة).
+# تُحفظ النتائج في جدول التجميع اليومي (StatusDailyRollup)، وتقرأ لوحة مدير النظام منه فقط.
+# الأيام بتوقيت UTC.
+
+import time
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, delete, insert, func, case
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from app.models import StatusTransition, StatusDailyRollup
+from app.utils.departments import department_names
+
+# القرارات: الخروج من حالة الانتظار إلى موافقة أو رفض
+DECISION_STATUSES = ('approved', 'rejected')
+
+# وقت آخر طلب تحديث تلقائي في هذه العملية
+_last_refresh = {'at': 0.0}
+
+
+def _as_date(value):
+    """DATE() تعيد نصاً في SQLite وتاريخاً في MySQL."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _day_start(day):
+    return datetime.combine(day, datetime.min.time())
+
+
+def _is_decision():
+    return (StatusTransition.old_status == 'pending') & StatusTransition.new_status.in_(DECISION_STATUSES)
+
+
+def turnaround_percentiles(start, end):
+    """
+    الوسيط والمئين 95 لزمن الإنجاز (بالثواني) لكل شعبة للقرارات في [start, end):
+    {department: {'decisions', 'median_seconds', 'p95_seconds'}}.
+
+    ترتيب القرارات داخل كل شعبة بـ ROW_NUMBER وعددها بـ COUNT كنافذتين، ثم قيمة المئين p هي أصغر قيمة
+    رتبتها >= p * n.
+    """
+    ranked = (
+        select(
+            StatusTransition.department,
+            StatusTransition.waited_seconds,
+            func.row_number().over(partition_by=StatusTransition.department,
+                                   order_by=StatusTransition.waited_seconds).label('rn'),
+            func.count().over(partition_by=StatusTransition.department).label('n'),
+        )
+        .where(StatusTransition.created_at >= start, StatusTransition.created_at < end,
+               _is_decision(), StatusTransition.waited_seconds.isnot(None))
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(
+            ranked.c.department,
+            func.max(ranked.c.n),
+            func.min(case((ranked.c.rn >= ranked.c.n * 0.5, ranked.c.waited_seconds))),
+            func.min(case((ranked.c.rn >= ranked.c.n * 0.95, ranked.c.waited_seconds))),
+        ).group_by(ranked.c.department)
+    )
+    return {
+        department: {'decisions': n, 'median_seconds': median, 'p95_seconds': p95}
+        for department, n, median, p95 in rows
+    }
+
+
+def daily_throughput(start, end):
+    """
+    الطلبات والقرارات لكل (يوم، شعبة) في [start, end) بتجميع واحد:
+    {(day, department): {'requests', 'decisions', 'approved', 'rejected'}}.
+    """
+    day = func.date(StatusTransition.created_at)
+    rows = db.session.execute(
+        select(
+            day, StatusTransition.department,
+            func.sum(case((StatusTransition.old_status.is_(None), 1), else_=0)),
+            func.sum(case((_is_decision(), 1), else_=0)),
+            func.sum(case((_is_decision() & (StatusTransition.new_status == 'approved'), 1), else_=0)),
+            func.sum(case((_is_decision() & (StatusTransition.new_status == 'rejected'), 1), else_=0)),
+        )
+        .where(StatusTransition.created_at >= start, StatusTransition.created_at < end)
+        .group_by(day, StatusTransition.department)
+    )
+    return {
+        (_as_date(d), department): {'requests': requests or 0, 'decisions': decisions or 0,
+                                    'approved': approved or 0, 'rejected': rejected or 0}
+        for d, department, requests, decisions, approved, rejected in rows
+    }
+
+
+def rollup_rows(first_day, last_day, window_days=None):
+    """
+    يحسب صفوف التجميع للأيام من first_day إلى last_day (شاملة): أعداد كل يوم، والوسيط والمئين 95
+    للفترة المنتهية بذلك اليوم (window_days يوماً).
+    """
+    window_days = window_days or current_app.config.get('ANALYTICS_WINDOW_DAYS', 30)
+    counts = daily_throughput(_day_start(first_day), _day_start(last_day + timedelta(days=1)))
+    now = datetime.utcnow()
+
+    rows = []
+    day = first_day
+    while day <= last_day:
+        end = _day_start(day + timedelta(days=1))
+        percentiles = turnaround_percentiles(end - timedelta(days=window_days), end)
+        for department in department_names():
+            daily = counts.get((day, department))
+            window = percentiles.get(department)
+            if daily is None and window is None:
+                continue
+            rows.append({
+                'day': day, 'department': department,
+                **(daily or {'requests': 0, 'decisions': 0, 'approved': 0, 'rejected': 0}),
+                'median_seconds': window and window['median_seconds'],
+                'p95_seconds': window and window['p95_seconds'],
+                'window_decisions': window['decisions'] if window else 0,
+                'computed_at': now,
+            })
+        day += timedelta(days=1)
+    return rows
+
+
+def refresh_rollups(days=None, window_days=None):
+    """
+    يعيد حساب التجميع اليومي ويستبدل صفوف الأيام المحسوبة في معاملة واحدة.
+
+    days: عدد الأيام الأخيرة (شاملة اليوم). افتراضياً من آخر يوم محفوظ (قد يكون حُسب جزئياً) حتى اليوم،
+    أو من أول انتقال في السجل عند عدم وجود تجميع سابق.
+    يعيد عدد الصفوف المكتوبة.
+    """
+    today = datetime.utcnow().date()
+    if days:
+        first_day = today - timedelta(days=days - 1)
+    else:
+        first_day = db.session.scalar(select(func.max(StatusDailyRollup.day)))
+        if first_day is None:
+            oldest = db.session.scalar(select(func.min(StatusTransition.created_at)))
+            first_day = oldest.date() if oldest else today
+
+    rows = rollup_rows(first_day, today, window_days)
+    db.session.execute(
+        delete(StatusDailyRollup).where(StatusDailyRollup.day >= first_day),
+        execution_options={'synchronize_session': False},
+    )
+    if rows:
+        db.session.execute(insert(StatusDailyRollup), rows)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # عملية أخرى كتبت نفس الأيام في الوقت نفسه
+        db.session.rollback()
+        return 0
+    return len(rows)
+
+
+def refresh_if_stale(background):
+    """
+    يطلب تحديث التجميع في الخلفية إذا مضى ANALYTICS_ROLLUP_INTERVAL على آخر طلب في هذه العملية
+    وعلى آخر حساب محفوظ، حتى تبقى اللوحة حديثة دون مهمة مجدولة ودون حساب داخل الطلب.
+    """
+    interval = current_app.config.get('ANALYTICS_ROLLUP_INTERVAL', 900)
+    if time.monotonic() - _last_refresh['at'] < interval:
+        return False
+    _last_refresh['at'] = time.monotonic()
+
+    computed_at = db.session.scalar(select(func.max(StatusDailyRollup.computed_at)))
+    if computed_at and (datetime.utcnow() - computed_at).total_seconds() < interval:
+        return False
+    background.submit(refresh_rollups)
+    return True
+
+
+def turnaround_overview(chart_days=None):
+    """
+    بيانات لوحة مدير النظام من جدول التجميع فقط: زمن الإنجاز لكل شعبة حسب آخر يوم محسوب،
+    والطلبات والقرارات اليومية لآخر chart_days يوماً. يعيد None إذا لم يُحسب أي تجميع بعد.
+    """
+    chart_days = chart_days or current_app.config.get('ANALYTICS_CHART_DAYS', 14)
+    latest = db.session.scalar(select(func.max(StatusDailyRollup.day)))
+    if latest is None:
+        return None
+
+    by_department = {
+        row.department: row for row in db.session.scalars(
+            select(StatusDailyRollup).where(StatusDailyRollup.day == latest))
+    }
+    departments = [
+        {'department': department,
+         'median_seconds': by_department[department].median_seconds,
+         'p95_seconds': by_department[department].p95_seconds,
+         'decisions': by_department[department].window_decisions}
+        for department in department_names() if department in by_department
+    ]
+
+    first_day = latest - timedelta(days=chart_days - 1)
+    totals = {
+        _as_date(day): (requests or 0, decisions or 0)
+        for day, requests, decisions in db.session.execute(
+            select(StatusDailyRollup.day, func.sum(StatusDailyRollup.requests),
+                   func.sum(StatusDailyRollup.decisions))
+            .where(StatusDailyRollup.day >= first_day)
+            .group_by(StatusDailyRollup.day)
+        )
+    }
+    days = [first_day + timedelta(days=i) for i in range(chart_days)]
+    return {
+        'day': latest,
+        'computed_at': max((row.computed_at for row in by_department.values()), default=None),
+        'window_days': current_app.config.get('ANALYTICS_WINDOW_DAYS', 30),
+        'departments': departments,
+        'days': [d.isoformat() for d in days],
+        'requests': [totals.get(d, (0, 0))[0] for d in days],
+        'decisions': [totals.get(d, (0, 0))[1] for d in days],
+    }
+
+
+def format_duration(seconds):
+    """يعرض المدة بالساعات أو الأيام (لجداول اللوحة)."""
+    if seconds is None:
+        return '-'
+    hours = seconds / 3600
+    if hours < 1:
+        return f'{max(round(seconds / 60), 1)} دقيقة'
+    if hours < 48:
+        return f'{hours:.1f} ساعة'
+    return f'{hours / 24:.1f} يوم'
@@ -0,0 +1,141 @@
+# app/utils/user_cache.py
+# ذاكرة مؤقتة لهوية المستخدم الحالي (current_user) داخل كل عملية
+# بدلاً من استعلام User في بداية كل طلب، تُحفظ قيم أعمدة المستخدم لفترة قصيرة (TTL) مع حد أقصى للحجم (LRU)،
+# وعند الطلب يُعاد بناء كائن User وإرفاقه بالجلسة دون أي استعلام.
+# أي حفظ لتغيير على مستخدم (تعديل، حذف، تغيير الدور أو كلمة المرور) يبطل الذاكرة في جميع العمليات عبر FileSignal.
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.extensions import db
+from app.models import User
+from app.utils.cache_signal import FileSignal
+
+# إشارة الإبطال المشتركة بين عمليات الخادم
+users_signal = FileSignal('users')
+
+DEFAULT_TTL = 60
+DEFAULT_SIZE = 1000
+
+# {user_id: (expires_at, {column: value})} بترتيب آخر استخدام
+_entries = OrderedDict()
+_state = {'version': None, 'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+
+def _columns():
+    return [attr.key for attr in User.__mapper__.column_attrs]
+
+
+def _snapshot(user):
+    return {key: getattr(user, key) for key in _columns()}
+
+
+def _attach(values):
+    """يبني كائن User من القيم المحفوظة ويرفقه بالجلسة الحالية دون استعلام."""
+    user = User()
+    for key, value in values.items():
+        set_committed_value(user, key, value)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def _check_version():
+    """يفرغ الذاكرة إذا تغيرت إشارة الإبطال منذ آخر قراءة."""
+    version = users_signal.version()
+    if _state['version'] != version:
+        _entries.clear()
+        _state['version'] = version
+
+
+def load_cached_user(user_id):
+    """
+    يعيد المستخدم بالمعرف المحدد من الذاكرة المؤقتة، أو من قاعدة البيانات عند عدم وجوده أو انتهاء صلاحيته.
+    (يستخدم في user_loader الخاص بـ Flask-Login)
+    """
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    config = current_app.config
+    ttl = config.get('USER_CACHE_TTL', DEFAULT_TTL)
+    if not ttl:
+        return db.session.get(User, user_id)
+
+    now = time.monotonic()
+    with _lock:
+        _check_version()
+        entry = _entries.get(user_id)
+        if entry and entry[0] > now:
+            _entries.move_to_end(user_id)
+            _state['hits'] += 1
+            values = entry[1]
+        else:
+            _entries.pop(user_id, None)
+            _state['misses'] += 1
+            values = None
+
+    if values is not None:
+        return _attach(values)
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    with _lock:
+        _entries[user_id] = (now + ttl, _snapshot(user))
+        _entries.move_to_end(user_id)
+        while len(_entries) > config.get('USER_CACHE_SIZE', DEFAULT_SIZE):
+            _entries.popitem(last=False)
+    return user
+
+
+def invalidate_users(user_ids=None):
+    """يبطل المستخدمين المحددين (أو الجميع) في هذه العملية، ويرسل الإشارة لباقي العمليات."""
+    with _lock:
+        if user_ids is None:
+            _entries.clear()
+        else:
+            for user_id in user_ids:
+                _entries.pop(user_id, None)
+    users_signal.bump()
+
+
+def cache_info():
+    """يعيد إحصائيات الذاكرة المؤقتة في هذه العملية."""
+    with _lock:
+        return {'size': len(_entries), 'hits': _state['hits'], 'misses': _state['misses']}
+
+
+_events = {'registered': False}
+
+
+def init_user_cache(app):
+    """يربط أحداث الجلسة بإبطال الذاكرة: أي حفظ يغير مستخدماً أو يحذفه يبطله بعد commit."""
+    if _events['registered']:
+        return
+    _events['registered'] = True
+
+    @event.listens_for(db.session, 'before_flush')
+    def _track_user_changes(session, flush_context, instances):
+        changed = {obj.id for obj in session.dirty if isinstance(obj, User) and session.is_modified(obj)}
+        changed |= {obj.id for obj in session.deleted if isinstance(obj, User)}
+        if changed:
+            session.info.setdefault('changed_users', set()).update(changed)
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate_after_commit(session):
+        # الإبطال بعد الحفظ فقط، حتى لا تقرأ عملية أخرى المستخدم قبل حفظ التغيير
+        changed = session.info.pop('changed_users', None)
+        if changed:
+            invalidate_users(changed)
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard_after_rollback(session):
+        session.info.pop('changed_users', None)
@@ -0,0 +1,55 @@
+# app/utils/work_queue.py
+# قائمة عمل مسؤول الشعبة: طلبات الشعبة مصفاة من جهة الخادم (الحالة، البحث، الكلية)
+# مع تحميل بيانات الطلاب في نفس الاستعلام (JOIN) بدلاً من استعلام منفصل لكل صف،
+# والترقيم بالمؤشر على معرف السجل، فتبقى كلفة الصفحة ثابتة مهما كبر حجم الشعبة.
+
+from sqlalchemy import or_
+from sqlalchemy.orm import contains_eager
+
+from app.models import User, ClearanceStatus
+from app.utils.pagination import keyset_paginate
+from app.utils.clearance_cycles import current_cycle_id
+
+# الحالات المتاحة في التصفية ('all' = كل الحالات)
+QUEUE_STATUSES = ('pending', 'approved', 'rejected', 'all')
+DEFAULT_STATUS = 'pending'
+
+
+def normalize_status(status):
+    """يعيد حالة التصفية الصالحة (قيد الانتظار افتراضياً)."""
+    return status if status in QUEUE_STATUSES else DEFAULT_STATUS
+
+
+def department_queue(department, college=None, status=DEFAULT_STATUS, search=None):
+    """
+    يعيد استعلام طلبات الشعبة مع الطالب محملاً مسبقاً.
+
+    المعاملات:
+    college: لتقييد الطلبات بطلاب كلية محددة (المسؤول المخصص لكلية).
+    status: حالة الطلبات ('all' لعدم التصفية).
+    search: بحث ببداية الرقم الجامعي أو جزء من اسم الطالب.
+    """
+    query = (
+        ClearanceStatus.query
+        .join(User, ClearanceStatus.student_id == User.id)
+        .options(contains_eager(ClearanceStatus.student))
+        .filter(ClearanceStatus.cycle_id == current_cycle_id(), ClearanceStatus.department == department)
+    )
+    if college:
+        query = query.filter(User.college == college)
+    if status != 'all':
+        query = query.filter(ClearanceStatus.status == status)
+    if search:
+        query = query.filter(or_(
+            User.university_id.startswith(search, autoescape=True),
+            User.full_name.contains(search, autoescape=True),
+            User.username.startswith(search, autoescape=True),
+        ))
+    return query
+
+
+def queue_page(department, college=None, status=DEFAULT_STATUS, search=None,
+               after=None, before=None, per_page=None):
+    """يعيد صفحة واحدة من قائمة العمل مرتبة حسب معرف السجل (الأقدم أولاً)."""
+    query = department_queue(department, college=college, status=status, search=search)
+    return keyset_paginate(query, ClearanceStatus.id, after=after, before=before, per_page=per_page)
@@ -24,3 +24,81 @@ MAIL_PORT = 587
 MAIL_USE_TLS = True
 MAIL_USERNAME = 'email@example.com'
 MAIL_PASSWORD = '[PASSWORD]'
+
+
+# عدد مهام الخلفية التي تعمل بالتوازي (مثل استيراد الطلاب)، والبقية تنتظر في الطابور
+BACKGROUND_WORKERS = 1
+
+# صندوق الإشعارات الفورية: حجم الدفعة، عدد المحاولات، والتأخير المتزايد بين المحاولات (بالثواني)
+PUSH_BATCH_SIZE = 100
+PUSH_MAX_ATTEMPTS = 8
+PUSH_BACKOFF_BASE = 30
+PUSH_BACKOFF_MAX = 3600
+PUSH_LEASE_SECONDS = 300
+PUSH_TIMEOUT = 10
+
+# طابور إرسال البريد: أقصى عدد رسائل بالانتظار، عدد الرسائل لكل اتصال SMTP، وأقصى عدد رسائل في الثانية (0 = بدون حد)
+MAIL_QUEUE_SIZE = 10000
+MAIL_BATCH_SIZE = 50
+MAIL_RATE_LIMIT = 5
+
+# صندوق البريد الصادر (رسائل الترحيب ببيانات الدخول): حجم الدفعة، عدد المحاولات، والتأخير المتزايد بين المحاولات (بالثواني)
+MAIL_OUTBOX_BATCH_SIZE = 50
+MAIL_OUTBOX_MAX_ATTEMPTS = 8
+MAIL_OUTBOX_BACKOFF_BASE = 60
+MAIL_OUTBOX_BACKOFF_MAX = 3600
+MAIL_OUTBOX_LEASE_SECONDS = 600
+
+# عدد الإشعارات المعروضة في القائمة المنسدلة (الأقدم تُحمّل عند الطلب)
+NOTIFICATIONS_DROPDOWN_LIMIT = 10
+
+# سياسة الاحتفاظ بالإشعارات: عمر المقروءة وغير المقروءة بالأيام، الأرشفة (archive) أو الحذف (delete)،
+# حجم الدفعة، والاستراحة بين الدفعات بالثواني
+NOTIFICATION_RETENTION_READ_DAYS = 30
+NOTIFICATION_RETENTION_UNREAD_DAYS = 180
+NOTIFICATION_RETENTION_MODE = 'archive'
+NOTIFICATION_RETENTION_CHUNK = 1000
+NOTIFICATION_RETENTION_PAUSE = 0.05
+
+# الحد الأقصى لعدد القرارات في طلب القرارات الجماعية لمسؤول الشعبة
+BULK_DECISIONS_MAX = 500
+
+# ذاكرة هوية المستخدم الحالي في كل عملية: مدة الصلاحية بالثواني (0 = تعطيل) والحد الأقصى لعدد المستخدمين
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 1000
+
+# ذاكرة أجزاء لوحات التحكم: الخلفية memory (داخل كل عملية) أو filesystem (مشتركة بين العمليات) أو none،
+# والحد الأقصى لعدد الأجزاء ولحجمها بالبايت (الحجم لخلفية memory فقط)، ومجلد خلفية filesystem (افتراضياً instance/cache/fragments)
+FRAGMENT_CACHE_BACKEND = 'memory'
+FRAGMENT_CACHE_MAX_ENTRIES = 500
+FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+FRAGMENT_CACHE_DIR = None
+
+# البث المباشر (SSE): الفاصل بين قراءات جدول الأحداث بالثواني، أقصى عدد أحداث لكل قراءة،
+# سعة طابور كل اتصال (يُغلق الاتصال المتوقف عند امتلائه)، الفاصل بين رسائل الإبقاء على الاتصال، ومدة الاحتفاظ بالأحداث بالساعات
+STREAM_POLL_INTERVAL = 1.0
+STREAM_BATCH_SIZE = 500
+STREAM_QUEUE_SIZE = 100
+STREAM_HEARTBEAT = 15
+STREAM_RETENTION_HOURS = 24
+# زمن استقرار معرفات الأحداث بالثواني (أطول مدة متوقعة لمعاملة): ما بعده يُعاد فحصه في كل قراءة
+# حتى لا يضيع حدث حُفظ متأخراً بمعرف أقل من معرف مقروء
+STREAM_SETTLE_SECONDS = 30
+
+# تصدير حالة براءة الذمة: عدد الطلاب في كل دفعة قراءة
+EXPORT_CHUNK_SIZE = 1000
+
+# أرشفة سجلات دورات براءة الذمة المغلقة: عدد السجلات في كل دفعة، والاستراحة بين الدفعات بالثواني
+CYCLE_ARCHIVE_CHUNK = 1000
+CYCLE_ARCHIVE_PAUSE = 0.05
+
+# إحصائيات زمن الإنجاز: طول الفترة (بالأيام) التي يُحسب عليها الوسيط والمئين 95، وعدد أيام مخطط الإنجاز اليومي،
+# وأقل مدة بالثواني بين تحديثين تلقائيين للتجميع اليومي من لوحة مدير النظام
+ANALYTICS_WINDOW_DAYS = 30
+ANALYTICS_CHART_DAYS = 14
+ANALYTICS_ROLLUP_INTERVAL = 900
+
+# شهادات براءة الذمة المعروضة مسبقاً: مجلد الملفات (افتراضياً instance/certificates، ويجب أن يكون مشتركاً بين العمليات)،
+# ومدة التخزين في المتصفح بالثواني (المحتوى لا يتغير لأن الرابط يحمل بصمته)
+CERTIFICATE_DIR = None
+CERTIFICATE_MAX_AGE = 365 * 24 * 3600
@@ -1,6 +1,8 @@
 from app import create_app
 from app.extensions import db
 from app.models import User
+from app.utils.clearance_cycles import current_cycle_id
+from app.utils.departments import department_names
 
 
 # إنشاء كائن التطبيق باستخدام دالة المصنع
@@ -11,6 +13,10 @@ with app.app_context():
     # إنشاء الجداول في قاعدة البيانات إن لم تكن موجودة مسبقاً
     db.create_all()
 
+    # تعبئة جدول الشعب وإنشاء دورة براءة الذمة الأولى إن لم تكونا موجودتين
+    department_names()
+    current_cycle_id()
+
 
 
     # التحقق من وجود مستخدم مدير، وإنشاؤه تلقائياً إذا لم يكن موجوداً
@@ -0,0 +1,82 @@
+document.addEventListener('DOMContentLoaded', () => {
+  // القرارات الجماعية: تحديد عدة طلبات وتطبيق نفس الحالة عليها بطلب واحد إلى /section_head/decisions
+  // ثم تحديث الصفوف في مكانها وعرض ملخص النتائج دون إعادة تحميل الصفحة
+  const bar = document.getElementById('bulk-decisions');
+  if (!bar) return;
+
+  const selectAll = document.getElementById('bulk-select-all');
+  const applyButton = document.getElementById('bulk-apply');
+  const countLabel = document.getElementById('bulk-selected-count');
+  const resultLabels = { updated: 'تم التحديث', unchanged: 'بدون تغيير', not_found: 'غير موجود', invalid: 'غير صالح' };
+
+  const checkboxes = () => Array.from(document.querySelectorAll('.bulk-select'));
+  const selected = () => checkboxes().filter(box => box.checked);
+
+  const refresh = () => {
+    const count = selected().length;
+    countLabel.textContent = count;
+    applyButton.disabled = count === 0;
+  };
+
+  // تحديد الكل يشمل الصفوف الظاهرة بعد التصفية فقط
+  selectAll.addEventListener('change', () => {
+    checkboxes().forEach(box => {
+      if (box.closest('tr').style.display !== 'none') box.checked = selectAll.checked;
+    });
+    refresh();
+  });
+  checkboxes().forEach(box => box.addEventListener('change', refresh));
+
+  const showSummary = (text, category) => {
+    let alert = document.getElementById('bulk-summary');
+    if (!alert) {
+      alert = document.createElement('div');
+      alert.id = 'bulk-summary';
+      bar.after(alert);
+    }
+    alert.className = `alert alert-${category} m-3 mb-0`;
+    alert.textContent = text;
+  };
+
+  applyButton.addEventListener('click', async () => {
+    const status = document.getElementById('bulk-status').value;
+    const comment = document.getElementById('bulk-comment').value;
+    const decisions = selected().map(box => ({ student_id: Number(box.value), status, comment }));
+    if (!decisions.length) return;
+
+    applyButton.disabled = true;
+    try {
+      const response = await fetch(bar.dataset.url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json', 'X-CSRFToken': bar.dataset.csrf },
+        body: JSON.stringify({ decisions })
+      });
+      const data = await response.json();
+      if (!response.ok) throw new Error(data.error || response.status);
+
+      data.results.forEach(item => {
+        if (item.result !== 'updated' && item.result !== 'unchanged') return;
+        const box = document.querySelector(`.bulk-select[value="${item.student_id}"]`);
+        if (!box) return;
+        const row = box.closest('tr');
+        row.dataset.status = status;
+        row.querySelector('select[name="status"]').value = status;
+        row.querySelector('input[name="comment"]').value = comment;
+        box.checked = false;
+      });
+      selectAll.checked = false;
+
+      const parts = Object.entries(data.summary)
+        .filter(([, count]) => count > 0)
+        .map(([result, count]) => `${resultLabels[result] || result}: ${count}`);
+      showSummary(parts.join(' - '), data.summary.not_found || data.summary.invalid ? 'warning' : 'success');
+      if (typeof filterTable === 'function') filterTable();
+    } catch (err) {
+      console.error('تعذر تطبيق القرارات:', err);
+      showSummary(`تعذر تطبيق القرارات: ${err.message}`, 'danger');
+    } finally {
+      refresh();
+    }
+  });
+});
@@ -0,0 +1,38 @@
+document.addEventListener('DOMContentLoaded', () => {
+  // البث المباشر (Server-Sent Events): استلام تحديثات الحالة والطلبات الجديدة دون إعادة تحميل الصفحة
+  // المتصفح يعيد الاتصال تلقائياً ويرسل Last-Event-ID، فيستكمل الخادم ما فات أثناء الانقطاع
+  const live = document.getElementById('live-updates');
+  if (!live || !window.EventSource) return;
+
+  const source = new EventSource(live.dataset.url);
+  const badges = {
+    approved: '<span class="badge bg-success rounded-pill"><i class="bi bi-check-circle-fill status-icon"></i> موافق عليه</span>',
+    rejected: '<span class="badge bg-danger rounded-pill"><i class="bi bi-x-circle-fill status-icon"></i> مرفوض</span>',
+    pending: '<span class="badge bg-warning text-dark rounded-pill"><i class="bi bi-hourglass-split status-icon"></i> قيد الانتظار</span>',
+  };
+
+  // تنبيه واحد يتجدد مع كل حدث، مع رابط لتحديث الصفحة
+  const showAlert = (text) => {
+    live.hidden = false;
+    live.querySelector('.live-text').textContent = text;
+  };
+
+  // الطالب: تحديث شارة الشعبة وملاحظتها في مكانها
+  source.addEventListener('status_update', (e) => {
+    const data = JSON.parse(e.data);
+    const row = document.querySelector(`tr[data-department="${CSS.escape(data.department)}"]`);
+    if (row) {
+      row.querySelector('.live-status').innerHTML = badges[data.status] || badges.pending;
+      row.querySelector('.live-comment').textContent = data.comment || 'لا يوجد';
+    }
+    showAlert(`شعبة ${data.department} حدّثت حالة طلبك.`);
+  });
+
+  // مسؤول الشعبة: طلب جديد (يظهر في القائمة بعد تحديث الصفحة)
+  let newRequests = 0;
+  source.addEventListener('clearance_request', (e) => {
+    const data = JSON.parse(e.data);
+    newRequests += 1;
+    showAlert(`طلب جديد من الطالب ${data.name || data.university_id} (${newRequests} طلبات جديدة).`);
+  });
+});
@@ -0,0 +1,45 @@
+document.addEventListener('DOMContentLoaded', () => {
+  // القائمة المنسدلة تعرض آخر الإشعارات فقط، وزر "عرض إشعارات أقدم" يجلب الصفحة التالية
+  // من /notifications باستخدام المؤشر (معرف آخر إشعار معروض)
+  document.querySelectorAll('.notification-more').forEach(button => {
+    const menu = button.closest('.notification-dropdown-menu');
+    const feedUrl = menu.dataset.feedUrl;
+
+    button.addEventListener('click', async (event) => {
+      // إبقاء القائمة مفتوحة بعد الضغط
+      event.stopPropagation();
+      button.disabled = true;
+
+      try {
+        const response = await fetch(`${feedUrl}?after=${button.dataset.cursor}`, { credentials: 'same-origin' });
+        if (!response.ok) throw new Error(response.status);
+        const page = await response.json();
+
+        const anchor = button.closest('li');
+        page.items.forEach(n => {
+          const li = document.createElement('li');
+          li.className = 'dropdown-item border-bottom py-2 notification-item' + (n.is_read ? '' : ' fw-bold');
+
+          const message = document.createElement('small');
+          message.textContent = n.message;
+          const time = document.createElement('small');
+          time.className = 'text-muted';
+          time.textContent = n.local_time;
+
+          li.append(message, document.createElement('br'), time);
+          menu.insertBefore(li, anchor);
+        });
+
+        if (page.next_cursor) {
+          button.dataset.cursor = page.next_cursor;
+          button.disabled = false;
+        } else {
+          anchor.remove();
+        }
+      } catch (err) {
+        console.error('تعذر تحميل الإشعارات:', err);
+        button.disabled = false;
+      }
+    });
+  });
+});
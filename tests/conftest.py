@@ -0,0 +1,107 @@
+# tests/conftest.py
+# تطبيق اختبار بقاعدة بيانات SQLite مؤقتة واحدة لجميع الاختبارات (مثل run.py: إنشاء الجداول والشعب والدورة الأولى).
+# كل اختبار ينشئ مستخدمين جدداً بأسماء فريدة، فلا تتداخل بياناته مع غيره.
+# التشغيل: python -m pytest -q
+
+import itertools
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+from app.models import User
+from app.utils.clearance_cycles import current_cycle_id
+from app.utils.departments import department_names
+
+PASSWORD = 'secret123'
+
+_sequence = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    database = tmp_path_factory.mktemp('db') / 'clearance.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+        'WTF_CSRF_ENABLED': False,
+        'MAIL_SUPPRESS_SEND': True,
+        'FRAGMENT_CACHE_BACKEND': 'none',
+        'CERTIFICATE_DIR': str(tmp_path_factory.mktemp('certificates')),
+    })
+    with app.app_context():
+        db.create_all()
+        department_names()
+        current_cycle_id()
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(app):
+    """ينشئ مستخدماً بقيم فريدة ويعيد معرفه: make_user(role='student', college='...')."""
+    def make(role='student', **fields):
+        n = next(_sequence)
+        fields.setdefault('username', f'{role}-{n}')
+        fields.setdefault('email', f'{role}-{n}@example.com')
+        fields.setdefault('full_name', f'{role} {n}')
+        if role == 'student':
+            fields.setdefault('university_id', f'U{n:06d}')
+            fields['username'] = fields['university_id']
+            fields.setdefault('college', 'كلية الهندسة')
+        with app.app_context():
+            user = User(role=role, **fields)
+            user.set_password(PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make
+
+
+@pytest.fixture
+def login(app):
+    """يعيد عميل اختبار مسجل الدخول باسم المستخدم المحدد."""
+    def login(user_id):
+        with app.app_context():
+            username = db.session.get(User, user_id).username
+        client = app.test_client()
+        response = client.post('/login', data={'identifier': username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return client
+    return login
+
+
+class StatementRecorder:
+    """يلتقط عبارات SQL التي ينفذها التطبيق مع معاملاتها."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+
+    def selects(self):
+        return [(sql, params) for sql, params in self.statements if sql.lstrip().upper().startswith('SELECT')]
+
+
+@pytest.fixture
+def record_statements(app):
+    def record():
+        with app.app_context():
+            return StatementRecorder(db.engine)
+    return record
@@ -0,0 +1,31 @@
+# tests/test_clearance_counters.py
+# عدادات الشعب تُحدَّث في نفس معاملة الطلب والقرار والحذف، وتبقى مطابقة للعد الفعلي من سجلات براءة الذمة.
+
+from app.utils.clearance_counters import get_department_totals, verify_counters
+from app.utils.departments import department_names
+
+
+def test_counters_follow_requests_decisions_and_removals(app, make_user, login):
+    college = 'كلية الصيدلة'
+    with app.app_context():
+        departments = department_names()
+    department = departments[0]
+    head = login(make_user('section_head', department=department, college=college))
+    admin = login(make_user('system_admin'))
+    students = [make_user(college=college) for _ in range(3)]
+    for student in students:
+        login(student).post('/request_clearance')
+
+    with app.app_context():
+        totals = get_department_totals(college)
+        assert all(totals[name] == {'pending': 3, 'approved': 0, 'rejected': 0} for name in departments)
+
+    head.post('/update_status', data={'student_id': students[0], 'department': department, 'status': 'approved'})
+    head.post('/update_status', data={'student_id': students[1], 'department': department, 'status': 'rejected',
+                                     'comment': 'غرامة'})
+    admin.post(f'/system_admin/delete_user/{students[2]}')
+
+    with app.app_context():
+        assert get_department_totals(college)[department] == {'pending': 0, 'approved': 1, 'rejected': 1}
+        assert get_department_totals(college)[departments[1]] == {'pending': 2, 'approved': 0, 'rejected': 0}
+        assert verify_counters() == []
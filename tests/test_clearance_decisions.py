@@ -0,0 +1,115 @@
+# tests/test_clearance_decisions.py
+# قرارات مسؤولي الشعب: الدفعات تبقى العدادات والملخصات فيها مطابقة للسجلات الفعلية،
+# والقرار الفردي مقصور على مسؤول الشعبة (لشعبته فقط) ومدير النظام.
+
+from app.extensions import db
+from app.models import ClearanceStatus
+from app.utils.clearance_counters import get_department_totals, verify_counters
+from app.utils.clearance_summary import get_summary, verify_summaries
+from app.utils.departments import department_names
+
+
+def request_clearance(make_user, login, count, college):
+    students = [make_user(college=college) for _ in range(count)]
+    for student in students:
+        assert login(student).post('/request_clearance').status_code == 302
+    return students
+
+
+def decide(client, decisions):
+    response = client.post('/section_head/decisions', json={'decisions': decisions})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_bulk_decisions_keep_counters_and_summaries_consistent(app, make_user, login):
+    with app.app_context():
+        department = department_names()[0]
+    college = 'كلية العلوم'
+    head = login(make_user('section_head', department=department, college=college))
+    students = request_clearance(make_user, login, 6, college)
+    outsider = make_user(college='كلية الطب')
+    login(outsider).post('/request_clearance')
+
+    result = decide(head, [
+        {'student_id': students[0], 'status': 'approved'},
+        {'student_id': students[1], 'status': 'approved', 'comment': 'مكتمل'},
+        {'student_id': students[2], 'status': 'rejected', 'comment': 'كتاب غير مسترجع'},
+        {'student_id': students[3], 'status': 'rejected', 'comment': 'غرامة تأخير'},
+        {'student_id': students[4], 'status': 'pending'},
+        {'student_id': outsider, 'status': 'approved'},
+        {'student_id': 'x', 'status': 'approved'},
+    ])
+    assert result['summary'] == {'updated': 4, 'unchanged': 1, 'not_found': 1, 'invalid': 1}
+
+    # تغيير قرارات سابقة في دفعة ثانية
+    decide(head, [
+        {'student_id': students[0], 'status': 'pending'},
+        {'student_id': students[2], 'status': 'approved'},
+        {'student_id': students[5], 'status': 'rejected', 'comment': 'بطاقة مفقودة'},
+    ])
+
+    with app.app_context():
+        assert verify_counters() == []
+        assert verify_summaries() == []
+        assert get_department_totals(college)[department] == {'pending': 2, 'approved': 2, 'rejected': 2}
+        comments = dict(db.session.query(ClearanceStatus.student_id, ClearanceStatus.comment)
+                        .filter(ClearanceStatus.department == department, ClearanceStatus.student_id.in_(students)))
+        assert comments[students[1]] == 'مكتمل'
+        assert comments[students[2]] is None
+        assert comments[students[3]] == 'غرامة تأخير'
+        assert comments[students[5]] == 'بطاقة مفقودة'
+        assert get_summary(students[3]).rejected == 1
+
+
+def test_one_update_per_status_regardless_of_comments(app, make_user, login, record_statements):
+    with app.app_context():
+        department = department_names()[1]
+    college = 'كلية الآداب'
+    head = login(make_user('section_head', department=department, college=college))
+    students = request_clearance(make_user, login, 4, college)
+
+    with record_statements() as recorder:
+        decide(head, [
+            {'student_id': students[0], 'status': 'rejected', 'comment': 'أ'},
+            {'student_id': students[1], 'status': 'rejected', 'comment': 'ب'},
+            {'student_id': students[2], 'status': 'rejected'},
+            {'student_id': students[3], 'status': 'approved', 'comment': 'ج'},
+        ])
+    updates = [sql for sql, _ in recorder.statements if sql.lstrip().upper().startswith('UPDATE CLEARANCE_STATUS')]
+    assert len(updates) == 2
+
+    with app.app_context():
+        assert verify_counters() == []
+
+
+def status_of(app, student, department):
+    with app.app_context():
+        return db.session.query(ClearanceStatus.status).filter_by(student_id=student, department=department).scalar()
+
+
+def test_update_status_rejects_other_roles(app, make_user, login):
+    with app.app_context():
+        department = department_names()[2]
+    student = make_user()
+    client = login(student)
+    client.post('/request_clearance')
+
+    client.post('/update_status', data={'student_id': student, 'department': department, 'status': 'approved'})
+    assert status_of(app, student, department) == 'pending'
+
+
+def test_update_status_keeps_section_heads_in_their_department(app, make_user, login):
+    with app.app_context():
+        own, other = department_names()[3:5]
+    head = login(make_user('section_head', department=own))
+    admin = login(make_user('system_admin'))
+    student = make_user()
+    login(student).post('/request_clearance')
+
+    head.post('/update_status', data={'student_id': student, 'department': other, 'status': 'approved'})
+    assert status_of(app, student, other) == 'pending'
+    assert status_of(app, student, own) == 'approved'
+
+    admin.post('/update_status', data={'student_id': student, 'department': other, 'status': 'rejected'})
+    assert status_of(app, student, other) == 'rejected'
@@ -0,0 +1,27 @@
+# tests/test_clearance_summary.py
+# ملخص الطالب: يكتمل عند موافقة جميع سجلاته في الدورة الحالية، ويبقى مطابقاً للعد الفعلي.
+
+from app.extensions import db
+from app.utils.clearance_decisions import apply_decisions
+from app.utils.clearance_summary import get_summary, is_completed, verify_summaries
+from app.utils.departments import department_names
+
+
+def test_completion_follows_the_students_own_records(app, make_user, login):
+    student = make_user()
+    login(student).post('/request_clearance')
+
+    with app.app_context():
+        departments = department_names()
+        assert get_summary(student).total == len(departments)
+        for department in departments:
+            assert not is_completed(student)
+            apply_decisions(department, [{'student_id': student, 'status': 'approved'}])
+            db.session.commit()
+        assert is_completed(student)
+
+        apply_decisions(departments[0], [{'student_id': student, 'status': 'rejected'}])
+        db.session.commit()
+        assert not is_completed(student)
+        assert get_summary(student).rejected == 1
+        assert verify_summaries() == []
@@ -0,0 +1,52 @@
+# tests/test_mail_outbox.py
+# عامل صندوق البريد الصادر: نص رسالة الترحيب (وفيه كلمة المرور) لا يبقى بعد الإرسال ولا في الرسائل الميتة بعد التنظيف.
+# التطبيق يعمل بـ MAIL_SUPPRESS_SEND فلا تُرسل رسائل فعلية.
+
+from datetime import datetime, timedelta
+
+import pytest
+from flask_mail import Message
+
+from app.extensions import db
+from app.models import MailOutbox
+from app.utils import mail_outbox
+from app.utils.mail_outbox import enqueue_mail, outbox
+
+
+@pytest.fixture
+def queued(app, make_user):
+    users = [make_user() for _ in range(4)]
+    with app.app_context():
+        db.session.query(MailOutbox).delete()
+        enqueue_mail([(user_id, Message('مرحباً', recipients=[f'{user_id}@example.com'], body='كلمة المرور: x'))
+                      for user_id in users])
+        db.session.commit()
+    return users
+
+
+def test_sent_mail_drops_the_body(app, queued, record_statements):
+    with app.app_context():
+        with record_statements() as recorder:
+            assert outbox.process_batch() == {'sent': 4, 'retried': 0, 'dead': 0}
+        # الحجز (SELECT + UPDATE) ثم UPDATE واحد للمرسلة
+        assert len(recorder.statements) == 3
+        assert {(row.status, row.body) for row in MailOutbox.query} == {('sent', None)}
+
+
+def test_dead_mail_is_purged(app, queued, monkeypatch):
+    def refuse():
+        raise ConnectionRefusedError('smtp down')
+
+    monkeypatch.setattr(mail_outbox.mail, 'connect', refuse)
+    monkeypatch.setitem(app.config, 'MAIL_OUTBOX_MAX_ATTEMPTS', 2)
+    with app.app_context():
+        assert outbox.process_batch() == {'sent': 0, 'retried': 4, 'dead': 0}
+        db.session.query(MailOutbox).update({'next_attempt_at': datetime.utcnow()})
+        db.session.commit()
+        assert outbox.process_batch() == {'sent': 0, 'retried': 0, 'dead': 4}
+        assert all('smtp down' in row.last_error for row in MailOutbox.query)
+
+        db.session.query(MailOutbox).update({'created_at': datetime.utcnow() - timedelta(days=8)})
+        db.session.commit()
+        assert outbox.purge(7) == 4
+        assert MailOutbox.query.count() == 0
@@ -0,0 +1,29 @@
+# tests/test_notification_retention.py
+# أرشفة الإشعارات: الشعبة المعنية تُنقل بمعرفها إلى جدول الأرشيف وتُقرأ باسمها كما في الإشعار.
+
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import Notification, NotificationArchive
+from app.utils.notification_retention import purge_in_chunks
+from app.utils.notifications import STATUS_UPDATE
+
+
+def test_archive_keeps_the_department(app, make_user):
+    student = make_user()
+    with app.app_context():
+        old = datetime.utcnow() - timedelta(days=400)
+        db.session.add_all([
+            Notification(user_id=student, message='شعبة الهويات غيّرت حالتك إلى موافق', timestamp=old,
+                         type=STATUS_UPDATE, related_student_id=student, department='الهويات'),
+            Notification(user_id=student, message='إشعار عام', timestamp=old),
+        ])
+        db.session.commit()
+
+        report = purge_in_chunks((Notification.user_id == student,), archive=True, pause=0)
+
+        assert report.processed == 2
+        assert Notification.query.filter_by(user_id=student).count() == 0
+        archived = NotificationArchive.query.filter_by(user_id=student).order_by(NotificationArchive.id).all()
+        assert [row.department for row in archived] == ['الهويات', None]
+        assert NotificationArchive.query.filter_by(department='الهويات', user_id=student).count() == 1
@@ -0,0 +1,57 @@
+# tests/test_push_outbox.py
+# عامل صندوق الإشعارات الفورية: عدد استعلامات الدفعة لا يزيد بعدد الإشعارات، والنتائج تُسجل لكل إشعار.
+# خدمة الإشعارات نفسها (deliver_push) تُستبدل بدالة محلية.
+
+from datetime import datetime
+
+import pytest
+from pywebpush import WebPushException
+
+from app.extensions import db
+from app.models import PushOutbox, PushSubscription
+from app.utils import push_outbox
+from app.utils.push_outbox import enqueue_push, outbox
+
+
+class GoneResponse:
+    status_code = 410
+
+
+@pytest.fixture
+def subscriptions(app, make_user):
+    users = [make_user() for _ in range(6)]
+    with app.app_context():
+        db.session.query(PushOutbox).delete()
+        for user_id in users:
+            db.session.add(PushSubscription(user_id=user_id, endpoint=f'https://push.example/{user_id}',
+                                            p256dh='key', auth='auth'))
+        enqueue_push(users, {'title': 'اختبار'})
+        db.session.commit()
+    return users
+
+
+def test_batch_outcomes_use_constant_queries(app, subscriptions, monkeypatch, record_statements):
+    gone, failing = subscriptions[0], subscriptions[1]
+
+    def deliver(sub_info, payload, session=None):
+        if sub_info['endpoint'].endswith(f'/{gone}'):
+            raise WebPushException('gone', response=GoneResponse())
+        if sub_info['endpoint'].endswith(f'/{failing}'):
+            raise ConnectionError('timeout')
+
+    monkeypatch.setattr(push_outbox, 'deliver_push', deliver)
+    with app.app_context():
+        with record_statements() as recorder:
+            stats = outbox.process_batch()
+        assert stats == {'sent': 4, 'retried': 1, 'dead': 1}
+        # الحجز (SELECT + UPDATE)، حذف الاشتراك المنتهي، ثم UPDATE لكل نتيجة
+        assert len(recorder.statements) == 6
+
+        rows = {row.user_id: row for row in PushOutbox.query}
+        assert rows[gone].status == 'dead'
+        assert rows[failing].status == 'pending' and rows[failing].attempts == 1
+        assert rows[failing].next_attempt_at > datetime.utcnow()
+        assert 'timeout' in rows[failing].last_error
+        assert rows[subscriptions[2]].status == 'sent' and rows[subscriptions[2]].sent_at is not None
+        assert PushSubscription.query.filter_by(user_id=gone).count() == 0
+        assert outbox.process_batch() == {'sent': 0, 'retried': 0, 'dead': 0}
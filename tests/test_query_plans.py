@@ -0,0 +1,50 @@
+# tests/test_query_plans.py
+# الاستعلامات الساخنة واستعلامات لوحات مسؤول الشعبة ومدير النظام لا تلجأ إلى مسح كامل للجدول.
+# خطة SQLite لا تعتمد على عدد الصفوف (دون ANALYZE)، فتكفي بيانات قليلة.
+
+import pytest
+
+from app.utils.departments import department_names
+from app.utils.query_plans import assert_no_full_scans, explain_sql
+
+# جدول العدادات صف واحد لكل (شعبة، كلية)، وتجميعه بالكامل هو المقصود منه
+AGGREGATE_TABLES = {'clearance_counter'}
+
+
+def full_scans(app, recorder):
+    with app.app_context():
+        return [(sql, tables) for sql, params in recorder.selects()
+                for tables in [explain_sql(sql, params)[0]] if tables]
+
+
+def test_hot_queries_use_indexes(app_context):
+    assert_no_full_scans()
+
+
+@pytest.mark.parametrize('url', [
+    '/section_head',
+    '/section_head?status=all',
+    '/section_head?status=approved',
+    '/api/section_head/counts',
+])
+def test_section_head_queries_use_indexes(app, make_user, login, record_statements, url):
+    with app.app_context():
+        department = department_names()[0]
+    head = login(make_user('section_head', department=department, college='كلية الهندسة'))
+    for _ in range(3):
+        login(make_user()).post('/request_clearance')
+
+    with record_statements() as recorder:
+        assert head.get(url).status_code == 200
+    assert recorder.selects()
+    assert full_scans(app, recorder) == []
+
+
+def test_admin_statistics_use_indexes(app, make_user, login, record_statements):
+    admin = login(make_user('system_admin'))
+    login(make_user()).post('/request_clearance')
+
+    with record_statements() as recorder:
+        assert admin.get('/api/admin/statistics').status_code == 200
+    scans = [(sql, tables) for sql, tables in full_scans(app, recorder) if set(tables) - AGGREGATE_TABLES]
+    assert scans == []
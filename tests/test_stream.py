@@ -0,0 +1,77 @@
+# tests/test_stream.py
+# استكمال البث المباشر بعد إعادة الاتصال: الأحداث المحفوظة متأخراً بمعرف أقل من آخر حدث مسلم لا تضيع،
+# والأحداث المسلمة لا تتكرر.
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import StreamEvent
+from app.utils import stream_events
+
+
+def publish(user_id, status, created_at=None):
+    """يضيف حدثاً ويحفظه ويعيد معرفه (created_at لمحاكاة حدث قديم مستقر)."""
+    stream_events.publish([(user_id, stream_events.STATUS_UPDATE, {'status': status})])
+    event_id = db.session.query(db.func.max(StreamEvent.id)).scalar()
+    if created_at is not None:
+        db.session.execute(update(StreamEvent).where(StreamEvent.id == event_id).values(created_at=created_at))
+    db.session.commit()
+    return event_id
+
+
+def read_stream(client, count, **headers):
+    """يقرأ أول count رسالة من /stream (بعد رسالة retry) ثم يغلق الاتصال."""
+    response = client.get('/stream', headers=headers, buffered=False)
+    assert response.status_code == 200
+    chunks = (chunk.decode() for chunk in response.response)
+    try:
+        assert next(chunks).startswith('retry:')
+        return [next(chunks) for _ in range(count)]
+    finally:
+        response.close()
+
+
+def message_id(message):
+    return message.split('\n', 1)[0].removeprefix('id: ')
+
+
+def test_cursor_round_trip():
+    assert stream_events.format_cursor(5, {7, 3, 9}) == '5:7,9'
+    assert stream_events.format_cursor(5, set()) == '5'
+    assert stream_events.parse_cursor('5:7,9') == (5, {7, 9})
+    assert stream_events.parse_cursor('5') == (5, set())
+    assert stream_events.parse_cursor('x') is None
+    assert stream_events.parse_cursor(None) is None
+
+
+def test_resume_replays_late_events_without_repeating_delivered(app, make_user, login):
+    student = make_user()
+    client = login(student)
+    with app.app_context():
+        settled = publish(student, 'old', created_at=datetime.utcnow() - timedelta(hours=1))
+        # حُفظ e3 أولاً وسُلم، ثم حُفظت معاملة e2 (معرفها أقل) بعد قراءته
+        late = publish(student, 'late')
+        delivered = publish(student, 'delivered')
+        assert late < delivered
+
+    messages = read_stream(client, 1, **{'Last-Event-ID': stream_events.format_cursor(settled, {delivered})})
+    assert '"late"' in messages[0]
+    assert '"delivered"' not in messages[0]
+    assert stream_events.parse_cursor(message_id(messages[0])) == (settled, {late, delivered})
+
+
+def test_page_cursor_covers_events_already_rendered(app, make_user, login):
+    student = make_user()
+    client = login(student)
+    with app.app_context():
+        rendered = publish(student, 'rendered')
+        cursor = stream_events.resume_cursor(student)
+        watermark, seen = stream_events.parse_cursor(cursor)
+        assert rendered in seen or rendered <= watermark
+        fresh = publish(student, 'fresh')
+
+    messages = read_stream(client, 1, **{'Last-Event-ID': cursor})
+    assert '"fresh"' in messages[0]
+    assert stream_events.parse_cursor(message_id(messages[0]))[1] >= {fresh}
@@ -0,0 +1,26 @@
+# tests/test_student_import.py
+# الاستيراد المجمع: صف متعارض مع بيانات أضيفت بالتزامن لا يُسقط بقية طلاب دفعته.
+
+import pandas as pd
+
+from app.extensions import db
+from app.models import User
+from app.utils import student_import
+from app.utils.student_import import import_student_frame
+
+
+def test_conflicting_row_only_fails_itself(app, make_user, monkeypatch):
+    existing = make_user()
+    with app.app_context():
+        taken = db.session.get(User, existing).university_id
+    ids = [f'IMP{i:04d}' for i in range(7)]
+    ids[4] = taken
+    df = pd.DataFrame({'الرقم الجامعي': ids, 'الاسم الكامل': [f'طالب {i}' for i in range(7)]})
+
+    # محاكاة طالب أضيف بعد التحقق وقبل الإدخال
+    monkeypatch.setattr(student_import, '_existing_identifiers', lambda university_ids: set())
+    with app.app_context():
+        report = import_student_frame(df, chunk_size=5)
+        assert report.imported == 6
+        assert [row for row, _ in report.errors] == [6]
+        assert User.query.filter(User.university_id.in_(ids)).count() == 7